@@ -1,3 +1,5 @@
+import os
+import sys
 import pandas as pd
 from sentence_transformers import SentenceTransformer
 from chromadb import PersistentClient
@@ -44,3 +46,9 @@ print("✅ Embedding complete.")
 print("Total documents stored:", collection.count())
 print("Preview:")
 print(collection.peek(3))
+
+# Refresh the precomputed mitigation catalogue served by /search
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mitigation_action import build_mitigation_catalogue
+
+build_mitigation_catalogue(collection=collection)
@@ -1,5 +1,11 @@
 import math
 
+import numpy as np
+
+# Earth's radius per distance unit
+EARTH_RADIUS = {"miles": 3960.0, "km": 6371.0}
+
+
 def haversine(lat1, lon1, lat2, lon2):
     """
     Calculate the great-circle distance between two points
@@ -26,3 +32,60 @@ def haversine(lat1, lon1, lat2, lon2):
     # Earth's radius in miles
     radius = 3960
     return c * radius
+
+
+def haversine_np(lat1, lon1, lat2, lon2, unit="miles"):
+    """
+    Vectorized haversine. Arguments are scalars or arrays in degrees and
+    broadcast against each other like any NumPy expression.
+
+    Returns:
+        Distances in the requested unit ("miles" or "km").
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) * 0.5) ** 2
+    return 2 * EARTH_RADIUS[unit] * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2, unit="miles"):
+    """Many-to-many distances: an (n, m) matrix from n origins to m points."""
+    lats1, lons1 = np.asarray(lats1, dtype=np.float64), np.asarray(lons1, dtype=np.float64)
+    return haversine_np(lats1[:, None], lons1[:, None], lats2, lons2, unit)
+
+
+def radius_box(lat, radius, unit="miles"):
+    """
+    (lat_delta, lon_delta) in degrees of the smallest box around a point at
+    latitude lat that contains the whole circle of the given radius.
+    """
+    angular = radius / EARTH_RADIUS[unit]
+    lat_delta = math.degrees(angular)
+    # The circle is widest in longitude at its pole-ward edge
+    edge = math.radians(min(abs(lat) + lat_delta, 89.9))
+    lon_delta = math.degrees(math.asin(min(math.sin(angular) / math.cos(edge), 1.0)))
+    return lat_delta, lon_delta
+
+
+def within_radius(lat, lon, lats, lons, radius, unit="miles", sort=True):
+    """
+    Points within radius of (lat, lon).
+
+    A cheap degree-box test discards far points first, so only the candidates
+    pay for the trigonometry; a million points take a few milliseconds.
+
+    Returns:
+        (indices, distances) into lats/lons, nearest first when sort is True.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    lat_delta, lon_delta = radius_box(lat, radius, unit)
+
+    candidates = np.flatnonzero((np.abs(lats - lat) <= lat_delta) & (np.abs(lons - lon) <= lon_delta))
+    distances = haversine_np(lat, lon, lats[candidates], lons[candidates], unit)
+    keep = distances <= radius
+    indices, distances = candidates[keep], distances[keep]
+
+    if sort:
+        order = np.argsort(distances, kind="stable")
+        indices, distances = indices[order], distances[order]
+    return indices, distances
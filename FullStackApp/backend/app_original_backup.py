@@ -1,26 +1,40 @@
 import json
-import psycopg2
-from flask import Flask, request, jsonify, session, send_file, make_response
+from flask import Flask, Response, request, jsonify, session, send_file, make_response, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
-import requests
 import logging
 from flask_cors import CORS
 from flask_session import Session
 from datetime import timedelta
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from flask_caching import Cache
-import pandas as pd
 from backend.routes.account_routes import account_bp
 from backend.routes.location_routes import location_bp
+from backend.routes.report_routes import report_bp
+from backend.routes.tile_routes import tile_bp
+from backend.services.db import get_connection, init_pool
+from backend.services.risk_search import risks_for_point, search_cell
+from backend.services.knn import knn_risks, parse_knn_params
+from backend.services.pagination import page_risks, parse_page_size, resolve_layer, resume_page
+from backend.services.clustering import parse_viewport, viewport
+from backend.services.compact import risks_response
+from backend.services.result_cache import search_cache
+from backend.services.result_store import result_store
+from backend.services.report_jobs import report_jobs
+from backend.services.reports import (
+    LARGE_EXPORT_ROWS, REPORT_FORMATS, iter_csv, iter_file, render_pdf, render_xlsx, write_xlsx_large
+)
+from backend.services.dataset_version import get_dataset_version
+from backend.services.grid_store import GRID_STORE_DIR, current_grid_layers
+from backend.utils.geocode import nominatim_search
+from backend.utils.gazetteer import lat_lon_to_zip, parse_zip, zip_to_lat_lon
+from backend.utils.autocomplete import resolve as resolve_address, suggest as suggest_addresses
 
 
 
 
-import xlsxwriter
 import traceback
 from backend.mitigation_action import (
     generate_mitigation_report,
+    get_mitigation_catalogue,
     query_mitigation_action,
     threat_level_from_code
 )
@@ -31,6 +45,8 @@ cache = Cache(app)
 CORS(app, resources={r"/*": {"origins": "http://localhost:3000"}}, supports_credentials=True)
 app.register_blueprint(account_bp, url_prefix="/account")
 app.register_blueprint(location_bp, url_prefix="/locations")
+app.register_blueprint(report_bp, url_prefix="/report-jobs")
+app.register_blueprint(tile_bp, url_prefix="/tiles")
 app.secret_key = 'your_secret_key'
 logging.basicConfig(level=logging.DEBUG)
 
@@ -55,11 +71,21 @@ DB_CONFIG = {
     'dbname': 'postgres'
 }
 
-GEOCODING_API_URL = "https://nominatim.openstreetmap.org/search"
+init_pool(DB_CONFIG)
+
+def grid_layers(dataset_version=None):
+    """
+    Packed HCI grids (database/build_grid_store.py) for the current dataset
+    version; layers not packed, or packed from an older version, fall back to SQL.
+    """
+    return current_grid_layers(GRID_STORE_DIR, dataset_version or get_dataset_version())
+
+app.config["GRID_LAYERS"] = grid_layers  # shared with the blueprints
 
 @app.route("/session-risks", methods=["GET"])
 def get_session_risks():
-    return jsonify({"risks": session.get("risks", [])})
+    result_id = request.args.get("result_id") or session.get("result_id")
+    return jsonify({"result_id": result_id, "risks": result_store.get(result_id) or []})
 
 @app.before_request
 def log_request():
@@ -67,116 +93,63 @@ def log_request():
     if request.method in ["POST", "PUT"]:
         print(f"Body: {request.get_data(as_text=True)}")
 
-def connect_db():
-    try:
-        return psycopg2.connect(**DB_CONFIG)
-    except Exception as err:
-        print(f"DB connection error: {err}")
-        return None
-
 # Get Latitude, Longitude from ZIP Code
 def get_lat_lon_from_zip(zipcode):
-    try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"postalcode": zipcode, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if response.status_code == 200 and response.json():
-            data = response.json()[0]
-            latitude = float(data["lat"])
-            longitude = float(data["lon"])
-            return latitude, longitude
-        else:
-            return 40.0583, -74.4057  # Default coordinates for New Jersey
-
-    except Exception as e:
-        print(f"Error fetching ZIP code data: {e}")
-        return 40.0583, -74.4057  # Default fallback coordinates
+    latitude, longitude = zip_to_lat_lon(zipcode)
+    if latitude is not None:
+        return latitude, longitude
+
+    results = nominatim_search({"postalcode": zipcode})
+    if results:
+        data = results[0]
+        latitude = float(data["lat"])
+        longitude = float(data["lon"])
+        return latitude, longitude
+    return 40.0583, -74.4057  # Default coordinates for New Jersey
 
 def get_lat_lon_from_address(address):
     """
     Fetch latitude, longitude, and ZIP code for a given address using Nominatim API.
-    Adjusts query parameters to avoid conflicts.
+    Lookups go through the shared geocoding cache (backend/utils/geocode.py).
     """
-    try:
-        # Remove state to prevent conflicts with ZIP code
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": address, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        print(f"API Request URL: {response.url}")  # Debugging
-        print(f"API Response Status: {response.status_code}")  # Debugging
-
-        if response.status_code == 200:
-            json_response = response.json()
-            print(f"API Response JSON: {json_response}")  # Debugging full response
-
-            if json_response:
-                data = json_response[0]  # Use first result
-                latitude = float(data["lat"])
-                longitude = float(data["lon"])
-
-                # Extract ZIP Code if available
-                address_parts = data.get("display_name", "").split(",")
-                zip_code = address_parts[-2].strip() if len(address_parts) > 1 else None
-                print(f"Extracted ZIP Code: {zip_code}")
-
-                return latitude, longitude, zip_code
-            else:
-                print("No results found for the address.")
-                return None, None, None
-        else:
-            print(f"Nominatim API Error: {response.status_code}")
-            return None, None, None
+    results = nominatim_search({"q": address})
+    if results:
+        data = results[0]  # Use first result
+        latitude = float(data["lat"])
+        longitude = float(data["lon"])
+
+        # Nearest NJ ZIP from the gazetteer, else guess from the display name
+        address_parts = data.get("display_name", "").split(",")
+        zip_code = lat_lon_to_zip(latitude, longitude) or (address_parts[-2].strip() if len(address_parts) > 1 else None)
+        print(f"Extracted ZIP Code: {zip_code}")
+
+        return latitude, longitude, zip_code
+
+    print("No results found for the address.")
+    return None, None, None
 
-    except Exception as e:
-        print(f"Error fetching address data: {e}")
-        return None, None, None
 @app.route("/address-autocomplete", methods=["GET"])
 def address_autocomplete():
     query = request.args.get('query', '').strip()
     if not query:
         return jsonify([])
 
-    try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": query, "countrycodes": "us", "format": "json", "limit": 5},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if response.status_code == 200:
-            suggestions = [
-                {"display_name": item.get("display_name", "")}
-                for item in response.json()
-                if "New Jersey" in item.get("display_name", "")
-            ]
-            return jsonify(suggestions)
-        else:
-            print(f"Nominatim API returned status {response.status_code}")
-            return jsonify([])
-    except Exception as e:
-        print(f"Error fetching autocomplete data: {e}")
+    # Local NJ prefix index first; the online geocoder only handles misses
+    local = suggest_addresses(query, limit=5)
+    if local:
+        return jsonify([{"display_name": item["display_name"]} for item in local])
+
+    results = nominatim_search({"q": query, "limit": 5})
+    if results is None:
         return jsonify([])
 
+    suggestions = [
+        {"display_name": item.get("display_name", "")}
+        for item in results
+        if "New Jersey" in item.get("display_name", "")
+    ]
+    return jsonify(suggestions)
 
-def standardize_threat_status(status):
-    mapping = {
-        "critically endangered": "high",
-        "endangered": "high",
-        "vulnerable": "moderate",
-        "near threatened": "moderate",
-        "least concern": "low",
-        "data deficient": "unknown",
-        "extinct": "high",
-        "extinct in the wild": "high",
-        "unknown": "low"
-    }
-    return mapping.get(status.lower(), "low")
 
 # API Endpoint: Registration
 @app.route('/register', methods=['POST', 'OPTIONS'])  # Allow OPTIONS for preflight
@@ -201,28 +174,21 @@ def register():
             response.headers.add("Access-Control-Allow-Credentials", "true")
             return response, 400
 
-        conn = connect_db()
-        if conn is None:
-            response = jsonify({"error": "Failed to connect to the database."})
-            response.headers.add("Access-Control-Allow-Origin", "http://localhost:3000")
-            response.headers.add("Access-Control-Allow-Credentials", "true")
-            return response, 500
-
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        if cursor.fetchone():
-            response = jsonify({"error": "Email is already registered."})
-            response.headers.add("Access-Control-Allow-Origin", "http://localhost:3000")
-            response.headers.add("Access-Control-Allow-Credentials", "true")
-            return response, 400
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
+            if cursor.fetchone():
+                response = jsonify({"error": "Email is already registered."})
+                response.headers.add("Access-Control-Allow-Origin", "http://localhost:3000")
+                response.headers.add("Access-Control-Allow-Credentials", "true")
+                return response, 400
 
-        hashed_password = generate_password_hash(password)
-        cursor.execute("INSERT INTO users (hotel_name, email, password_hash) VALUES (%s, %s, %s)",
-                       (hotel_name, email, hashed_password))
-        conn.commit()
+            hashed_password = generate_password_hash(password)
+            cursor.execute("INSERT INTO users (hotel_name, email, password_hash) VALUES (%s, %s, %s)",
+                           (hotel_name, email, hashed_password))
+            conn.commit()
 
-        cursor.close()
-        conn.close()
+            cursor.close()
 
         response = jsonify({"message": "Registration successful!"})
         response.headers.add("Access-Control-Allow-Origin", "http://localhost:3000")
@@ -251,10 +217,11 @@ def login():
         if not email or not password:
             return jsonify({"error": "Email and password are required."}), 400
 
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, hotel_name, email, password FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id, hotel_name, email, password FROM users WHERE email = %s", (email,))
+            user = cursor.fetchone()
+            cursor.close()
 
         if not user:
             return jsonify({"error": "Invalid email or password"}), 401
@@ -328,33 +295,30 @@ def forgot_password():
         if not email or not new_password:
             return jsonify({"error": "Email and new password are required."}), 400
 
-        conn = connect_db()
-        if conn is None:
-            return jsonify({"error": "Failed to connect to the database."}), 500
-        cursor = conn.cursor()
+        with get_connection() as conn:
+            cursor = conn.cursor()
 
-        # Check if the email exists
-        cursor.execute("SELECT id, password FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
+            # Check if the email exists
+            cursor.execute("SELECT id, password FROM users WHERE email = %s", (email,))
+            user = cursor.fetchone()
 
-        if not user:
-            return jsonify({"error": "Email not found."}), 404
+            if not user:
+                return jsonify({"error": "Email not found."}), 404
 
-        user_id, old_hashed_password = user
+            user_id, old_hashed_password = user
 
-        # Check if the new password is different from the old password
-        if check_password_hash(old_hashed_password, new_password):
-            return jsonify({"error": "New password should be different"}), 400
+            # Check if the new password is different from the old password
+            if check_password_hash(old_hashed_password, new_password):
+                return jsonify({"error": "New password should be different"}), 400
 
-        # Hash the new password
-        hashed_new_password = generate_password_hash(new_password)
+            # Hash the new password
+            hashed_new_password = generate_password_hash(new_password)
 
-        # Update the password in the database
-        cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_new_password, user_id))
-        conn.commit()
+            # Update the password in the database
+            cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_new_password, user_id))
+            conn.commit()
 
-        cursor.close()
-        conn.close()
+            cursor.close()
 
         return jsonify({"message": "Password reset successful. Redirecting to login page."}), 200
 
@@ -374,32 +338,35 @@ def search():
         input_text = request.json.get("input_text")
         lat, lon, zip_code = None, None, ""
 
-        if input_text.replace(",", "").replace(".", "").replace(" ", "").isdigit():
-            if "," in input_text:
-                lat, lon = map(float, input_text.split(","))
-                zip_code = "Unknown"
-            elif len(input_text) == 5:
-                response = requests.get(
-                    GEOCODING_API_URL,
-                    params={"postalcode": input_text, "countrycodes": "us", "format": "json"},
-                    headers={"User-Agent": "BiodivProScopeApp/1.0"}
-                )
-                if response.status_code == 200 and response.json():
-                    loc = response.json()[0]
+        zip_input = parse_zip(input_text)
+        if zip_input:
+            # ZIP or ZIP+4: offline gazetteer first; Nominatim only for ZIPs it does not know
+            lat, lon = zip_to_lat_lon(zip_input)
+            if lat is None:
+                results = nominatim_search({"postalcode": zip_input})
+                if results:
+                    loc = results[0]
                     lat = float(loc["lat"])
                     lon = float(loc["lon"])
-                    zip_code = input_text
+            if lat is not None:
+                zip_code = zip_input
+        elif "," in input_text and input_text.replace(",", "").replace(".", "").replace("-", "").replace(" ", "").isdigit():
+            lat, lon = map(float, input_text.split(","))
+            zip_code = lat_lon_to_zip(lat, lon) or "Unknown"
         else:
-            response = requests.get(
-                GEOCODING_API_URL,
-                params={"q": input_text, "countrycodes": "us", "format": "json"},
-                headers={"User-Agent": "BiodivProScopeApp/1.0"}
-            )
-            if response.status_code == 200 and response.json():
-                loc = response.json()[0]
-                lat = float(loc["lat"])
-                lon = float(loc["lon"])
-                zip_code = loc.get("display_name", "").split(",")[-2].strip()
+            # A suggestion picked from /address-autocomplete resolves offline
+            place = resolve_address(input_text)
+            if place:
+                lat, lon = place["latitude"], place["longitude"]
+                zip_code = lat_lon_to_zip(lat, lon) or ""
+            else:
+                results = nominatim_search({"q": input_text})
+                if results:
+                    loc = results[0]
+                    lat = float(loc["lat"])
+                    lon = float(loc["lon"])
+                    address_parts = loc.get("display_name", "").split(",")
+                    zip_code = lat_lon_to_zip(lat, lon) or (address_parts[-2].strip() if len(address_parts) > 1 else "")
 
         if lat is None or lon is None:
             return jsonify({"error": "Could not determine location."}), 400
@@ -408,101 +375,77 @@ def search():
         if not (NJ_BOUNDS["south"] <= lat <= NJ_BOUNDS["north"] and NJ_BOUNDS["west"] <= lon <= NJ_BOUNDS["east"]):
             return jsonify({"error": "The location is outside of New Jersey."}), 400
 
-        conn = connect_db()
-        if not conn:
-            return jsonify({"error": "Database connection failed."}), 500
-
-        cursor = conn.cursor()
         offset = int(request.json.get("offset", 0))
-        print("Querying all risk types...")
-
-        risk_data = []
-
-        cursor.execute("""
-            SELECT latitude, longitude, common_name, threat_code 
-            FROM invasive_species 
-            WHERE ABS(latitude - %s) <= 0.1 AND ABS(longitude - %s) <= 0.1
-        """, (lat, lon))
-        for row in cursor.fetchall():
-            threat_code = row[3] or "low"
-            risk_data.append({
-                "latitude": row[0], "longitude": row[1],
-                "risk_type": "Invasive Species",
-                "description": row[2],
-                "threat_code": threat_code,
-                "mitigation": query_mitigation_action("Invasive Species", threat_code)
-            })
-
-        cursor.execute("""
-            SELECT latitude, longitude, species_name, threat_status 
-            FROM iucn_data 
-            WHERE ABS(latitude - %s) <= 0.1 AND ABS(longitude - %s) <= 0.1 
-            LIMIT 50 OFFSET %s
-        """, (lat, lon, offset))
-        for row in cursor.fetchall():
-            threat_code = standardize_threat_status(row[3])
-            risk_data.append({
-                "latitude": row[0], "longitude": row[1],
-                "risk_type": "IUCN",
-                "description": row[2],
-                "threat_code": threat_code,
-                "mitigation": query_mitigation_action("IUCN", threat_code)
-            })
-
-        cursor.execute("""
-            SELECT x, y, normalized_risk, COALESCE(risk_level, 'Low') 
-            FROM freshwater_risk 
-            WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1
-        """, (lat, lon))
-        for row in cursor.fetchall():
-            threat_code = row[3].lower()
-            risk_data.append({
-                "latitude": row[1], "longitude": row[0],
-                "risk_type": "Freshwater Risk",
-                "description": f"Freshwater risk level: {row[2]}",
-                "threat_code": threat_code,
-                "mitigation": query_mitigation_action("Freshwater Risk", threat_code)
-            })
-
-        cursor.execute("""
-            SELECT x, y, marine_hci 
-            FROM marine_hci 
-            WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1
-        """, (lat, lon))
-        for row in cursor.fetchall():
-            hci = row[2] or 0
-            level = "high" if hci >= 0.75 else "moderate" if hci >= 0.4 else "low"
-            risk_data.append({
-                "latitude": row[1], "longitude": row[0],
-                "risk_type": "Marine Risk",
-                "description": f"Marine HCI Score: {hci}",
-                "threat_code": level,
-                "mitigation": query_mitigation_action("Marine Risk", level)
-            })
-
-        cursor.execute("""
-            SELECT x, y, normalized_risk, risk_level 
-            FROM terrestrial_risk 
-            WHERE ABS(y - %s) <= 0.5 AND ABS(x - %s) <= 0.1
-        """, (lat, lon))
-
-        for row in cursor.fetchall():
-            score = float(row[2])
-            level = row[3].lower() if row[3] else "low"
-
-            risk_data.append({
-                "latitude": row[1],  # y = latitude
-                "longitude": row[0],  # x = longitude
-                "risk_type": "Terrestrial Risk",
-                "description": f"Terrestrial Risk Level: {score:.2f}",
-                "threat_code": level,
-                "mitigation": query_mitigation_action("Terrestrial Risk", level)
-            })
-
-        conn.close()
-        session["risks"] = risk_data
-
-        return jsonify({"center": {"latitude": lat, "longitude": lon, "zipcode": zip_code}, "risks": risk_data})
+        mode = request.json.get("mode", "radius")
+        dataset_version = get_dataset_version()
+        if mode == "knn":
+            # k nearest per layer from in-memory KD-trees; bounded, so not cached
+            try:
+                k, max_distance = parse_knn_params(request.json.get("k"), request.json.get("max_distance"))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            risk_data = knn_risks(lat, lon, query_mitigation_action, dataset_version,
+                                  k=k, max_distance=max_distance,
+                                  grid_layers=grid_layers(dataset_version))
+        else:
+            # Searches in the same grid cell share one cached, unpaged result (see services/result_cache.py);
+            # the exact circle around the searched point is cut from it and paged here
+            version = f"{dataset_version}.{get_mitigation_catalogue().get('version')}"
+            risk_data = search_cache.get_or_compute(
+                lat, lon, version,
+                lambda cell_lat, cell_lon: search_cell(cell_lat, cell_lon, query_mitigation_action,
+                                                       search_cache.cell, grid_layers=grid_layers(dataset_version))
+            )
+            risk_data = risks_for_point(risk_data, lat, lon, offset)
+
+        # Only the ID goes in the session; the risks live in the server-side result store
+        result_id = result_store.put(risk_data)
+        session["result_id"] = result_id
+
+        # ?format=compact (or the compact Accept type) returns column arrays per layer
+        return risks_response({"center": {"latitude": lat, "longitude": lon, "zipcode": zip_code},
+                               "result_id": result_id, "risks": risk_data}, request)
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/search/page", methods=["POST"])
+def search_page():
+    """
+    Keyset pages of one layer, nearest first. Start with layer, latitude,
+    longitude (and optional limit); then send back next_page_token until it is null.
+    """
+    body = request.json or {}
+    dataset_version = get_dataset_version()
+    mitigation_version = f"{dataset_version}.{get_mitigation_catalogue().get('version')}"
+    try:
+        if body.get("page_token"):
+            risks, next_token = resume_page(body["page_token"], query_mitigation_action, mitigation_version,
+                                            app.secret_key, grid_layers=grid_layers(dataset_version))
+        else:
+            risks, next_token = page_risks(resolve_layer(body.get("layer", "IUCN")),
+                                           float(body["latitude"]), float(body["longitude"]),
+                                           query_mitigation_action, mitigation_version, app.secret_key,
+                                           limit=parse_page_size(body.get("limit")),
+                                           grid_layers=grid_layers(dataset_version))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e) if isinstance(e, ValueError) else "latitude and longitude are required."}), 400
+    except Exception as e:
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    return risks_response({"risks": risks, "next_page_token": next_token}, request)
+
+@app.route("/viewport", methods=["GET"])
+def map_viewport():
+    """Clustered (low zoom) or individual (high zoom) risks inside the visible map bbox."""
+    try:
+        south, west, north, east, zoom = parse_viewport(request.args)
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e) if isinstance(e, ValueError) else f"Missing parameter {e}"}), 400
+    try:
+        layers = request.args.get("layers")
+        return jsonify(viewport(south, west, north, east, zoom, grid_layers=grid_layers(),
+                                layers=layers.split(",") if layers else None))
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
@@ -511,55 +454,35 @@ def search():
 def download_report_direct():
     try:
         data = request.get_json()
-        risks = data.get("risks", [])
+        risks = data.get("risks") or result_store.get(data.get("result_id") or session.get("result_id")) or []
         file_format = data.get("format", "pdf")
 
         if not risks:
             return jsonify({"error": "No risks provided."}), 400
 
-        if file_format == "pdf":
-            filename = "biodiv_report.pdf"
-            filepath = f"/tmp/{filename}"
-            c = canvas.Canvas(filepath, pagesize=letter)
-            width, height = letter
-
-            c.setFont("Helvetica-Bold", 16)
-            c.drawString(50, height - 50, "Biodiversity Risk Mitigation Report")
-            c.setFont("Helvetica", 12)
-
-            y = height - 100
-            for idx, risk in enumerate(risks):
-                c.drawString(50, y, f"{idx + 1}. {risk.get('risk_type', 'Unknown')} - {risk.get('description', '')}")
-                y -= 20
-                action = risk.get("mitigation", {}).get("action", "")
-                if isinstance(action, str):
-                    for line in action.split("\n"):
-                        c.drawString(70, y, line.strip())
-                        y -= 15
-                        if y < 100:
-                            c.showPage()
-                            y = height - 50
-
-
-            c.save()
-            return send_file(filepath, as_attachment=True, download_name=filename)
-
-        elif file_format in ["csv", "excel"]:
-            df = pd.DataFrame(risks)
-            filename = f"biodiv_report.{ 'xlsx' if file_format == 'excel' else 'csv' }"
-            filepath = f"/tmp/{filename}"
-
-            if file_format == "csv":
-                df.to_csv(filepath, index=False)
-            else:
-                writer = pd.ExcelWriter(filepath, engine="xlsxwriter")
-                df.to_excel(writer, index=False, sheet_name="Mitigation")
-                writer.close()
-
-            return send_file(filepath, as_attachment=True, download_name=filename)
-
-        else:
+        if file_format not in REPORT_FORMATS:
             return jsonify({"error": "Unsupported format."}), 400
+        filename, mimetype = REPORT_FORMATS[file_format]
+
+        attachment = {"Content-Disposition": f"attachment; filename={filename}"}
+        large = bool(data.get("large_export")) or len(risks) > LARGE_EXPORT_ROWS
+
+        # An identical report rendered earlier (e.g. by a report job) is served as-is
+        cached = report_jobs.cached_artifact(risks, file_format, large)
+        if cached:
+            return send_file(cached, mimetype=mimetype, as_attachment=True, download_name=filename)
+
+        # Large exports write row by row with a fixed layout (services/reports.py)
+        if file_format == "csv":
+            return Response(stream_with_context(iter_csv(risks, large=large)), mimetype=mimetype,
+                            headers=attachment)
+        if file_format == "excel" and large:
+            return Response(stream_with_context(iter_file(write_xlsx_large(risks))), mimetype=mimetype,
+                            headers=attachment)
+
+        # Rendered in memory and streamed; nothing is written to /tmp
+        buffer = render_pdf(risks) if file_format == "pdf" else render_xlsx(risks)
+        return send_file(buffer, mimetype=mimetype, as_attachment=True, download_name=filename)
 
     except Exception as e:
         print("⚠️ Error generating report:", str(e))
@@ -1,9 +1,7 @@
 import os
 import json
-import psycopg2
 from flask import Flask, request, jsonify, session, send_file, make_response
 from werkzeug.security import generate_password_hash, check_password_hash
-import requests
 import logging
 from flask_cors import CORS
 from flask_session import Session
@@ -23,6 +21,10 @@ try:
         query_mitigation_action,
         threat_level_from_code
     )
+    from backend.services.db import init_pool
+    from backend.utils.geocode import nominatim_search
+    from backend.utils.gazetteer import lat_lon_to_zip, zip_to_lat_lon
+    from backend.utils.autocomplete import suggest as suggest_addresses
 except ImportError:
     # Handle imports for Railway deployment structure
     from routes.account_routes import account_bp
@@ -32,6 +34,10 @@ except ImportError:
         query_mitigation_action,
         threat_level_from_code
     )
+    from services.db import init_pool
+    from utils.geocode import nominatim_search
+    from utils.gazetteer import lat_lon_to_zip, zip_to_lat_lon
+    from utils.autocomplete import suggest as suggest_addresses
 
 import xlsxwriter
 import traceback
@@ -79,7 +85,7 @@ def get_db_config():
         }
 
 DB_CONFIG = get_db_config()
-GEOCODING_API_URL = "https://nominatim.openstreetmap.org/search"
+init_pool(DB_CONFIG)
 
 # Health check endpoint for Railway
 @app.route("/", methods=["GET"])
@@ -104,78 +110,39 @@ def log_request():
         if request.method in ["POST", "PUT"]:
             print(f"Body: {request.get_data(as_text=True)}")
 
-def connect_db():
-    try:
-        if isinstance(DB_CONFIG, str):
-            # DATABASE_URL format
-            return psycopg2.connect(DB_CONFIG)
-        else:
-            # Dictionary format
-            return psycopg2.connect(**DB_CONFIG)
-    except Exception as err:
-        print(f"DB connection error: {err}")
-        return None
-
 # Get Latitude, Longitude from ZIP Code
 def get_lat_lon_from_zip(zipcode):
-    try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"postalcode": zipcode, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if response.status_code == 200 and response.json():
-            data = response.json()[0]
-            latitude = float(data["lat"])
-            longitude = float(data["lon"])
-            return latitude, longitude
-        else:
-            return 40.0583, -74.4057  # Default coordinates for New Jersey
-
-    except Exception as e:
-        print(f"Error fetching ZIP code data: {e}")
-        return 40.0583, -74.4057  # Default fallback coordinates
+    latitude, longitude = zip_to_lat_lon(zipcode)
+    if latitude is not None:
+        return latitude, longitude
+
+    results = nominatim_search({"postalcode": zipcode})
+    if results:
+        data = results[0]
+        latitude = float(data["lat"])
+        longitude = float(data["lon"])
+        return latitude, longitude
+    return 40.0583, -74.4057  # Default coordinates for New Jersey
 
 def get_lat_lon_from_address(address):
     """
     Fetch latitude, longitude, and ZIP code for a given address using Nominatim API.
-    Adjusts query parameters to avoid conflicts.
+    Lookups go through the shared geocoding cache (utils/geocode.py).
     """
-    try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": address, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if app.config['ENV'] != 'production':
-            print(f"API Request URL: {response.url}")
-            print(f"API Response Status: {response.status_code}")
-
-        if response.status_code == 200:
-            json_response = response.json()
-            
-            if json_response:
-                data = json_response[0]
-                latitude = float(data["lat"])
-                longitude = float(data["lon"])
-
-                # Extract ZIP Code if available
-                address_parts = data.get("display_name", "").split(",")
-                zip_code = address_parts[-2].strip() if len(address_parts) > 1 else None
-
-                return latitude, longitude, zip_code
-            else:
-                print("No results found for the address.")
-                return None, None, None
-        else:
-            print(f"Nominatim API Error: {response.status_code}")
-            return None, None, None
-
-    except Exception as e:
-        print(f"Error fetching address data: {e}")
-        return None, None, None
+    results = nominatim_search({"q": address})
+    if results:
+        data = results[0]
+        latitude = float(data["lat"])
+        longitude = float(data["lon"])
+
+        # Nearest NJ ZIP from the gazetteer, else guess from the display name
+        address_parts = data.get("display_name", "").split(",")
+        zip_code = lat_lon_to_zip(latitude, longitude) or (address_parts[-2].strip() if len(address_parts) > 1 else None)
+
+        return latitude, longitude, zip_code
+
+    print("No results found for the address.")
+    return None, None, None
 
 @app.route("/address-autocomplete", methods=["GET"])
 def address_autocomplete():
@@ -183,27 +150,22 @@ def address_autocomplete():
     if not query:
         return jsonify([])
 
-    try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": query, "countrycodes": "us", "format": "json", "limit": 5},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if response.status_code == 200:
-            suggestions = [
-                {"display_name": item.get("display_name", "")}
-                for item in response.json()
-                if "New Jersey" in item.get("display_name", "")
-            ]
-            return jsonify(suggestions)
-        else:
-            print(f"Nominatim API returned status {response.status_code}")
-            return jsonify([])
-    except Exception as e:
-        print(f"Error fetching autocomplete data: {e}")
+    # Local NJ prefix index first; the online geocoder only handles misses
+    local = suggest_addresses(query, limit=5)
+    if local:
+        return jsonify([{"display_name": item["display_name"]} for item in local])
+
+    results = nominatim_search({"q": query, "limit": 5})
+    if results is None:
         return jsonify([])
 
+    suggestions = [
+        {"display_name": item.get("display_name", "")}
+        for item in results
+        if "New Jersey" in item.get("display_name", "")
+    ]
+    return jsonify(suggestions)
+
 def standardize_threat_status(status):
     mapping = {
         "critically endangered": "high",
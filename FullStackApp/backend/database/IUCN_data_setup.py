@@ -1,24 +1,15 @@
+import os
+import sys
+
 import pandas as pd
-from sqlalchemy import create_engine
 import psycopg2
 
-# 🔹 Database credentials
-db_host = 'localhost'
-db_name = 'postgres'  # Change if needed
-db_user = 'postgres'        # Replace with your PostgreSQL username
-db_password = 'password.'  # Replace with your PostgreSQL password
-
-# 🔹 PostgreSQL connection string
-conn_str = f'postgresql://{db_user}:{db_password}@{db_host}/{db_name}'
-engine = create_engine(conn_str)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import ingest_frame
+from services.db import get_database_url
 
-# 🔹 Connect to PostgreSQL
-conn = psycopg2.connect(
-    dbname=db_name,
-    user=db_user,
-    password=db_password,
-    host=db_host
-)
+# 🔹 Connect to PostgreSQL (DATABASE_URL or DB_CONFIG, the same database ingest_frame writes to)
+conn = psycopg2.connect(get_database_url())
 cur = conn.cursor()
 
 # 🔹 Step 1: Create Table If It Does Not Exist
@@ -57,9 +48,9 @@ df = df[valid_columns]
 
 # 🔹 Step 4: Insert Data into PostgreSQL
 try:
-    df.to_sql('iucn_data', engine, if_exists='append', index=False)
-    conn.commit()  # ✅ Ensure changes are saved
-    print("✅ Data successfully inserted and committed to PostgreSQL.")
+    # Upsert on (species_name, latitude, longitude); a rerun no longer duplicates rows
+    changed = ingest_frame('iucn_data', df, csv_path, prune=True)
+    print(f"✅ Data successfully upserted into PostgreSQL ({changed} rows changed).")
 except Exception as e:
     print(f"❌ Error: {e}")
 
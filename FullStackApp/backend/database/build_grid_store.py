@@ -0,0 +1,64 @@
+"""
+Grid Store Build Script
+Packs the freshwater, marine and terrestrial HCI layers from PostgreSQL into
+memory-mappable NumPy files (see services/grid_store.py).
+
+Rerun after any *_setup.py / risk import script so the packed grids match the
+database; until then the app serves those layers from SQL, because the store
+records the dataset version it was packed from. Output goes to GRID_STORE_DIR
+(default: backend/grid_store, where the app loads it from).
+"""
+import os
+import sys
+import logging
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.grid_store import GRID_STORE_DIR, pack_layer
+from services.db import get_database_url
+from database.build_tiles import read_dataset_version
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def marine_level(hci):
+    """Same thresholds /search applies to marine_hci scores"""
+    hci = hci or 0
+    return "High" if hci >= 0.75 else "Moderate" if hci >= 0.4 else "Low"
+
+# Layer -> query returning x, y, value, level
+LAYER_QUERIES = {
+    "freshwater_risk": "SELECT x, y, normalized_risk AS value, risk_level AS level FROM freshwater_risk",
+    "marine_hci": "SELECT x, y, marine_hci AS value FROM marine_hci",
+    "terrestrial_risk": "SELECT x, y, normalized_risk AS value, risk_level AS level FROM terrestrial_risk",
+}
+
+def build_grid_store(out_dir):
+    """Pack every grid layer into out_dir"""
+    engine = create_engine(get_database_url())
+    # Read before the layers: a load that lands mid-build leaves the store marked stale
+    dataset_version = read_dataset_version(engine)
+    success = True
+
+    for layer, query in LAYER_QUERIES.items():
+        try:
+            df = pd.read_sql(query, engine).dropna(subset=["x", "y"])
+            if df.empty:
+                logger.warning(f"⚠️ {layer} is empty. Skipping.")
+                continue
+            if layer == "marine_hci":
+                df["level"] = [marine_level(v) for v in df["value"]]
+            df["value"] = df["value"].astype(float)
+
+            pack_layer(layer, df["x"], df["y"], df["value"], df["level"], out_dir, dataset_version)
+            logger.info(f"✅ Packed {len(df)} {layer} cells into {out_dir}")
+        except Exception as e:
+            logger.error(f"❌ Error packing {layer}: {e}")
+            success = False
+
+    return success
+
+if __name__ == "__main__":
+    build_grid_store(GRID_STORE_DIR)
@@ -0,0 +1,70 @@
+"""
+Tile Pyramid Build Script
+Renders every risk layer from PostgreSQL into the z/x/y tile pyramid served
+by /tiles/<layer>/<z>/<x>/<y> (see services/tiles.py).
+
+Rerun after any *_setup.py / risk import script. Output goes to TILE_DIR
+(default: backend/tiles); tiles are written to a fresh directory and swapped in,
+so the endpoint never serves a half-built pyramid.
+"""
+import os
+import sys
+import shutil
+import logging
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.tiles import TILE_DIR, TILE_MAX_ZOOM, TILE_MIN_ZOOM, build_tile_pyramid, write_manifest
+from services.risk_search import ASSESSMENT_LAYERS
+from services.spatial import RISK_LAYER_COORDS
+from services.db import get_database_url
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def read_dataset_version(engine):
+    try:
+        return str(pd.read_sql("SELECT version FROM dataset_version WHERE id = 1", engine).iloc[0, 0])
+    except Exception:
+        return None
+
+
+def build_tiles(tile_dir, min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM):
+    """Build the pyramid for every layer into tile_dir"""
+    engine = create_engine(get_database_url())
+    build_dir = f"{tile_dir}.building"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    layers = {}
+
+    for table, (risk_type, level_sql) in ASSESSMENT_LAYERS.items():
+        lon_col, lat_col = RISK_LAYER_COORDS[table]
+        try:
+            df = pd.read_sql(f"SELECT {lat_col} AS lat, {lon_col} AS lon, {level_sql} AS level FROM {table}", engine)
+            df = df.dropna(subset=["lat", "lon"])
+            count = build_tile_pyramid(table, df["lat"].values, df["lon"].values, df["level"].tolist(),
+                                       build_dir, min_zoom, max_zoom)
+            layers[table] = {"risk_type": risk_type, "points": int(len(df)), "tiles": count}
+            logger.info(f"✅ {table}: {len(df)} points -> {count} tiles")
+        except Exception as e:
+            logger.error(f"❌ Error building tiles for {table}: {e}")
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return False
+
+    write_manifest(build_dir, layers, min_zoom, max_zoom, read_dataset_version(engine))
+
+    old_dir = f"{tile_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(tile_dir):
+        os.replace(tile_dir, old_dir)
+    os.replace(build_dir, tile_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    logger.info(f"🎉 Tile pyramid ready in {tile_dir}")
+    return True
+
+
+if __name__ == "__main__":
+    build_tiles(TILE_DIR)
@@ -0,0 +1,222 @@
+"""
+Bulk Load Script
+Streams layer CSVs into PostgreSQL with COPY FROM STDIN, replacing the
+row-by-row INSERT loops of freshwater_risk.py, marine_water_risk.py and
+terrestrial_data_setup.py.
+
+Each layer is copied in chunks into a staging table shaped like the live
+table, indexed, clustered on its GiST point index and analyzed, then swapped
+in with a rename inside one short transaction. /search keeps reading the old
+rows until the swap commits, so it never sees a half-loaded layer.
+Independent layers load in parallel on their own connections. After a
+successful load the dataset version is bumped so the result caches refill.
+Sources may be CSV or Parquet (services/table_io.py); only the table's
+columns are read, and a .parquet sibling of a default CSV is preferred.
+
+Usage:
+    python database/bulk_load.py                      # every layer in LOAD_SPECS
+    python database/bulk_load.py freshwater_risk      # selected layers
+    python database/bulk_load.py marine_hci=path.csv  # a different CSV
+"""
+import io
+import os
+import sys
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import table_io
+from services.dataset_version import bump_dataset_version
+from services.db import get_database_url
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = int(os.environ.get("LOAD_CHUNK_ROWS", 100000))
+LOAD_WORKERS = int(os.environ.get("LOAD_WORKERS", 4))
+
+# table -> (default source, source column renames)
+LOAD_SPECS = {
+    "iucn_data": ("cleaned_IUCN_data.csv", {"endangered": "threat_status"}),
+    "freshwater_risk": ("freshwater_risk_updated.csv", {}),
+    "marine_risk": ("marine_risk_updated.csv", {}),
+    "marine_hci": ("marine_human_coexistence_nj.csv", {}),
+    "terrestrial_risk": ("terrestrial_risk_updated.csv", {}),
+}
+
+
+def normalize_column(name):
+    return name.strip().lower().replace(" ", "_")
+
+
+def source_names(csv_path, renames=None):
+    """{source column: table column} for every column of the CSV or Parquet source."""
+    renames = renames or {}
+    return {c: renames.get(normalize_column(c), normalize_column(c)) for c in table_io.read_columns(csv_path)}
+
+
+def csv_columns(csv_path, table_columns, renames=None):
+    """Source columns (normalized and renamed) that exist in the table."""
+    header = list(source_names(csv_path, renames).values())
+    columns = [c for c in header if c in table_columns and c != "id"]
+    skipped = [c for c in header if c not in columns]
+    if skipped:
+        logger.warning(f"⚠️ {os.path.basename(csv_path)}: ignoring columns not in the table: {skipped}")
+    if not columns:
+        raise ValueError(f"{csv_path} has no columns in common with the table")
+    return columns
+
+
+def csv_chunks(csv_path, columns, renames=None, chunk_rows=CHUNK_ROWS):
+    """CSV text buffers of chunk_rows rows with the given columns, ready for COPY ... (FORMAT csv)."""
+    wanted = {source: name for source, name in source_names(csv_path, renames).items() if name in columns}
+    for chunk in table_io.iter_frames(csv_path, chunk_rows, columns=list(wanted)):
+        chunk = chunk.rename(columns=wanted)
+        buffer = io.StringIO()
+        chunk[columns].to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        yield len(chunk), buffer
+
+
+def staged_index_definitions(indexes, table, staging):
+    """
+    (staging index name, live index name, DDL statements) for every
+    (name, definition, is_primary) index of the live table, rewritten to
+    target the staging table.
+    """
+    statements = []
+    for name, definition, primary in indexes:
+        staged = f"{name}_staging"
+        ddl = definition.replace(f" INDEX {name} ON ", f" INDEX {staged} ON ", 1)
+        ddl = ddl.replace(f" ON public.{table} ", f" ON public.{staging} ", 1).replace(f" ON {table} ", f" ON {staging} ", 1)
+        ddl = [ddl]
+        if primary:
+            ddl.append(f"ALTER TABLE {staging} ADD CONSTRAINT {staged} PRIMARY KEY USING INDEX {staged}")
+        statements.append((staged, name, ddl))
+    return statements
+
+
+def load_layer(table, csv_path, renames=None):
+    """COPY csv_path into a staging copy of table and swap it in; returns the row count."""
+    staging = f"{table}_staging"
+    started = time.time()
+    conn = psycopg2.connect(get_database_url())
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+            table_columns = {row[0] for row in cur.fetchall()}
+            if not table_columns:
+                raise ValueError(f"table {table} does not exist; run railway_db_setup.py first")
+            columns = csv_columns(csv_path, table_columns, renames)
+
+            cur.execute(f"DROP TABLE IF EXISTS {staging}")
+            # Indexes are built after the COPY, which is much faster than maintaining them per row
+            cur.execute(f"CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            copy_sql = f"COPY {staging} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+            rows = 0
+            for count, buffer in csv_chunks(csv_path, columns, renames):
+                cur.copy_expert(copy_sql, buffer)
+                rows += count
+
+            cur.execute("""
+                SELECT i.relname, pg_get_indexdef(i.oid), x.indisprimary
+                FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+                WHERE x.indrelid = %s::regclass
+            """, (table,))
+            indexes = staged_index_definitions(cur.fetchall(), table, staging)
+            for _, _, ddl in indexes:
+                for statement in ddl:
+                    cur.execute(statement)
+            if f"idx_{table}_geo_staging" in {staged for staged, _, _ in indexes}:
+                # Same physical ordering as railway_db_setup.create_spatial_indexes()
+                cur.execute(f"CLUSTER {staging} USING idx_{table}_geo_staging")
+            cur.execute(f"ANALYZE {staging}")
+            conn.commit()
+
+            # The swap: readers block only for the renames
+            cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+            sequence = None
+            if "id" in table_columns:
+                cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+                sequence = cur.fetchone()[0]
+            if sequence:
+                # The staged id default uses the live table's sequence; keep it when the old table goes
+                cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {staging}.id")
+            cur.execute(f"DROP TABLE {table}")
+            cur.execute(f"ALTER TABLE {staging} RENAME TO {table}")
+            for staged, name, _ in indexes:
+                cur.execute(f"ALTER INDEX {staged} RENAME TO {name}")
+            cur.execute("SELECT to_regclass('ingest_manifest')")
+            if cur.fetchone()[0]:
+                # The table no longer matches the checksums ingest.py recorded for it
+                cur.execute("DELETE FROM ingest_manifest WHERE table_name = %s", (table,))
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {staging}")
+        conn.commit()
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"✅ {table}: {rows} rows from {csv_path} in {time.time() - started:.1f}s")
+    return rows
+
+
+def load_layers(sources):
+    """Load {table: csv_path} concurrently; bumps the dataset version if anything loaded."""
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+        futures = {table: pool.submit(load_layer, table, path, LOAD_SPECS.get(table, (None, {}))[1])
+                   for table, path in sources.items()}
+    loaded, success = {}, True
+    for table, future in futures.items():
+        try:
+            loaded[table] = future.result()
+        except Exception as e:
+            logger.error(f"❌ Error loading {table}: {e}")
+            success = False
+
+    if loaded:
+        conn = psycopg2.connect(get_database_url())
+        try:
+            with conn.cursor() as cur:
+                version = bump_dataset_version(cur)
+            conn.commit()
+            logger.info(f"🔁 Dataset version is now {version}; rebuild the grid store and tiles if needed")
+        finally:
+            conn.close()
+    return success
+
+
+def parse_sources(args):
+    """{table: csv_path} from CLI arguments (table or table=path); every layer if none."""
+    if not args:
+        sources = {table: table_io.find_input(path) for table, (path, _) in LOAD_SPECS.items()}
+        return {table: path for table, path in sources.items() if os.path.exists(path)}
+    sources = {}
+    for arg in args:
+        table, _, path = arg.partition("=")
+        if not path:
+            if table not in LOAD_SPECS:
+                raise SystemExit(f"Unknown layer {table}; pass {table}=path/to/file.csv")
+            path = table_io.find_input(LOAD_SPECS[table][0])
+        sources[table] = path
+    return sources
+
+
+def main(args=None):
+    sources = parse_sources(sys.argv[1:] if args is None else args)
+    if not sources:
+        logger.warning("⚠️ No layer CSVs found. Nothing to load.")
+        return False
+    logger.info(f"🚀 Loading {', '.join(sources)}...")
+    return load_layers(sources)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,43 @@
+"""
+Table Conversion Script
+Converts pipeline tables between CSV and Parquet with services/table_io.py:
+import a delivered CSV as typed, compressed Parquet, or export a Parquet
+intermediate as CSV. The format follows each path's extension; conversion
+streams in chunks, so large grids never sit in memory.
+
+Usage:
+    python database/convert_table.py marine_human_coexistence_nj.csv marine_human_coexistence_nj.parquet
+    python database/convert_table.py terrestrial_risk_updated.parquet terrestrial_risk_updated.csv
+"""
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import table_io
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else list(args)
+    if len(args) != 2:
+        logger.error("❌ Usage: convert_table.py SOURCE DESTINATION")
+        return False
+    source, destination = args
+    if (table_io.is_parquet(source) or table_io.is_parquet(destination)) and table_io.pq is None:
+        logger.error("❌ Parquet needs pyarrow (see requirements-full.txt)")
+        return False
+    try:
+        rows = table_io.convert(source, destination)
+    except Exception as e:
+        logger.error(f"❌ Error converting {source}: {e}")
+        return False
+    logger.info(f"✅ {rows} rows: {source} -> {destination}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
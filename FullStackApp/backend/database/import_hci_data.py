@@ -1,24 +1,15 @@
+import os
+import sys
+
 import pandas as pd
-from sqlalchemy import create_engine
 import psycopg2
 
-# 🔹 Database credentials
-db_host = 'localhost'
-db_name = 'postgres'  # Change if needed
-db_user = 'postgres'        # Replace with your PostgreSQL username
-db_password = 'password.'  # Replace with your PostgreSQL password
-
-# 🔹 PostgreSQL connection string
-conn_str = f'postgresql://{db_user}:{db_password}@{db_host}/{db_name}'
-engine = create_engine(conn_str)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ingest import ingest_frame
+from services.db import get_database_url
 
-# 🔹 Connect to PostgreSQL
-conn = psycopg2.connect(
-    dbname=db_name,
-    user=db_user,
-    password=db_password,
-    host=db_host
-)
+# 🔹 Connect to PostgreSQL (DATABASE_URL or DB_CONFIG, the same database ingest_frame writes to)
+conn = psycopg2.connect(get_database_url())
 cur = conn.cursor()
 
 # 🔹 Step 1: Create Tables (If Not Exists)
@@ -83,10 +74,9 @@ for table_name, csv_path in csv_files.items():
         # Rename columns to lowercase and replace spaces with underscores
         df.columns = [col.lower().replace(" ", "_") for col in df.columns]
 
-        # Insert into PostgreSQL
-        df.to_sql(table_name, engine, if_exists='append', index=False)
-        conn.commit()
-        print(f"✅ Data successfully inserted into `{table_name}`")
+        # Upsert on the cell's (x, y); unchanged files are skipped via the ingest manifest
+        changed = ingest_frame(table_name, df, csv_path, prune=True)
+        print(f"✅ Data successfully upserted into `{table_name}` ({changed} rows changed)")
 
     except Exception as e:
         print(f"❌ Error inserting `{table_name}`: {e}")
@@ -0,0 +1,251 @@
+"""
+Incremental Ingest Script
+Loads layer data as upserts on natural keys, skipping anything whose content
+hash has not changed since the last run.
+
+The ingest_manifest table records a SHA-256 per source file (chunk -1) and per
+CHUNK_ROWS-row chunk. An unchanged file is skipped outright. Otherwise each
+changed chunk is copied into a temp table and upserted on the layer's
+NATURAL_KEYS (a unique index, created on first use after removing the
+duplicates earlier appends left behind). Only rows whose values really
+differ are rewritten. With prune (the default for a CSV that is the layer's
+only source), rows whose key no longer appears in the file are deleted. Rows
+with a NULL key cannot be matched and are skipped.
+
+Everything for one source happens in one transaction, and the dataset
+version is bumped in that same transaction when any row changed, so the
+result caches key on the new data immediately.
+
+Usage:
+    python database/ingest.py                       # every layer in bulk_load.LOAD_SPECS
+    python database/ingest.py iucn_data=cleaned.csv
+"""
+import hashlib
+import io
+import os
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import table_io
+from services.dataset_version import bump_dataset_version
+from services.db import get_database_url
+from database.bulk_load import CHUNK_ROWS, LOAD_SPECS, LOAD_WORKERS, normalize_column, parse_sources, source_names
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# table -> columns identifying a row across reloads
+NATURAL_KEYS = {
+    "iucn_data": ("species_name", "latitude", "longitude"),
+    "invasive_species": ("species_name", "latitude", "longitude"),
+    "freshwater_risk": ("x", "y"),
+    "marine_hci": ("x", "y"),
+    "marine_risk": ("latitude", "longitude"),
+    "terrestrial_risk": ("x", "y"),
+    "freshwater_hci": ("x", "y"),
+    "terrestrial_hci": ("x", "y"),
+}
+
+MANIFEST_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_manifest (
+        table_name TEXT NOT NULL,
+        source TEXT NOT NULL,
+        chunk INTEGER NOT NULL,
+        checksum TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        loaded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (table_name, source, chunk)
+    )
+"""
+FILE_CHUNK = -1
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def csv_frames(csv_path, renames=None, chunk_rows=CHUNK_ROWS):
+    """DataFrame chunks of a CSV or Parquet source with normalized (and renamed) column names."""
+    names = source_names(csv_path, renames)
+    for chunk in table_io.iter_frames(csv_path, chunk_rows):
+        yield chunk.rename(columns=names)
+
+
+def chunk_text(frame, columns):
+    """(checksum, COPY text) of a chunk; the checksum covers exactly the copied text."""
+    text = frame[list(columns)].to_csv(header=False, index=False)
+    return hashlib.sha256(text.encode()).hexdigest(), text
+
+
+def upsert_sql(table, columns, keys, source_table):
+    """
+    INSERT ... ON CONFLICT on the natural key from source_table; conflicting
+    rows are only updated when a value differs. The last row of a duplicated
+    key in the source wins.
+    """
+    key_list = ", ".join(keys)
+    column_list = ", ".join(columns)
+    updates = [c for c in columns if c not in keys]
+    if updates:
+        conflict = (f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in updates)} "
+                    f"WHERE ({', '.join(f'{table}.{c}' for c in updates)}) "
+                    f"IS DISTINCT FROM ({', '.join(f'EXCLUDED.{c}' for c in updates)})")
+    else:
+        conflict = "DO NOTHING"
+    return (f"INSERT INTO {table} ({column_list}) "
+            f"SELECT DISTINCT ON ({key_list}) {column_list} FROM {source_table} "
+            f"WHERE {' AND '.join(f'{k} IS NOT NULL' for k in keys)} "
+            f"ORDER BY {key_list}, ctid DESC "
+            f"ON CONFLICT ({key_list}) {conflict}")
+
+
+def prune_sql(table, keys, seen_table):
+    """DELETE of the rows whose natural key is not in seen_table."""
+    match = " AND ".join(f"s.{k} = {table}.{k}" for k in keys)
+    return f"DELETE FROM {table} WHERE NOT EXISTS (SELECT 1 FROM {seen_table} s WHERE {match})"
+
+
+def ensure_natural_key(cur, table, keys):
+    """Unique index on the natural key, removing duplicate rows first if it is new."""
+    index = f"uq_{table}_natural_key"
+    cur.execute("SELECT 1 FROM pg_indexes WHERE tablename = %s AND indexname = %s", (table, index))
+    if cur.fetchone():
+        return
+    match = " AND ".join(f"a.{k} = b.{k}" for k in keys)
+    cur.execute(f"DELETE FROM {table} a USING {table} b WHERE a.ctid < b.ctid AND {match}")
+    if cur.rowcount:
+        logger.info(f"🧹 {table}: removed {cur.rowcount} duplicate rows")
+    cur.execute(f"CREATE UNIQUE INDEX {index} ON {table} ({', '.join(keys)})")
+
+
+def ingest(table, source, checksum, frames, prune=True):
+    """
+    Upsert the DataFrame chunks of one source into table. checksum is the
+    whole source's hash. Returns the number of rows inserted, updated or
+    deleted (0 if the source is unchanged).
+    """
+    keys = NATURAL_KEYS[table]
+    conn = psycopg2.connect(get_database_url())
+    try:
+        with conn.cursor() as cur:
+            cur.execute(MANIFEST_DDL)
+            cur.execute("SELECT chunk, checksum FROM ingest_manifest WHERE table_name = %s AND source = %s",
+                        (table, source))
+            known = dict(cur.fetchall())
+            if known.get(FILE_CHUNK) == checksum:
+                conn.commit()
+                logger.info(f"⏭️ {table}: {source} unchanged, skipped")
+                return 0
+
+            cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = %s", (table,))
+            table_columns = {row[0] for row in cur.fetchall()}
+            if not table_columns:
+                raise ValueError(f"table {table} does not exist; run railway_db_setup.py first")
+            ensure_natural_key(cur, table, keys)
+
+            cur.execute(f"CREATE TEMP TABLE ingest_rows (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cur.execute(f"CREATE TEMP TABLE ingest_seen ON COMMIT DROP AS SELECT {', '.join(keys)} FROM {table} WITH NO DATA")
+
+            changed, chunks, skipped, columns = 0, 0, 0, None
+            for frame in frames:
+                if columns is None:
+                    columns = [c for c in frame.columns if c in table_columns and c != "id"]
+                    missing = [k for k in keys if k not in columns]
+                    if missing:
+                        raise ValueError(f"{source} is missing natural key columns {missing}")
+                chunk_checksum, text = chunk_text(frame, columns)
+                unchanged = known.get(chunks) == chunk_checksum
+                chunks += 1
+                if unchanged:
+                    skipped += 1
+                    if not prune:
+                        continue
+                cur.execute("TRUNCATE ingest_rows")
+                cur.copy_expert(f"COPY ingest_rows ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                                io.StringIO(text))
+                if prune:
+                    cur.execute(f"INSERT INTO ingest_seen SELECT {', '.join(keys)} FROM ingest_rows")
+                if unchanged:
+                    continue
+                cur.execute(upsert_sql(table, columns, keys, "ingest_rows"))
+                changed += cur.rowcount
+                cur.execute("""
+                    INSERT INTO ingest_manifest (table_name, source, chunk, checksum, row_count)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (table_name, source, chunk)
+                    DO UPDATE SET checksum = EXCLUDED.checksum, row_count = EXCLUDED.row_count,
+                                  loaded_at = CURRENT_TIMESTAMP
+                """, (table, source, chunks - 1, chunk_checksum, len(frame)))
+
+            if prune:
+                cur.execute(prune_sql(table, keys, "ingest_seen"))
+                changed += cur.rowcount
+            cur.execute("DELETE FROM ingest_manifest WHERE table_name = %s AND source = %s AND chunk >= %s",
+                        (table, source, chunks))
+            cur.execute("""
+                INSERT INTO ingest_manifest (table_name, source, chunk, checksum, row_count)
+                VALUES (%s, %s, %s, %s, 0)
+                ON CONFLICT (table_name, source, chunk)
+                DO UPDATE SET checksum = EXCLUDED.checksum, loaded_at = CURRENT_TIMESTAMP
+            """, (table, source, FILE_CHUNK, checksum))
+            version = bump_dataset_version(cur) if changed else None
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    logger.info(f"✅ {table}: {changed} rows changed from {source} "
+                f"({chunks - skipped} of {chunks} chunks changed)"
+                + (f", dataset version {version}" if version else ""))
+    return changed
+
+
+def ingest_csv(table, csv_path, renames=None, prune=True):
+    renames = LOAD_SPECS.get(table, (None, {}))[1] if renames is None else renames
+    return ingest(table, os.path.basename(csv_path), file_checksum(csv_path),
+                  csv_frames(csv_path, renames), prune=prune)
+
+
+def ingest_frame(table, df, source, prune=False):
+    """Upsert an in-memory DataFrame (e.g. seed data) as source."""
+    df = df.rename(columns=normalize_column)
+    checksum = hashlib.sha256(df.to_csv(index=False).encode()).hexdigest()
+    return ingest(table, source, checksum, [df], prune=prune)
+
+
+def ingest_layers(sources):
+    """Ingest {table: csv_path} concurrently; returns False if any layer failed."""
+    with ThreadPoolExecutor(max_workers=LOAD_WORKERS) as pool:
+        futures = {table: pool.submit(ingest_csv, table, path) for table, path in sources.items()}
+    success = True
+    for table, future in futures.items():
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"❌ Error ingesting {table}: {e}")
+            success = False
+    return success
+
+
+def main(args=None):
+    sources = parse_sources(sys.argv[1:] if args is None else args)
+    if not sources:
+        logger.warning("⚠️ No layer CSVs found. Nothing to ingest.")
+        return False
+    logger.info(f"🚀 Ingesting {', '.join(sources)}...")
+    return ingest_layers(sources)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -3,34 +3,22 @@ Railway Data Import Script
 This script imports all your local data into Railway PostgreSQL database
 """
 import os
+import sys
 import pandas as pd
 import psycopg2
 from sqlalchemy import create_engine
 import logging
 import json
 from pathlib import Path
+from ingest import ingest_frame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.db import get_database_url
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_database_url():
-    """Get database URL from Railway environment variables"""
-    database_url = os.environ.get('DATABASE_URL')
-    if not database_url:
-        # Fallback for local development
-        host = os.environ.get('DB_HOST', 'localhost')
-        user = os.environ.get('DB_USER', 'postgres')
-        password = os.environ.get('DB_PASSWORD', 'password')
-        dbname = os.environ.get('DB_NAME', 'postgres')
-        database_url = f'postgresql://{user}:{password}@{host}/{dbname}'
-    
-    # Fix postgres:// to postgresql:// if needed
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-    
-    return database_url
-
 def import_iucn_data():
     """Import IUCN data if CSV file exists"""
     try:
@@ -78,10 +66,9 @@ def import_iucn_data():
         df = df[existing_columns]
         
         # Import to database
-        engine = create_engine(get_database_url())
-        df.to_sql('iucn_data', engine, if_exists='append', index=False)
+        changed = ingest_frame('iucn_data', df, os.path.basename(csv_path), prune=True)
         
-        logger.info(f"✅ Imported {len(df)} IUCN records successfully!")
+        logger.info(f"✅ Imported {len(df)} IUCN records successfully ({changed} rows changed)!")
         return True
         
     except Exception as e:
@@ -94,8 +81,6 @@ def import_risk_data():
         # This would run your existing risk assessment data setup scripts
         # For now, we'll create sample data
         
-        engine = create_engine(get_database_url())
-        
         # Sample freshwater risk data
         freshwater_data = pd.DataFrame({
             'x': [-74.0, -74.1, -74.2, -74.3],
@@ -124,10 +109,10 @@ def import_risk_data():
             'biodiversity_index': [0.5, 0.8, 0.6]
         })
         
-        # Import all data
-        freshwater_data.to_sql('freshwater_risk', engine, if_exists='append', index=False)
-        marine_data.to_sql('marine_hci', engine, if_exists='append', index=False)
-        terrestrial_data.to_sql('terrestrial_risk', engine, if_exists='append', index=False)
+        # Upsert all data; sample rows share the tables with real data, so nothing is pruned
+        ingest_frame('freshwater_risk', freshwater_data, 'railway_data_import:sample')
+        ingest_frame('marine_hci', marine_data, 'railway_data_import:sample')
+        ingest_frame('terrestrial_risk', terrestrial_data, 'railway_data_import:sample')
         
         logger.info("✅ Risk assessment data imported successfully!")
         return True
@@ -154,8 +139,7 @@ def import_invasive_species_data():
             'impact_severity': ['severe', 'moderate', 'severe']
         })
         
-        engine = create_engine(get_database_url())
-        invasive_data.to_sql('invasive_species', engine, if_exists='append', index=False)
+        ingest_frame('invasive_species', invasive_data, 'railway_data_import:sample')
         
         logger.info(f"✅ Imported {len(invasive_data)} invasive species records!")
         return True
@@ -3,6 +3,7 @@ Railway Database Setup Script
 This script initializes all database tables and imports data for Railway PostgreSQL
 """
 import os
+import sys
 import pandas as pd
 import psycopg2
 from sqlalchemy import create_engine, Column, Integer, String, TIMESTAMP, text, Float, Text
@@ -10,27 +11,14 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.db import get_database_url
+from services.spatial import RISK_LAYER_COORDS, spatial_index_name, spatial_index_statements
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_database_url():
-    """Get database URL from Railway environment variables"""
-    database_url = os.environ.get('DATABASE_URL')
-    if not database_url:
-        # Fallback for local development
-        host = os.environ.get('DB_HOST', 'localhost')
-        user = os.environ.get('DB_USER', 'postgres')
-        password = os.environ.get('DB_PASSWORD', 'password')
-        dbname = os.environ.get('DB_NAME', 'postgres')
-        database_url = f'postgresql://{user}:{password}@{host}/{dbname}'
-    
-    # Fix postgres:// to postgresql:// if needed (Railway sometimes uses postgres://)
-    if database_url.startswith('postgres://'):
-        database_url = database_url.replace('postgres://', 'postgresql://', 1)
-    
-    return database_url
-
 # Database setup
 DATABASE_URL = get_database_url()
 engine = create_engine(DATABASE_URL, echo=True)
@@ -183,6 +171,29 @@ def create_database_indexes():
         logger.error(f"❌ Error creating indexes: {e}")
         return False
 
+def create_spatial_indexes(cluster=True):
+    """Create GiST spatial indexes and optionally cluster each layer on them"""
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cur = conn.cursor()
+        
+        # Same DDL the /search bounding-box queries are written against
+        for table, statement in zip(RISK_LAYER_COORDS, spatial_index_statements()):
+            cur.execute(statement)
+            if cluster:
+                # Physically order rows by location so a bbox hit reads few pages
+                cur.execute(f"CLUSTER {table} USING {spatial_index_name(table)};")
+            cur.execute(f"ANALYZE {table};")
+        
+        conn.commit()
+        cur.close()
+        conn.close()
+        logger.info("✅ Spatial indexes created successfully!")
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error creating spatial indexes: {e}")
+        return False
+
 def main():
     """Main setup function"""
     logger.info("🚀 Starting Railway database setup...")
@@ -207,6 +218,11 @@ def main():
         logger.error("Failed to create indexes")
         return False
     
+    # Step 5: Create spatial indexes for the risk layer lookups
+    if not create_spatial_indexes():
+        logger.error("Failed to create spatial indexes")
+        return False
+    
     logger.info("🎉 Database setup completed successfully!")
     logger.info("📊 Database is ready for data import!")
     
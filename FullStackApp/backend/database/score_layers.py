@@ -0,0 +1,51 @@
+"""
+Risk Scoring Script
+Recomputes the freshwater, terrestrial and marine risk scores from the HCI
+source CSVs with the scoring engine in services/risk_scoring.py.
+
+Usage:
+    python database/score_layers.py                # every layer
+    python database/score_layers.py freshwater     # selected layers
+    python database/score_layers.py --chunked      # out of core, SCORING_CHUNK_ROWS rows at a time
+
+Reads and writes in SCORING_DATA_DIR (default: the current directory); load
+the *_risk_updated outputs (Parquet with pyarrow, else CSV; see
+PIPELINE_FORMAT in services/table_io.py) with bulk_load.py or ingest.py.
+"""
+import os
+import sys
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services.risk_scoring import SCORING_CHUNK_ROWS, SCORING_LAYERS, score_layers
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else list(args)
+    chunked = "--chunked" in args
+    layers = [arg for arg in args if arg != "--chunked"] or list(SCORING_LAYERS)
+    unknown = [layer for layer in layers if layer not in SCORING_LAYERS]
+    if unknown:
+        logger.error(f"❌ Unknown layers {unknown}; choose from {list(SCORING_LAYERS)}")
+        return False
+
+    started = time.time()
+    try:
+        counts = score_layers(layers, data_dir=os.environ.get("SCORING_DATA_DIR", "."),
+                              chunk_rows=SCORING_CHUNK_ROWS if chunked else None)
+    except Exception as e:
+        logger.error(f"❌ Error scoring layers: {e}")
+        return False
+    for layer, (output, count) in counts.items():
+        logger.info(f"✅ {layer}: {count} cells -> {output}")
+    logger.info(f"🎉 Scored {len(counts)} layers in {time.time() - started:.1f}s")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,9 +1,14 @@
-import pandas as pd
+import os
+import sys
+
 import numpy as np
 import matplotlib.pyplot as plt
 
-# Load your updated dataset (change path if needed)
-df = pd.read_csv("terrestrial_risk_updated.csv")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import table_io
+
+# Load your updated dataset (change path if needed; Parquet or CSV)
+df = table_io.read_table(table_io.find_input("terrestrial_risk_updated.csv"))
 
 # 🔹 Plot 1: Histogram of Normalized Risk
 plt.figure(figsize=(8, 5))
@@ -1,15 +1,94 @@
+import hashlib
+import json
+import os
+import time
+
 import pandas as pd
-from chromadb import PersistentClient
-from sentence_transformers import SentenceTransformer
-
-# Connect to existing ChromaDB
-chroma_client = PersistentClient(path="./ML Strategy/chroma_storage_rag")
-chroma_collection = chroma_client.get_or_create_collection(name="mitigation_knowledge")
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-# Optional peek
-print("🔎 Sample entries from ChromaDB:")
-print(chroma_collection.peek(3))
-print("📦 Total embeddings:", chroma_collection.count())
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CHROMA_PATH = os.path.join(BASE_DIR, "ML Strategy", "chroma_storage_rag")
+CATALOGUE_PATH = os.environ.get(
+    "MITIGATION_CATALOGUE_PATH",
+    os.path.join(BASE_DIR, "ML Strategy", "mitigation_catalogue.json")
+)
+
+# Every (risk_type, threat_level) pair /search and the reports can ask for
+CATALOGUE_RISK_TYPES = ["Invasive Species", "IUCN", "Freshwater Risk", "Marine Risk", "Terrestrial Risk"]
+CATALOGUE_THREAT_LEVELS = ["high", "moderate", "medium", "low", "unknown"]
+
+# How often the loaded catalogue checks its file for a newer build (seconds)
+CATALOGUE_RELOAD_INTERVAL = 30
+
+_chroma_collection = None
+_chroma_available = True
+_embedder = None
+_catalogue = {"version": None, "entries": {}}
+_catalogue_path = CATALOGUE_PATH
+_catalogue_mtime = None
+_catalogue_checked_at = 0.0
+# Catalogue keys ChromaDB had no match for; cleared whenever the catalogue reloads
+_chroma_misses = set()
+
+
+def get_chroma_collection():
+    """Connect to the existing ChromaDB collection on first use."""
+    global _chroma_collection
+    if _chroma_collection is None:
+        from chromadb import PersistentClient
+        chroma_client = PersistentClient(path=CHROMA_PATH)
+        _chroma_collection = chroma_client.get_or_create_collection(name="mitigation_knowledge")
+        print("📦 Total embeddings:", _chroma_collection.count())
+    return _chroma_collection
+
+
+def get_embedder():
+    """Load the sentence embedding model on first use."""
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    return _embedder
+
+
+def catalogue_key(risk_type, threat_level):
+    return f"{risk_type.strip().lower()}|{threat_level.strip().lower()}"
+
+
+def load_mitigation_catalogue(path=None):
+    """
+    (Re)load the precomputed catalogue if its file changed since the last load.
+    path defaults to the last loaded file (initially CATALOGUE_PATH); the
+    periodic reload keeps following whichever path was loaded last.
+    """
+    global _catalogue, _catalogue_path, _catalogue_mtime, _catalogue_checked_at
+    if path is not None and path != _catalogue_path:
+        _catalogue_path, _catalogue_mtime = path, None
+    path = _catalogue_path
+    _catalogue_checked_at = time.monotonic()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return _catalogue
+    if mtime == _catalogue_mtime:
+        return _catalogue
+
+    try:
+        with open(path) as f:
+            _catalogue = json.load(f)
+        _catalogue_mtime = mtime
+        _chroma_misses.clear()
+        print(f"📚 Loaded mitigation catalogue {_catalogue.get('version')} "
+              f"({len(_catalogue.get('entries', {}))} entries)")
+    except Exception as e:
+        print(f"⚠️ Could not load mitigation catalogue: {e}")
+    return _catalogue
+
+
+def get_mitigation_catalogue():
+    if time.monotonic() - _catalogue_checked_at > CATALOGUE_RELOAD_INTERVAL:
+        load_mitigation_catalogue()
+    return _catalogue
+
 
 def threat_level_from_code(threat_code):
     mapping = {
@@ -19,23 +98,23 @@ def threat_level_from_code(threat_code):
         "low": 2
     }
     return mapping.get(threat_code.lower(), 1)
-def query_mitigation_action(risk_type, threat_level, description=None):
-    risk_type = risk_type.strip().lower()
-    threat_level = threat_level.strip().lower()
 
-    # 1️⃣ Try metadata query
+
+def _lookup_chroma(risk_type, threat_level):
+    """Resolve one pair against ChromaDB: metadata match first, then embedding search."""
+    collection = get_chroma_collection()
+
+    # 1️⃣ Try metadata query (ingestion stores risk_type as-is and Title-case threat_level)
     try:
-        results = chroma_collection.get(
+        results = collection.get(
             where={
                 "$and": [
                     {"risk_type": {"$eq": risk_type}},
-                    {"threat_level": {"$eq": threat_level}}
+                    {"threat_level": {"$eq": threat_level.title()}}
                 ]
             },
             include=["documents", "metadatas"],
-
         )
-        print("🧪 Metadata Query:", results)
 
         if results["documents"]:
             return {
@@ -47,16 +126,14 @@ def query_mitigation_action(risk_type, threat_level, description=None):
 
     # 2️⃣ Fallback: Embedding similarity search
     try:
-        query_text = f"{risk_type} | {threat_level}"
-        embedding = embedder.encode(query_text).tolist()
+        query_text = f"{risk_type.lower()} | {threat_level.lower()}"
+        embedding = get_embedder().encode(query_text).tolist()
 
-        results = chroma_collection.query(
+        results = collection.query(
             query_embeddings=[embedding],
             n_results=3,
             include=["documents", "distances"]
         )
-        print("🧪 Embedding fallback query:", query_text)
-        print("🧪 Fallback Results:", results)
 
         if results["documents"] and results["documents"][0]:
             return {
@@ -67,8 +144,37 @@ def query_mitigation_action(risk_type, threat_level, description=None):
     except Exception as e:
         print(f"⚠️ Embedding fallback failed: {e}")
 
+    return None
+
+
+def query_mitigation_action(risk_type, threat_level, description=None):
+    risk_type = risk_type.strip()
+    threat_level = threat_level.strip().lower()
+
+    # 1️⃣ Precomputed catalogue (O(1), no ChromaDB or model calls)
+    entry = get_mitigation_catalogue().get("entries", {}).get(catalogue_key(risk_type, threat_level))
+    if entry:
+        return dict(entry)
+
+    # 2️⃣ Live ChromaDB lookup for pairs the catalogue does not cover
+    global _chroma_available
+    key = catalogue_key(risk_type, threat_level)
+    if _chroma_available and key not in _chroma_misses:
+        try:
+            result = _lookup_chroma(risk_type, threat_level)
+            # Remember hits and misses so the rest of this request (and worker) skips ChromaDB
+            if result:
+                _catalogue.setdefault("entries", {})[key] = result
+                return dict(result)
+            _chroma_misses.add(key)
+        except ImportError as e:
+            print(f"⚠️ ChromaDB unavailable, using static mitigation text: {e}")
+            _chroma_available = False
+        except Exception as e:
+            print(f"⚠️ ChromaDB lookup failed: {e}")
+
     # 3️⃣ Fallback static response
-    fallback_desc = description or f"{risk_type} ({threat_level})"
+    fallback_desc = description or f"{risk_type.lower()} ({threat_level})"
     return {
         "score": 1,
         "action": (
@@ -78,6 +184,46 @@ def query_mitigation_action(risk_type, threat_level, description=None):
         )
     }
 
+
+def collection_version(collection):
+    """Content hash of the collection, so a re-ingest always yields a new catalogue version."""
+    data = collection.get(include=["documents", "metadatas"])
+    digest = hashlib.sha256()
+    for doc_id, doc, meta in sorted(zip(data["ids"], data["documents"], data["metadatas"])):
+        digest.update(json.dumps([doc_id, doc, meta], sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_mitigation_catalogue(path=CATALOGUE_PATH, collection=None):
+    """
+    Resolve the mitigation text for every catalogue (risk_type, threat_level)
+    pair once and write it to path. Run after every ChromaDB re-ingest.
+    """
+    global _chroma_collection
+    if collection is not None:
+        _chroma_collection = collection
+    collection = get_chroma_collection()
+
+    entries = {}
+    for risk_type in CATALOGUE_RISK_TYPES:
+        for threat_level in CATALOGUE_THREAT_LEVELS:
+            result = _lookup_chroma(risk_type, threat_level)
+            if result:
+                entries[catalogue_key(risk_type, threat_level)] = result
+
+    catalogue = {
+        "version": collection_version(collection),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "entries": entries,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(catalogue, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"✅ Mitigation catalogue {catalogue['version']} written with {len(entries)} entries")
+    return catalogue
+
+
 def normalize_threat_code(threat_code):
     return threat_code.lower().replace("risk", "").strip() + " risk"
 
@@ -107,3 +253,9 @@ def generate_mitigation_report(risks):
         })
 
     return pd.DataFrame(report_data)
+
+
+load_mitigation_catalogue()
+
+if __name__ == "__main__":
+    build_mitigation_catalogue()
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, session, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
-from backend.services.db import connect_db
+from backend.services.db import get_connection
 
 account_bp = Blueprint("account", __name__)
 
@@ -25,13 +25,12 @@ def update_profile():
         if not user_id:
             return jsonify({"error": "Unauthorized"}), 401
 
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE users SET hotel_name=%s, email=%s WHERE id=%s",
-                       (data["hotel_name"], data["email"], user_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE users SET hotel_name=%s, email=%s WHERE id=%s",
+                           (data["hotel_name"], data["email"], user_id))
+            conn.commit()
+            cursor.close()
 
         return jsonify({"message": "Profile updated."})
     except Exception as e:
@@ -50,20 +49,19 @@ def change_password():
         print("📦 Incoming session:", dict(session))
         user_id = session.get("user_id")
         data = request.json
-        conn = connect_db()
-        cursor = conn.cursor()
+        with get_connection() as conn:
+            cursor = conn.cursor()
 
-        cursor.execute("SELECT password_hash FROM users WHERE id=%s", (user_id,))
-        stored_hash = cursor.fetchone()[0]
+            cursor.execute("SELECT password_hash FROM users WHERE id=%s", (user_id,))
+            stored_hash = cursor.fetchone()[0]
 
-        if not check_password_hash(stored_hash, data["currentPassword"]):
-            return jsonify({"error": "Incorrect current password"}), 400
+            if not check_password_hash(stored_hash, data["currentPassword"]):
+                return jsonify({"error": "Incorrect current password"}), 400
 
-        hashed_new = generate_password_hash(data["newPassword"])
-        cursor.execute("UPDATE users SET password_hash=%s WHERE id=%s", (hashed_new, user_id))
-        conn.commit()
-        cursor.close()
-        conn.close()
+            hashed_new = generate_password_hash(data["newPassword"])
+            cursor.execute("UPDATE users SET password_hash=%s WHERE id=%s", (hashed_new, user_id))
+            conn.commit()
+            cursor.close()
         return jsonify({"message": "Password updated."})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
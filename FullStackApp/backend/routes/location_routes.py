@@ -1,6 +1,8 @@
-from flask import Blueprint, request, session, jsonify
-from backend.services.db import connect_db
+from flask import Blueprint, current_app, request, session, jsonify
+from backend.services.db import get_connection
+from backend.services.risk_search import LEVEL_RANK, assess_locations
 from backend.utils.geocode import get_lat_lon_from_address
+from backend.utils.gazetteer import is_nj_zip, zip_to_lat_lon
 from functools import wraps
 
 location_bp = Blueprint("location", __name__)
@@ -25,23 +27,25 @@ def add_location():
         city = data.get("city")
         zip_code = data.get("zip_code")
 
-        if not zip_code or not zip_code.isdigit() or len(zip_code) != 5 or not zip_code.startswith("07"):
+        if not is_nj_zip(zip_code):
             return jsonify({"error": "Invalid New Jersey zipcode"}), 400
 
         full_address = f"{street_address}, {city}, NJ {zip_code}"
         lat, lon, _ = get_lat_lon_from_address(full_address)
+        if not lat or not lon:
+            # Street not found online; fall back to the offline ZIP centroid
+            lat, lon = zip_to_lat_lon(zip_code)
         if not lat or not lon:
             return jsonify({"error": "Could not geocode address"}), 400
 
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO hotel_locations (user_id, hotel_name, street_address, city, zip_code, latitude, longitude)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (session['user_id'], hotel_name, street_address, city, zip_code, lat, lon))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO hotel_locations (user_id, hotel_name, street_address, city, zip_code, latitude, longitude)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, (session['user_id'], hotel_name, street_address, city, zip_code, lat, lon))
+            conn.commit()
+            cursor.close()
 
         return jsonify({"message": "Location added successfully"}), 201
 
@@ -57,18 +61,17 @@ def view_locations():
         user_id = session.get("user_id")
         print("📦 Viewing for user_id:", user_id)
 
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, hotel_name, street_address, city, zip_code, latitude, longitude
-            FROM hotel_locations
-            WHERE user_id = %s
-            ORDER BY id DESC
-        """, (user_id,))
-        rows = cursor.fetchall()
-        print(f"✅ Retrieved {len(rows)} locations for user {user_id}")
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, hotel_name, street_address, city, zip_code, latitude, longitude
+                FROM hotel_locations
+                WHERE user_id = %s
+                ORDER BY id DESC
+            """, (user_id,))
+            rows = cursor.fetchall()
+            print(f"✅ Retrieved {len(rows)} locations for user {user_id}")
+            cursor.close()
 
         locations = [
             {
@@ -83,25 +86,65 @@ def view_locations():
         return jsonify({"error": "Could not fetch locations"}), 500
 
 
+# 📊 Portfolio Risk Assessment
+@location_bp.route("/assess", methods=["GET"])
+@login_required
+def assess_portfolio():
+    try:
+        user_id = session.get("user_id")
+
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, hotel_name, street_address, city, zip_code, latitude, longitude
+                FROM hotel_locations
+                WHERE user_id = %s
+                ORDER BY id DESC
+            """, (user_id,))
+            rows = cursor.fetchall()
+            cursor.close()
+
+        locations = [
+            {
+                "id": r[0], "hotel_name": r[1], "street_address": r[2],
+                "city": r[3], "zip_code": r[4], "latitude": r[5], "longitude": r[6]
+            } for r in rows
+        ]
+        grid_layers = current_app.config.get("GRID_LAYERS")
+        summaries = assess_locations(locations, grid_layers=grid_layers() if grid_layers else None)
+
+        by_level = {}
+        for summary in summaries:
+            level = summary["highest_level"] or "none"
+            by_level[level] = by_level.get(level, 0) + 1
+        summaries.sort(key=lambda s: (LEVEL_RANK.index(s["highest_level"]) if s["highest_level"] in LEVEL_RANK
+                                      else len(LEVEL_RANK), -s["risk_count"]))
+        print(f"✅ Assessed {len(summaries)} locations for user {user_id}")
+        return jsonify({"locations": summaries, "portfolio": {"locations": len(summaries), "by_highest_level": by_level}})
+
+    except Exception as e:
+        print(f"⚠️ Portfolio assessment error: {e}")
+        return jsonify({"error": "Could not assess locations"}), 500
+
+
 # ❌ Delete Location
 @location_bp.route("/delete", methods=["POST"])
 @login_required
 def delete_location():
     try:
         data = request.json
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            DELETE FROM hotel_locations
-            WHERE user_id = %s AND hotel_name = %s AND street_address = %s AND city = %s AND zip_code = %s
-        """, (
-            session['user_id'], data.get("hotel_name"), data.get("street_address"),
-            data.get("city"), data.get("zip_code")
-        ))
-        deleted = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM hotel_locations
+                WHERE user_id = %s AND hotel_name = %s AND street_address = %s AND city = %s AND zip_code = %s
+            """, (
+                session['user_id'], data.get("hotel_name"), data.get("street_address"),
+                data.get("city"), data.get("zip_code")
+            ))
+            deleted = cursor.rowcount
+            conn.commit()
+            cursor.close()
 
         if deleted == 0:
             return jsonify({"error": "Location Not Found"}), 404
@@ -125,21 +168,22 @@ def edit_location():
 
         full_address = f"{street_address}, {city}, NJ {zip_code}"
         lat, lon, _ = get_lat_lon_from_address(full_address)
+        if not lat or not lon:
+            lat, lon = zip_to_lat_lon(zip_code or "")
         if not lat or not lon:
             return jsonify({"error": "Could not geocode address"}), 400
 
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE hotel_locations
-            SET hotel_name = %s, street_address = %s, city = %s, zip_code = %s,
-                latitude = %s, longitude = %s
-            WHERE id = %s AND user_id = %s
-        """, (hotel_name, street_address, city, zip_code, lat, lon, location_id, session['user_id']))
-        updated = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE hotel_locations
+                SET hotel_name = %s, street_address = %s, city = %s, zip_code = %s,
+                    latitude = %s, longitude = %s
+                WHERE id = %s AND user_id = %s
+            """, (hotel_name, street_address, city, zip_code, lat, lon, location_id, session['user_id']))
+            updated = cursor.rowcount
+            conn.commit()
+            cursor.close()
 
         if updated == 0:
             return jsonify({"error": "Location Not Found"}), 404
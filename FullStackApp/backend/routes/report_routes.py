@@ -0,0 +1,106 @@
+import json
+import os
+import re
+
+from flask import Blueprint, Response, request, session, jsonify, send_file, stream_with_context
+from backend.services.report_jobs import report_jobs
+from backend.services.reports import LARGE_EXPORT_ROWS, REPORT_FORMATS
+from backend.services.result_store import result_store
+
+report_bp = Blueprint("reports", __name__)
+
+JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Clients poll the status link at this interval
+REPORT_POLL_MS = 2000
+# An open SSE stream holds its worker until the job finishes, so streaming is
+# only offered when a worker can serve other requests meanwhile: a threaded
+# server (wsgi.multithread) or REPORT_EVENTS=1 for async worker classes
+# (gunicorn --worker-class gevent/eventlet).
+REPORT_EVENTS = os.environ.get("REPORT_EVENTS", "").lower() in ("1", "true", "yes")
+
+
+def events_enabled():
+    return REPORT_EVENTS or bool(request.environ.get("wsgi.multithread"))
+
+
+def job_links(job_id):
+    links = {
+        "status": f"/report-jobs/{job_id}",
+        "download": f"/report-jobs/{job_id}/download",
+        "poll_interval_ms": REPORT_POLL_MS,
+    }
+    if events_enabled():
+        links["events"] = f"/report-jobs/{job_id}/events"
+    return links
+
+
+# ✅ Submit a report job
+@report_bp.route("", methods=["POST"])
+def submit_report_job():
+    try:
+        data = request.get_json() or {}
+        risks = data.get("risks") or result_store.get(data.get("result_id") or session.get("result_id")) or []
+        file_format = data.get("format", "pdf")
+
+        if not risks:
+            return jsonify({"error": "No risks provided."}), 400
+        if file_format not in REPORT_FORMATS:
+            return jsonify({"error": "Unsupported format."}), 400
+
+        large = bool(data.get("large_export")) or len(risks) > LARGE_EXPORT_ROWS
+        job = report_jobs.submit(risks, file_format, large)
+        return jsonify(dict(job, links=job_links(job["job_id"]))), 202
+    except Exception as e:
+        print("⚠️ Error submitting report job:", str(e))
+        return jsonify({"error": "Failed to submit report job."}), 500
+
+
+# ✅ Poll job progress
+@report_bp.route("/<job_id>", methods=["GET"])
+def report_job_status(job_id):
+    job = report_jobs.status(job_id) if JOB_ID.match(job_id) else None
+    if not job:
+        return jsonify({"error": "Report job not found."}), 404
+    return jsonify(dict(job, links=job_links(job_id)))
+
+
+# ✅ Subscribe to job progress (Server-Sent Events)
+@report_bp.route("/<job_id>/events", methods=["GET"])
+def report_job_events(job_id):
+    job = report_jobs.status(job_id) if JOB_ID.match(job_id) else None
+    if not job:
+        return jsonify({"error": "Report job not found."}), 404
+    if not events_enabled():
+        # Sync worker: send the current state and let EventSource reconnect, i.e. poll
+        return Response(f"retry: {REPORT_POLL_MS}\ndata: {json.dumps(job)}\n\n", mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache"})
+
+    def events():
+        version = -1
+        while True:
+            job, version = report_jobs.wait(job_id, version)
+            if not job:
+                break
+            yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] in ("done", "failed"):
+                break
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# ✅ Download a finished report
+@report_bp.route("/<job_id>/download", methods=["GET"])
+def download_report_job(job_id):
+    job = report_jobs.status(job_id) if JOB_ID.match(job_id) else None
+    if not job:
+        return jsonify({"error": "Report job not found."}), 404
+    if job["status"] != "done":
+        return jsonify(dict(job, error=job["error"] or "Report is not ready yet.")), 409
+
+    path, file_format = report_jobs.artifact(job_id)
+    if not path:
+        return jsonify({"error": "Report is no longer cached; submit it again."}), 410
+    filename, mimetype = REPORT_FORMATS[file_format]
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=filename)
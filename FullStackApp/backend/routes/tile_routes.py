@@ -0,0 +1,65 @@
+import gzip
+import os
+
+from flask import Blueprint, Response, request, jsonify
+from backend.services.tiles import TILE_DIR, load_manifest, tile_path
+
+tile_bp = Blueprint("tiles", __name__)
+
+# Tiles only change when the pyramid is rebuilt. A URL carrying the manifest
+# version (?v=) never changes content, so it is cached for good; without it
+# the client revalidates every time and the ETag turns that into a 304.
+TILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+UNVERSIONED_CACHE_CONTROL = "no-cache"
+EMPTY_TILE = b"{}"
+
+
+def tile_response(body, etag, gzipped, versioned=False):
+    response = Response(body, mimetype="application/json")
+    if gzipped:
+        response.headers["Content-Encoding"] = "gzip"
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = TILE_CACHE_CONTROL if versioned else UNVERSIONED_CACHE_CONTROL
+    response.set_etag(etag)
+    return response
+
+
+# 🗺️ Prebuilt risk tile
+@tile_bp.route("/<layer>/<int:z>/<int:x>/<int:y>", methods=["GET"])
+def get_tile(layer, z, x, y):
+    manifest = load_manifest(TILE_DIR)
+    if not manifest:
+        return jsonify({"error": "Tile pyramid has not been built."}), 503
+    if layer not in manifest["layers"]:
+        return jsonify({"error": "Unknown layer."}), 404
+    if not (manifest["min_zoom"] <= z <= manifest["max_zoom"] and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({"error": "Tile out of range."}), 404
+
+    etag = f"{manifest['version']}-{layer}-{z}-{x}-{y}"
+    versioned = request.args.get("v") == manifest["version"]
+    if request.if_none_match.contains(etag):
+        response = tile_response(b"", etag, False, versioned)
+        response.status_code = 304
+        return response
+
+    path = tile_path(TILE_DIR, layer, z, x, y)
+    if not os.path.exists(path):
+        return tile_response(EMPTY_TILE, etag, False, versioned)
+
+    with open(path, "rb") as f:
+        body = f.read()
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        return tile_response(body, etag, True, versioned)
+    return tile_response(gzip.decompress(body), etag, False, versioned)
+
+
+# 🗺️ Pyramid metadata (layers, zoom range, build version, versioned tile URL)
+@tile_bp.route("/manifest", methods=["GET"])
+def get_manifest():
+    manifest = load_manifest(TILE_DIR)
+    if not manifest:
+        return jsonify({"error": "Tile pyramid has not been built."}), 503
+    prefix = request.script_root + request.path.rsplit("/", 1)[0]
+    response = jsonify(dict(manifest, tile_url=f"{prefix}/{{layer}}/{{z}}/{{x}}/{{y}}?v={manifest['version']}"))
+    response.headers["Cache-Control"] = UNVERSIONED_CACHE_CONTROL
+    return response
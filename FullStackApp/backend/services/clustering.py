@@ -0,0 +1,171 @@
+"""
+Viewport queries for RiskMap with server-side grid clustering.
+
+Below CLUSTER_MAX_ZOOM the viewport is split into square screen cells of
+CLUSTER_CELL_PX pixels, and each layer is aggregated per cell (count,
+position and count per threat level). The point layers are served from the
+prebuilt tile pyramid (services/tiles.py): the bins of the tiles two zooms
+up are exactly CLUSTER_CELL_PX wide, so the work is a handful of tile reads,
+positioned at each bin's representative point. The packed HCI grids are
+binned in NumPy. A Postgres GROUP BY is only the fallback while no pyramid
+has been built. From CLUSTER_MAX_ZOOM on, individual points come back,
+capped per layer and without mitigation text. Either way the payload and
+the work are bounded by the screen size, not by how dense the data is.
+"""
+import math
+
+import numpy as np
+
+from .grid_store import LEVELS
+from .risk_search import ASSESSMENT_LAYERS, LAYER_QUERIES, RISK_LAYERS, layer_select, query, submit
+from .spatial import RISK_LAYER_COORDS, bbox_filter
+from .tiles import TILE_BINS, TILE_DIR, load_manifest, read_tile, tile_coords
+
+CLUSTER_CELL_PX = 64
+CLUSTER_MAX_ZOOM = 14
+VIEWPORT_MAX_POINTS = 2000
+# Reject viewports larger than this many square degrees (NJ is about 4)
+VIEWPORT_MAX_AREA = 25.0
+# Reject clustered viewports wider than this many screen cells (a 4K screen is about 2000)
+VIEWPORT_MAX_CELLS = 4096
+TILE_SIZE_PX = 256
+# Tile zoom whose bins are CLUSTER_CELL_PX wide at the viewport zoom
+TILE_ZOOM_OFFSET = round(math.log2(CLUSTER_CELL_PX * TILE_BINS / TILE_SIZE_PX))
+
+
+def cell_degrees(zoom, center_lat):
+    """(lat_cell, lon_cell) in degrees of a CLUSTER_CELL_PX screen cell at zoom."""
+    lon_cell = 360.0 / (2 ** zoom) * CLUSTER_CELL_PX / TILE_SIZE_PX
+    return lon_cell * math.cos(math.radians(center_lat)), lon_cell
+
+
+def parse_viewport(args):
+    """(south, west, north, east, zoom) from request args; raises ValueError if invalid."""
+    south, west, north, east = (float(args[k]) for k in ("south", "west", "north", "east"))
+    zoom = int(args.get("zoom", 10))
+    if not (-90 <= south < north <= 90 and -180 <= west < east <= 180):
+        raise ValueError("Invalid bounding box.")
+    if (north - south) * (east - west) > VIEWPORT_MAX_AREA:
+        raise ValueError("Viewport is too large.")
+    zoom = max(0, min(zoom, 22))
+    if zoom < CLUSTER_MAX_ZOOM:
+        lat_cell, lon_cell = cell_degrees(zoom, (south + north) / 2)
+        if (north - south) / lat_cell * (east - west) / lon_cell > VIEWPORT_MAX_CELLS:
+            raise ValueError("Viewport is too large for this zoom.")
+    return south, west, north, east, zoom
+
+
+def _bbox_params(south, west, north, east):
+    return (west, south, east, north)
+
+
+def _sql_clusters(table, south, west, north, east, lat_cell, lon_cell):
+    lon_col, lat_col = RISK_LAYER_COORDS[table]
+    level_sql = ASSESSMENT_LAYERS[table][1]
+    rows = query(f"""
+        SELECT floor({lat_col} / %s) AS gy, floor({lon_col} / %s) AS gx,
+               COUNT(*), AVG({lat_col}), AVG({lon_col}),
+               COUNT(*) FILTER (WHERE {level_sql} = 'high'),
+               COUNT(*) FILTER (WHERE {level_sql} = 'moderate'),
+               COUNT(*) FILTER (WHERE {level_sql} = 'low')
+        FROM {table}
+        WHERE {bbox_filter(table)}
+        GROUP BY gy, gx
+    """, (lat_cell, lon_cell) + _bbox_params(south, west, north, east))
+    return [cluster(lat, lon, count, {"high": high, "moderate": moderate, "low": low})
+            for _, _, count, lat, lon, high, moderate, low in rows]
+
+
+def _tile_clusters(table, south, west, north, east, zoom, tile_dir):
+    """Clusters from the tile pyramid's bins, or None if the layer has no pyramid."""
+    manifest = load_manifest(tile_dir)
+    if not manifest or table not in manifest["layers"]:
+        return None
+    tile_zoom = min(max(zoom - TILE_ZOOM_OFFSET, manifest["min_zoom"]), manifest["max_zoom"])
+    # North-west and south-east corners; tile y grows southwards
+    xs, ys = tile_coords([north, south], [west, east], tile_zoom)
+    (x_min, x_max), (y_min, y_max) = xs.astype(int), ys.astype(int)
+    clusters = []
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            tile = read_tile(tile_dir, table, tile_zoom, x, y)
+            for _, _, count, high, moderate, low, _, lat, lon in (tile or {}).get("bins", []):
+                if south <= lat <= north and west <= lon <= east:
+                    clusters.append(cluster(lat, lon, count, {"high": high, "moderate": moderate, "low": low}))
+    return clusters
+
+
+def _grid_clusters(layer, south, west, north, east, lat_cell, lon_cell):
+    center_lat, center_lon = (south + north) / 2, (west + east) / 2
+    xs, ys, codes = layer.window_cells(center_lat, center_lon, (north - south) / 2, (east - west) / 2)
+    if not len(xs):
+        return []
+    keys = np.column_stack([np.floor(ys / lat_cell), np.floor(xs / lon_cell)])
+    _, group = np.unique(keys, axis=0, return_inverse=True)
+    group = group.ravel()
+    n = group.max() + 1
+    counts = np.bincount(group, minlength=n)
+    lats = np.bincount(group, weights=ys, minlength=n) / counts
+    lons = np.bincount(group, weights=xs, minlength=n) / counts
+    per_level = {level.lower(): np.bincount(group[codes == code], minlength=n)
+                 for code, level in enumerate(LEVELS)}
+    return [cluster(lats[i], lons[i], counts[i], {level: per_level[level][i] for level in per_level})
+            for i in range(n)]
+
+
+def cluster(lat, lon, count, levels):
+    return {"latitude": round(float(lat), 6), "longitude": round(float(lon), 6), "count": int(count),
+            "levels": {level: int(n) for level, n in levels.items() if n}}
+
+
+def _points(table, south, west, north, east, grid_layers):
+    to_risk = LAYER_QUERIES[table][3]
+    if grid_layers and table in grid_layers:
+        center_lat, center_lon = (south + north) / 2, (west + east) / 2
+        rows = grid_layers[table].window_rows(center_lat, center_lon, (north - south) / 2, (east - west) / 2)
+        rows = rows[:VIEWPORT_MAX_POINTS + 1]
+    else:
+        # One row past the cap tells whether the layer was truncated
+        rows = query(layer_select(table) + " WHERE " + bbox_filter(table) + " LIMIT %s",
+                      _bbox_params(south, west, north, east) + (VIEWPORT_MAX_POINTS + 1,))
+    points = []
+    for row in rows:
+        risk = to_risk(row, None, lambda *_: None)
+        points.append({k: risk[k] for k in ("latitude", "longitude", "threat_code", "description")})
+    return points
+
+
+def _layer_viewport(table, south, west, north, east, zoom, grid_layers, tile_dir):
+    if zoom >= CLUSTER_MAX_ZOOM:
+        return _points(table, south, west, north, east, grid_layers)
+    lat_cell, lon_cell = cell_degrees(zoom, (south + north) / 2)
+    if grid_layers and table in grid_layers:
+        return _grid_clusters(grid_layers[table], south, west, north, east, lat_cell, lon_cell)
+    clusters = _tile_clusters(table, south, west, north, east, zoom, tile_dir)
+    if clusters is None:
+        clusters = _sql_clusters(table, south, west, north, east, lat_cell, lon_cell)
+    return clusters
+
+
+def viewport(south, west, north, east, zoom, grid_layers=None, layers=None, tile_dir=TILE_DIR):
+    """Clusters (below CLUSTER_MAX_ZOOM) or capped points per layer, layers queried concurrently."""
+    tables = [table for table, _ in RISK_LAYERS if layers is None or table in layers]
+    futures = {table: submit(_layer_viewport, table, south, west, north, east, zoom, grid_layers, tile_dir)
+               for table in tables}
+    clustered = zoom < CLUSTER_MAX_ZOOM
+    result = {
+        "bbox": {"south": south, "west": west, "north": north, "east": east},
+        "zoom": zoom,
+        "clustered": clustered,
+        "layers": {},
+    }
+    for table, future in futures.items():
+        items = future.result()
+        truncated = not clustered and len(items) > VIEWPORT_MAX_POINTS
+        items = items[:VIEWPORT_MAX_POINTS] if truncated else items
+        result["layers"][ASSESSMENT_LAYERS[table][0]] = {
+            "clusters" if clustered else "points": items,
+            "total": sum(item["count"] for item in items) if clustered else len(items),
+            "truncated": truncated,
+        }
+    return result
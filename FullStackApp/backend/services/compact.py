@@ -0,0 +1,130 @@
+"""
+Compact columnar encoding of risk payloads, and compressed JSON responses.
+
+The default /search body repeats every key on every risk and carries a full
+copy of the mitigation entry, though only a handful of distinct
+(risk_type, threat_code) pairs exist. The compact form (requested with
+?format=compact or an Accept header of COMPACT_MIMETYPE) is:
+
+    {"format": "compact-v1",
+     "threat_codes": ["low", "moderate", ...],
+     "mitigations": [{...}, ...],
+     "layers": {risk_type: {"latitude": [...], "longitude": [...],
+                            "description": [...], "distance_miles": [...],
+                            "threat_code": [index into threat_codes],
+                            "mitigation": [index into mitigations]}}}
+
+Layers keep their /search order and their rows keep their order within each
+layer. json_response() serializes with orjson when it is installed and
+compresses with brotli or gzip, whichever the client accepts.
+"""
+import gzip
+import json
+from decimal import Decimal
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # optional, see requirements-full.txt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional, see requirements-full.txt
+    brotli = None
+
+COMPACT_FORMAT = "compact-v1"
+COMPACT_MIMETYPE = "application/vnd.biodivscope.compact+json"
+THREAT_CODES = ("low", "moderate", "medium", "high", "unknown")
+COMPACT_COLUMNS = ("latitude", "longitude", "description", "distance_miles")
+# Below this, compression costs more than the bytes it saves
+COMPRESS_MIN_BYTES = 1024
+
+
+def wants_compact(request):
+    if request.args.get("format") == "compact":
+        return True
+    return request.accept_mimetypes.best_match(["application/json", COMPACT_MIMETYPE]) == COMPACT_MIMETYPE
+
+
+def compact_risks(risks):
+    """Columnar form of a list of risk dicts (see module docstring)."""
+    threat_codes = list(THREAT_CODES)
+    code_index = {code: i for i, code in enumerate(threat_codes)}
+    mitigations, mitigation_index = [], {}
+    layers = {}
+
+    for risk in risks:
+        layer = layers.get(risk["risk_type"])
+        if layer is None:
+            layer = layers[risk["risk_type"]] = {column: [] for column in COMPACT_COLUMNS + ("threat_code", "mitigation")}
+        for column in COMPACT_COLUMNS:
+            layer[column].append(risk.get(column))
+
+        code = risk.get("threat_code")
+        if code not in code_index:
+            code_index[code] = len(threat_codes)
+            threat_codes.append(code)
+        layer["threat_code"].append(code_index[code])
+
+        mitigation = risk.get("mitigation")
+        key = json.dumps(mitigation, sort_keys=True, default=str)
+        if key not in mitigation_index:
+            mitigation_index[key] = len(mitigations)
+            mitigations.append(mitigation)
+        layer["mitigation"].append(mitigation_index[key])
+
+    return {"format": COMPACT_FORMAT, "threat_codes": threat_codes, "mitigations": mitigations, "layers": layers}
+
+
+def expand_risks(compact):
+    """Risk dicts back from compact_risks() output."""
+    risks = []
+    for risk_type, layer in compact["layers"].items():
+        for i in range(len(layer["threat_code"])):
+            risk = {column: layer[column][i] for column in COMPACT_COLUMNS}
+            risk.update(risk_type=risk_type,
+                        threat_code=compact["threat_codes"][layer["threat_code"][i]],
+                        mitigation=compact["mitigations"][layer["mitigation"][i]])
+            risks.append(risk)
+    return risks
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, "item"):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(",", ":")).encode()
+
+
+def json_response(payload, request, mimetype="application/json", status=200):
+    """payload serialized and compressed for the client's Accept-Encoding."""
+    body = dumps(payload)
+    response = Response(mimetype=mimetype, status=status)
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accepted = request.accept_encodings
+        if brotli is not None and accepted["br"]:
+            body = brotli.compress(body, quality=5)
+            response.headers["Content-Encoding"] = "br"
+        elif accepted["gzip"]:
+            body = gzip.compress(body, compresslevel=5)
+            response.headers["Content-Encoding"] = "gzip"
+    response.set_data(body)
+    return response
+
+
+def risks_response(payload, request):
+    """payload (with a "risks" list) as plain or compact JSON, as the client asked."""
+    if wants_compact(request):
+        payload = dict(payload, risks=compact_risks(payload["risks"]))
+        return json_response(payload, request, mimetype=COMPACT_MIMETYPE)
+    return json_response(payload, request)
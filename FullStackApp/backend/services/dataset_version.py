@@ -0,0 +1,65 @@
+"""
+Dataset version stamp.
+
+A single-row dataset_version table holds a counter that loaders bump after
+every change to the risk tables. Caches put the stamp in their keys, so a
+reload invalidates them without any explicit purge. Reads are memoized for
+DATASET_VERSION_TTL seconds so a cache hit does not touch Postgres.
+"""
+import os
+import threading
+import time
+
+from .db import get_connection
+
+DATASET_VERSION_TTL = float(os.environ.get("DATASET_VERSION_TTL", 30))
+
+VERSION_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS dataset_version (
+        id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 1,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_lock = threading.Lock()
+_cached = {"version": None, "checked_at": 0.0}
+
+
+def ensure_version_table(cursor):
+    cursor.execute(VERSION_TABLE_DDL)
+    cursor.execute("INSERT INTO dataset_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING")
+
+
+def bump_dataset_version(cursor):
+    """Increment the stamp inside the caller's transaction; returns the new version."""
+    ensure_version_table(cursor)
+    cursor.execute("""
+        UPDATE dataset_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = 1 RETURNING version
+    """)
+    return str(cursor.fetchone()[0])
+
+
+def read_dataset_version():
+    try:
+        with get_connection(timeout=2) as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT version FROM dataset_version WHERE id = 1")
+                row = cursor.fetchone()
+        return str(row[0]) if row else "0"
+    except Exception as e:
+        print(f"⚠️ Dataset version unavailable: {e}")
+        return os.environ.get("DATASET_VERSION", "0")
+
+
+def get_dataset_version():
+    """Current dataset stamp, re-read from Postgres at most every DATASET_VERSION_TTL seconds."""
+    now = time.monotonic()
+    with _lock:
+        if _cached["version"] is not None and now - _cached["checked_at"] < DATASET_VERSION_TTL:
+            return _cached["version"]
+    version = read_dataset_version()
+    with _lock:
+        _cached.update(version=version, checked_at=now)
+    return version
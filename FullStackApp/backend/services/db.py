@@ -1,11 +1,241 @@
+"""
+Shared PostgreSQL connection pool for the app and its blueprints.
+
+Use it through the context manager so the connection always goes back to the
+pool, even on error paths:
+
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        ...
+        conn.commit()
+
+The pool is bounded (DB_POOL_MAX), callers wait at most DB_POOL_TIMEOUT
+seconds for a free connection, idle connections are health-checked before
+they are handed out, and connections held longer than DB_POOL_LEAK_SECONDS
+are logged together with the code that borrowed them.
+"""
+import logging
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
 import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
 
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'postgres',
-    'password': 'password',
-    'dbname': 'postgres'
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'user': os.environ.get('DB_USER', 'postgres'),
+    'password': os.environ.get('DB_PASSWORD', 'password'),
+    'dbname': os.environ.get('DB_NAME', 'postgres'),
+    'port': os.environ.get('DB_PORT', '5432'),
 }
 
+def get_database_url():
+    """DATABASE_URL (postgres:// normalized to postgresql://), else a URL built from DB_CONFIG."""
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        database_url = ('postgresql://{user}:{password}@{host}:{port}/{dbname}'.format(**DB_CONFIG))
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+    return database_url
+
+
+POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+POOL_LEAK_SECONDS = float(os.environ.get('DB_POOL_LEAK_SECONDS', 60))
+POOL_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 5))
+# Idle connections older than this are pinged with SELECT 1 before reuse
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', 30))
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the checkout timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, dsn=None, maxconn=POOL_MAX, timeout=POOL_TIMEOUT,
+                 leak_seconds=POOL_LEAK_SECONDS, health_check_after=POOL_HEALTH_CHECK_AFTER, **connect_kwargs):
+        self.dsn = dsn
+        self.connect_kwargs = connect_kwargs
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.leak_seconds = leak_seconds
+        self.health_check_after = health_check_after
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, returned_at)], most recently used last
+        self._in_use = {}      # id(conn) -> (conn, checked_out_at, stack, leak_reported)
+        self._opened = 0
+        self.stats = {"checkouts": 0, "created": 0, "discarded": 0, "timeouts": 0, "leaks": 0}
+
+    def _connect(self):
+        kwargs = dict(self.connect_kwargs)
+        kwargs.setdefault('connect_timeout', POOL_CONNECT_TIMEOUT)
+        conn = psycopg2.connect(self.dsn, **kwargs) if self.dsn else psycopg2.connect(**kwargs)
+        self.stats["created"] += 1
+        return conn
+
+    def _reset_after_fork(self):
+        # Connections inherited from the gunicorn master must not be shared
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle = []
+            self._in_use = {}
+            self._opened = 0
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._opened -= 1
+        self.stats["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _report_leaks(self):
+        now = time.monotonic()
+        for key, (conn, since, stack, reported) in list(self._in_use.items()):
+            if not reported and now - since > self.leak_seconds:
+                self._in_use[key] = (conn, since, stack, True)
+                self.stats["leaks"] += 1
+                logger.warning(f"⚠️ DB connection held for {now - since:.0f}s; borrowed at:\n{''.join(stack)}")
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                self._reset_after_fork()
+                self._report_leaks()
+                while not self._idle and self._opened >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["timeouts"] += 1
+                        raise PoolTimeout(f"No database connection available within {timeout}s "
+                                          f"({len(self._in_use)} in use, max {self.maxconn})")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                else:
+                    conn, idle_since = None, None
+                    self._opened += 1  # reserve the slot; connect outside the lock
+
+            # Network work (connect / health ping) happens without holding the lock
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._opened -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn, idle_since):
+                with self._cond:
+                    self._discard(conn)
+                continue
+
+            with self._cond:
+                return self._checkout(conn)
+
+    def _checkout(self, conn):
+        self.stats["checkouts"] += 1
+        stack = traceback.format_stack(limit=8)[:-3]
+        self._in_use[id(conn)] = (conn, time.monotonic(), stack, False)
+        return conn
+
+    def putconn(self, conn, discard=False):
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                return  # not ours (e.g. borrowed before a fork)
+            if not discard and not conn.closed:
+                try:
+                    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except Exception:
+                    discard = True
+            if discard or conn.closed or len(self._idle) >= self.maxconn:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def status(self):
+        with self._cond:
+            self._report_leaks()
+            return dict(self.stats, in_use=len(self._in_use), idle=len(self._idle), max=self.maxconn)
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._discard(conn)
+            self._idle = []
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(db_config=None, **pool_kwargs):
+    """
+    Configure the shared pool. db_config is a DATABASE_URL string or a dict of
+    psycopg2.connect() keyword arguments; connections open lazily per worker.
+    """
+    global _pool
+    db_config = db_config or DB_CONFIG
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+        if isinstance(db_config, str):
+            _pool = ConnectionPool(dsn=db_config, **pool_kwargs)
+        else:
+            _pool = ConnectionPool(**pool_kwargs, **db_config)
+    return _pool
+
+
+def get_pool():
+    if _pool is None:
+        init_pool(os.environ.get('DATABASE_URL') or DB_CONFIG)
+    return _pool
+
+
+@contextmanager
+def get_connection(timeout=None):
+    """Borrow a pooled connection; rolled back on error and always returned."""
+    pool = get_pool()
+    conn = pool.getconn(timeout)
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.putconn(conn, discard=broken or conn.closed)
+
+
+def pool_status():
+    return get_pool().status()
+
+
 def connect_db():
+    """Unpooled connection for one-off scripts; request handlers use get_connection()."""
     return psycopg2.connect(**DB_CONFIG)
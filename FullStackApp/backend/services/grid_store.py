@@ -0,0 +1,245 @@
+"""
+Memory-mapped grid store for the regular x/y HCI risk layers.
+
+Each layer (freshwater_risk, marine_hci, terrestrial_risk) is packed once into
+plain NumPy arrays in its own directory:
+
+    <layer>/value.npy   float64 (ny, nx)  score per cell, NaN where missing
+    <layer>/level.npy   int8    (ny, nx)  index into LEVELS, -1 = no cell
+    <layer>/x.npy       float64 (nx,)     longitude of each grid column
+    <layer>/y.npy       float64 (ny,)     latitude of each grid row
+    <layer>/meta.json   origin, cell size and shape
+
+Workers open the arrays with ``mmap_mode="r"`` so the pages live in the OS
+page cache and are shared by every gunicorn worker on the host. Point and
+window lookups are plain index arithmetic, with no database round-trip.
+
+A repack never writes into a mapped file (that kills the mapping process
+with SIGBUS): the layer is written to <layer>.building and swapped in whole,
+so readers see either the old files or the new ones, never a mix.
+
+meta.json records the dataset version the layer was packed from.
+current_grid_layers() remaps a layer when it is swapped, and leaves out
+layers packed from another dataset version, so after a reload their callers
+fall back to SQL (and key their caches on the new version) until the store
+is rebuilt.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("Low", "Moderate", "High")
+NO_CELL = -1
+
+GRID_LAYERS = ("freshwater_risk", "marine_hci", "terrestrial_risk")
+
+# Resolved against the backend directory, not the process working directory
+GRID_STORE_DIR = os.environ.get(
+    "GRID_STORE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "grid_store"))
+
+
+def level_code(level):
+    """Map a stored risk level string to its LEVELS index (missing means Low)."""
+    if not level:
+        return 0
+    try:
+        return LEVELS.index(str(level).strip().title())
+    except ValueError:
+        return 0
+
+
+def _axis(values):
+    """Infer origin, cell size and per-point index for one coordinate axis."""
+    unique = np.unique(values)
+    if len(unique) == 1:
+        return unique[0], 1.0, np.zeros(len(values), dtype=np.int64)
+
+    step = float(np.median(np.diff(unique)))
+    index = np.rint((values - unique[0]) / step).astype(np.int64)
+    if np.abs(unique[0] + index * step - values).max() > step * 0.25:
+        raise ValueError("coordinates do not lie on a regular grid")
+    return unique[0], step, index
+
+
+def pack_layer(name, x, y, value, level, out_dir, dataset_version=None):
+    """
+    Pack one layer into the on-disk grid format.
+
+    x, y, value and level are equal-length sequences; level holds the stored
+    risk level strings (None is treated as Low). dataset_version is the stamp
+    of the data being packed (see services/dataset_version.py).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    value = np.asarray(value, dtype=np.float64)
+    codes = np.fromiter((level_code(lv) for lv in level), dtype=np.int8, count=len(x))
+
+    x0, dx, ix = _axis(x)
+    y0, dy, iy = _axis(y)
+    nx, ny = int(ix.max()) + 1, int(iy.max()) + 1
+
+    values = np.full((ny, nx), np.nan, dtype=np.float64)
+    levels = np.full((ny, nx), NO_CELL, dtype=np.int8)
+    values[iy, ix] = value
+    levels[iy, ix] = codes
+
+    # Keep the exact stored coordinates so results match the database rows
+    x_axis = x0 + np.arange(nx) * dx
+    y_axis = y0 + np.arange(ny) * dy
+    x_axis[ix] = x
+    y_axis[iy] = y
+
+    layer_dir = os.path.join(out_dir, name)
+    build_dir = f"{layer_dir}.building"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    np.save(os.path.join(build_dir, "value.npy"), values)
+    np.save(os.path.join(build_dir, "level.npy"), levels)
+    np.save(os.path.join(build_dir, "x.npy"), x_axis)
+    np.save(os.path.join(build_dir, "y.npy"), y_axis)
+    with open(os.path.join(build_dir, "meta.json"), "w") as f:
+        json.dump({"layer": name, "x0": float(x0), "y0": float(y0), "dx": dx, "dy": dy,
+                   "nx": nx, "ny": ny, "cells": int(len(x)), "dataset_version": dataset_version}, f)
+
+    # Unlinking the old files is safe: existing maps keep their pages until closed
+    old_dir = f"{layer_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(layer_dir):
+        os.replace(layer_dir, old_dir)
+    os.replace(build_dir, layer_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return layer_dir
+
+
+class GridLayer:
+    """Read-only view over one packed layer."""
+
+    def __init__(self, layer_dir):
+        with open(os.path.join(layer_dir, "meta.json")) as f:
+            meta = json.load(f)
+        self.name = meta["layer"]
+        self.dataset_version = meta.get("dataset_version")
+        self.x0, self.y0 = meta["x0"], meta["y0"]
+        self.dx, self.dy = meta["dx"], meta["dy"]
+        self.values = np.load(os.path.join(layer_dir, "value.npy"), mmap_mode="r")
+        self.levels = np.load(os.path.join(layer_dir, "level.npy"), mmap_mode="r")
+        self.x_axis = np.load(os.path.join(layer_dir, "x.npy"), mmap_mode="r")
+        self.y_axis = np.load(os.path.join(layer_dir, "y.npy"), mmap_mode="r")
+        self.ny, self.nx = self.levels.shape
+
+    def _span(self, lo, hi, origin, step, size):
+        start = max(int(np.ceil((lo - origin) / step)) - 1, 0)
+        stop = min(int(np.floor((hi - origin) / step)) + 2, size)
+        return start, stop
+
+    def point(self, lat, lon):
+        """Return (value, level) for the cell containing (lat, lon), or None."""
+        ix = int(round((lon - self.x0) / self.dx))
+        iy = int(round((lat - self.y0) / self.dy))
+        if not (0 <= ix < self.nx and 0 <= iy < self.ny):
+            return None
+        code = self.levels[iy, ix]
+        if code == NO_CELL:
+            return None
+        value = self.values[iy, ix]
+        return (None if np.isnan(value) else float(value)), LEVELS[code]
+
+    def _window(self, lat, lon, lat_delta, lon_delta):
+        """Axis slices and (iy, ix) offsets of the cells inside the box, or None."""
+        x_start, x_stop = self._span(lon - lon_delta, lon + lon_delta, self.x0, self.dx, self.nx)
+        y_start, y_stop = self._span(lat - lat_delta, lat + lat_delta, self.y0, self.dy, self.ny)
+        if x_start >= x_stop or y_start >= y_stop:
+            return None
+
+        xs = self.x_axis[x_start:x_stop]
+        ys = self.y_axis[y_start:y_stop]
+        x_keep = np.abs(xs - lon) <= lon_delta
+        y_keep = np.abs(ys - lat) <= lat_delta
+
+        levels = self.levels[y_start:y_stop, x_start:x_stop]
+        mask = (levels != NO_CELL) & y_keep[:, None] & x_keep[None, :]
+        iy, ix = np.nonzero(mask)
+        return (y_start, y_stop, x_start, x_stop), xs, ys, iy, ix, levels[iy, ix]
+
+    def window_rows(self, lat, lon, lat_delta, lon_delta):
+        """
+        Rows for every cell whose centre lies inside the box around (lat, lon),
+        edges inclusive, as (x, y, value, level) tuples like the SQL layer rows.
+        """
+        window = self._window(lat, lon, lat_delta, lon_delta)
+        if window is None:
+            return []
+        (y_start, y_stop, x_start, x_stop), xs, ys, iy, ix, codes = window
+        values = self.values[y_start:y_stop, x_start:x_stop][iy, ix]
+
+        return [
+            (float(xs[j]), float(ys[i]), None if np.isnan(v) else float(v), LEVELS[c])
+            for i, j, v, c in zip(iy, ix, values, codes)
+        ]
+
+    def window_cells(self, lat, lon, lat_delta, lon_delta):
+        """(x, y, level code) arrays for the cells window_rows() would return."""
+        window = self._window(lat, lon, lat_delta, lon_delta)
+        if window is None:
+            empty = np.empty(0)
+            return empty, empty, np.empty(0, dtype=np.int8)
+        _, xs, ys, iy, ix, codes = window
+        return np.asarray(xs)[ix], np.asarray(ys)[iy], np.asarray(codes)
+
+    def all_cells(self):
+        """(x, y, value, level code) arrays for every populated cell."""
+        iy, ix = np.nonzero(np.asarray(self.levels) != NO_CELL)
+        return (np.asarray(self.x_axis)[ix], np.asarray(self.y_axis)[iy],
+                np.asarray(self.values)[iy, ix], np.asarray(self.levels)[iy, ix])
+
+
+def load_grid_layers(directory):
+    """Memory-map every packed layer found in directory; missing layers are skipped."""
+    layers = {}
+    for name in GRID_LAYERS:
+        layer_dir = os.path.join(directory, name)
+        if not os.path.exists(os.path.join(layer_dir, "meta.json")):
+            continue
+        try:
+            layers[name] = GridLayer(layer_dir)
+            logger.info(f"Memory-mapped grid layer {name} from {directory}")
+        except Exception as e:
+            logger.warning(f"Could not load grid layer {name}: {e}")
+    return layers
+
+
+_current = {"stamp": None, "layers": {}}
+_current_lock = threading.Lock()
+
+
+def _store_stamp(directory):
+    """Identity of every layer's meta.json; a swapped-in layer has a new inode."""
+    stamp = [directory]
+    for name in GRID_LAYERS:
+        try:
+            st = os.stat(os.path.join(directory, name, "meta.json"))
+            stamp.append((st.st_ino, st.st_mtime_ns))
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def current_grid_layers(directory, dataset_version=None):
+    """
+    The packed layers of directory, remapped when build_grid_store.py swaps
+    one in. With dataset_version, only layers packed from that version.
+    """
+    stamp = _store_stamp(directory)
+    with _current_lock:
+        if _current["stamp"] != stamp:
+            _current.update(stamp=stamp, layers=load_grid_layers(directory))
+        layers = _current["layers"]
+    if dataset_version is None:
+        return layers
+    return {name: layer for name, layer in layers.items() if layer.dataset_version == dataset_version}
@@ -0,0 +1,166 @@
+"""
+k-nearest-neighbour risk lookup.
+
+Each layer's coordinates are indexed once per worker (and rebuilt in the
+background when the dataset version changes, serving the previous indexes
+meanwhile) in a KD-tree over unit-sphere x/y/z coordinates.
+Chord length grows monotonically with great-circle distance, so the
+tree's Euclidean neighbours are the true nearest points on the globe.
+Without scipy the same query falls back to a vectorized haversine scan with
+argpartition.
+
+A kNN search returns at most k risks per layer within max_distance miles, so
+response size and latency are bounded however dense the data is near the
+point.
+"""
+import math
+import threading
+
+import numpy as np
+
+from .grid_store import LEVELS
+from .risk_search import LAYER_QUERIES, RISK_LAYERS, layer_select, query, submit
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is only in requirements-full.txt
+    cKDTree = None
+
+try:
+    from backend.api.haversine_api import EARTH_RADIUS, haversine_np
+except ImportError:
+    from api.haversine_api import EARTH_RADIUS, haversine_np
+
+KNN_DEFAULT_K = 10
+KNN_MAX_K = 100
+KNN_DEFAULT_MAX_MILES = 25.0
+KNN_MAX_MILES = 100.0
+
+
+def unit_xyz(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)])
+
+
+def miles_to_chord(miles):
+    return 2 * np.sin(min(miles / EARTH_RADIUS["miles"], np.pi) / 2)
+
+
+class LayerKNN:
+    """Nearest-neighbour index over one layer; row_at(i) rebuilds the layer row for point i."""
+
+    def __init__(self, lats, lons, row_at):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        keep = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        self._ids = keep
+        self.lats, self.lons = lats[keep], lons[keep]
+        self.row_at = row_at
+        self._tree = cKDTree(unit_xyz(self.lats, self.lons)) if cKDTree is not None and len(keep) else None
+
+    def __len__(self):
+        return len(self._ids)
+
+    def query(self, lat, lon, k, max_miles):
+        """[(row, distance_miles)] of the k nearest points within max_miles, nearest first."""
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        if self._tree is not None:
+            _, idx = self._tree.query(unit_xyz([lat], [lon])[0], k=k,
+                                      distance_upper_bound=miles_to_chord(max_miles) * (1 + 1e-9))
+            idx = np.atleast_1d(idx)
+            idx = idx[idx < len(self)]
+        else:
+            d = haversine_np(lat, lon, self.lats, self.lons)
+            idx = np.argpartition(d, k - 1)[:k] if k < len(d) else np.arange(len(d))
+        # Report haversine miles, identical to the radius search
+        distances = haversine_np(lat, lon, self.lats[idx], self.lons[idx])
+        order = np.argsort(distances, kind="stable")
+        return [(self.row_at(int(self._ids[idx[i]])), round(float(distances[i]), 3))
+                for i in order if distances[i] <= max_miles]
+
+
+def build_layer_knn(table, grid_layers=None):
+    _, lat_col, lon_col, _ = LAYER_QUERIES[table]
+    if grid_layers and table in grid_layers:
+        xs, ys, values, codes = grid_layers[table].all_cells()
+        row_at = lambda i: (float(xs[i]), float(ys[i]),
+                            None if np.isnan(values[i]) else float(values[i]), LEVELS[codes[i]])
+        return LayerKNN(ys, xs, row_at)
+
+    rows = query(layer_select(table), ())
+    lats = [np.nan if row[lat_col] is None else row[lat_col] for row in rows]
+    lons = [np.nan if row[lon_col] is None else row[lon_col] for row in rows]
+    return LayerKNN(lats, lons, rows.__getitem__)
+
+
+class KNNIndexes:
+    """
+    Per-worker layer indexes. Only the very first build blocks callers; after a
+    dataset version change one background thread builds the new indexes and
+    swaps them in, while searches keep using the previous ones.
+    """
+
+    def __init__(self):
+        self._building = threading.Lock()
+        self._version = None
+        self._layers = {}
+
+    def _build(self, version, grid_layers):
+        futures = {table: submit(build_layer_knn, table, grid_layers) for table in LAYER_QUERIES}
+        layers = {table: future.result() for table, future in futures.items()}
+        self._layers, self._version = layers, version  # swap in one assignment each, readers see either set
+        print(f"🌳 kNN indexes built for dataset {version}: "
+              + ", ".join(f"{t}={len(layer)}" for t, layer in layers.items()))
+
+    def _rebuild(self, version, grid_layers):
+        try:
+            self._build(version, grid_layers)
+        except Exception as e:
+            print(f"⚠️ kNN index rebuild for dataset {version} failed, keeping {self._version}: {e}")
+        finally:
+            self._building.release()
+
+    def get(self, version, grid_layers=None):
+        layers = self._layers
+        if layers and self._version == version:
+            return layers
+        if layers:
+            if self._building.acquire(blocking=False):
+                threading.Thread(target=self._rebuild, args=(version, grid_layers),
+                                 name="knn-rebuild", daemon=True).start()
+            return layers
+        with self._building:  # first build: nothing to serve yet
+            if not self._layers:
+                self._build(version, grid_layers)
+            return self._layers
+
+
+knn_indexes = KNNIndexes()
+
+
+def parse_knn_params(k=None, max_distance=None):
+    """Clamp request parameters to the supported range; ValueError if they are not numbers."""
+    try:
+        k = KNN_DEFAULT_K if k in (None, "") else int(k)
+        max_distance = KNN_DEFAULT_MAX_MILES if max_distance in (None, "") else float(max_distance)
+    except (TypeError, ValueError):
+        raise ValueError("k must be an integer and max_distance a number of miles.")
+    if not math.isfinite(max_distance):
+        raise ValueError("k must be an integer and max_distance a number of miles.")
+    return max(1, min(k, KNN_MAX_K)), max(0.0, min(max_distance, KNN_MAX_MILES))
+
+
+def knn_risks(lat, lon, mitigation, version, k=KNN_DEFAULT_K, max_distance=KNN_DEFAULT_MAX_MILES,
+              grid_layers=None):
+    """The k nearest risks of every layer within max_distance miles, merged in RISK_LAYERS order."""
+    layers = knn_indexes.get(version, grid_layers)
+    risk_data = []
+    for table, _ in RISK_LAYERS:
+        to_risk = LAYER_QUERIES[table][3]
+        risk_data.extend(to_risk(row, distance, mitigation)
+                         for row, distance in layers[table].query(lat, lon, k, max_distance))
+    return risk_data
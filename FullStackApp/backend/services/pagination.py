@@ -0,0 +1,85 @@
+"""
+Opaque continuation tokens for keyset-paged layer results (/search/page).
+
+A token carries everything needed for the next page: the layer, search point,
+radius, page size, the (distance, tie-break) key of the last row served and
+the dataset version it was issued for. It is base64url JSON signed with an
+HMAC of the app secret, so clients cannot forge keys or widen the radius.
+Tokens issued before a data reload are rejected; the client restarts from
+the first page.
+"""
+import base64
+import hashlib
+import hmac
+import json
+
+from .risk_search import ASSESSMENT_LAYERS, IUCN_PAGE_SIZE, LAYER_QUERIES, SEARCH_RADIUS_MILES, layer_page
+
+PAGE_MAX_SIZE = 500
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _signature(body, secret):
+    key = secret.encode() if isinstance(secret, str) else secret
+    return hmac.new(key, body.encode("ascii"), hashlib.sha256).digest()[:16]
+
+
+def encode_page_token(state, secret):
+    body = _b64encode(json.dumps(state, separators=(",", ":")).encode())
+    return f"{body}.{_b64encode(_signature(body, secret))}"
+
+
+def decode_page_token(token, secret):
+    """The state dict of a token; raises ValueError if it is malformed or was not signed by us."""
+    try:
+        body, signature = str(token).split(".")
+        if not hmac.compare_digest(_b64decode(signature), _signature(body, secret)):
+            raise ValueError
+        return json.loads(_b64decode(body))
+    except ValueError:
+        raise ValueError("Invalid page token.")
+
+
+def resolve_layer(name):
+    """Layer table for a table name or risk_type ("IUCN", "Marine Risk", ...)."""
+    if name in LAYER_QUERIES:
+        return name
+    for table, (risk_type, _) in ASSESSMENT_LAYERS.items():
+        if risk_type == name:
+            return table
+    raise ValueError(f"Unknown layer: {name}")
+
+
+def parse_page_size(limit):
+    limit = IUCN_PAGE_SIZE if limit in (None, "") else int(limit)
+    return max(1, min(limit, PAGE_MAX_SIZE))
+
+
+def page_risks(table, lat, lon, mitigation, version, secret, after=None, limit=IUCN_PAGE_SIZE,
+               grid_layers=None, radius=SEARCH_RADIUS_MILES):
+    """(risks of one page, token for the next page or None)."""
+    rows, last_key = layer_page(table, lat, lon, after=after, limit=limit, grid_layers=grid_layers, radius=radius)
+    to_risk = LAYER_QUERIES[table][3]
+    risks = [to_risk(row, distance, mitigation) for row, distance in rows]
+    if last_key is None:
+        return risks, None
+    state = {"layer": table, "lat": lat, "lon": lon, "radius": radius, "limit": limit, "after": last_key,
+             "grid": bool(grid_layers and table in grid_layers), "version": version}
+    return risks, encode_page_token(state, secret)
+
+
+def resume_page(token, mitigation, version, secret, grid_layers=None):
+    """The page after the one that issued token."""
+    state = decode_page_token(token, secret)
+    if state.get("version") != version or state.get("grid") != bool(grid_layers and state["layer"] in grid_layers):
+        # Keys from another dataset (or another tie-break) would skip or repeat rows
+        raise ValueError("Page token has expired; run the search again.")
+    return page_risks(state["layer"], state["lat"], state["lon"], mitigation, version, secret,
+                      after=state["after"], limit=state["limit"], grid_layers=grid_layers, radius=state["radius"])
@@ -0,0 +1,250 @@
+"""
+Background report jobs.
+
+Reports render on a small local worker pool instead of the request thread,
+so a large PDF no longer blocks the single gunicorn worker. A job's ID is the
+content hash of (renderer version, format, layout, risk list); finished
+artifacts are kept under REPORT_CACHE_DIR by that ID, so an identical report
+is served from disk instead of being rendered again.
+
+Job state is shared through small JSON files under REPORT_CACHE_DIR/jobs, so
+with several gunicorn workers on the host any of them can answer status and
+download calls, including for a job another worker is still rendering. A
+queued or running state nobody has touched for REPORT_JOB_STALE_SECONDS is
+reported as failed (its worker died), so the client can submit it again.
+
+Job lifecycle: queued -> running -> done | failed. Progress is the number of
+risk rows rendered so far.
+"""
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .reports import REPORT_FORMATS, iter_csv, render_pdf, render_xlsx, write_xlsx_large
+
+# Resolved against the backend directory so every worker shares one cache and job state
+REPORT_CACHE_DIR = os.environ.get(
+    "REPORT_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "report_cache"))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", 2))
+# Finished jobs are forgotten after this many seconds; their artifacts stay cached on disk
+REPORT_JOB_RETENTION = 3600
+# An unfinished job whose state file is older than this has lost its worker
+REPORT_JOB_STALE_SECONDS = 300
+# How often wait() re-reads the state of a job owned by another worker
+REPORT_POLL_SECONDS = 1.0
+# Bump when the report layout changes so old artifacts are not reused
+REPORT_RENDERER_VERSION = "1"
+
+
+def report_key(risks, file_format, large=False):
+    payload = json.dumps([REPORT_RENDERER_VERSION, file_format, bool(large), risks],
+                         sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def artifact_extension(file_format):
+    return REPORT_FORMATS[file_format][0].rsplit(".", 1)[1]
+
+
+class ReportJobs:
+    def __init__(self, cache_dir=REPORT_CACHE_DIR, workers=REPORT_WORKERS, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._jobs = {}
+        self._cond = threading.Condition()
+
+    def artifact_path(self, job_id, file_format):
+        return os.path.join(self.cache_dir, f"{job_id}.{artifact_extension(file_format)}")
+
+    def state_path(self, job_id):
+        return os.path.join(self.cache_dir, "jobs", f"{job_id}.json")
+
+    def _save_state(self, job):
+        path = self.state_path(job["job_id"])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+
+    def _load_state(self, job_id):
+        """(job, version) from the shared state file, or (None, None)."""
+        path = self.state_path(job_id)
+        try:
+            with open(path) as f:
+                job = json.load(f)
+            age = time.time() - os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None, None
+        if job["status"] in ("queued", "running") and age > REPORT_JOB_STALE_SECONDS:
+            job.update(status="failed", error="Report worker stopped; submit the report again.")
+        return job, job["_version"]
+
+    def _find_artifact(self, job_id):
+        """(path, format) of a cached artifact for job_id, or (None, None)."""
+        for file_format in REPORT_FORMATS:
+            path = self.artifact_path(job_id, file_format)
+            if os.path.exists(path):
+                return path, file_format
+        return None, None
+
+    def _snapshot(self, job):
+        snapshot = {k: v for k, v in job.items() if not k.startswith("_")}
+        snapshot["progress"] = round(job["rows_done"] / job["total"], 3) if job["total"] else (
+            1.0 if job["status"] == "done" else 0.0)
+        return snapshot
+
+    def _new_job(self, job_id, file_format, total, status="queued", cached=False):
+        return {"job_id": job_id, "format": file_format, "status": status, "cached": cached,
+                "rows_done": total if status == "done" else 0, "total": total, "error": None,
+                "created_at": time.time(), "_version": 0}
+
+    def _update(self, job_id, **changes):
+        with self._cond:
+            job = self._jobs[job_id]
+            job.update(changes)
+            job["_version"] += 1
+            self._save_state(job)
+            self._cond.notify_all()
+
+    def _forget_old_jobs(self):
+        cutoff = time.time() - REPORT_JOB_RETENTION
+        for job_id in [j for j, job in self._jobs.items()
+                       if job["status"] in ("done", "failed") and job["created_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def cached_artifact(self, risks, file_format, large=False):
+        """Path of an already rendered identical report, or None."""
+        path = self.artifact_path(report_key(risks, file_format, large), file_format)
+        if os.path.exists(path):
+            os.utime(path)  # keep recently used artifacts out of the eviction order
+            return path
+        return None
+
+    def submit(self, risks, file_format, large=False):
+        """Queue a report (or reuse an identical one) and return its status."""
+        job_id = report_key(risks, file_format, large)
+        with self._cond:
+            self._forget_old_jobs()
+            job = self._jobs.get(job_id)
+            if job and job["status"] != "failed":
+                return self._snapshot(job)
+            if self.cached_artifact(risks, file_format, large):
+                job = self._jobs[job_id] = self._new_job(job_id, file_format, len(risks), "done", cached=True)
+                return self._snapshot(job)
+            shared, _ = self._load_state(job_id)
+            if shared and shared["status"] in ("queued", "running"):
+                return self._snapshot(shared)  # another worker is rendering it
+            job = self._jobs[job_id] = self._new_job(job_id, file_format, len(risks))
+            self._save_state(job)
+        self._executor.submit(self._run, job_id, risks, file_format, large)
+        return self._snapshot(job)
+
+    def _run(self, job_id, risks, file_format, large):
+        self._update(job_id, status="running")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.artifact_path(job_id, file_format)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        progress = lambda rows_done: self._update(job_id, rows_done=rows_done)
+        try:
+            with open(tmp_path, "wb") as f:
+                if file_format == "csv":
+                    for chunk in iter_csv(risks, large=large, progress=progress):
+                        f.write(chunk.encode("utf-8"))
+                elif file_format == "excel" and large:
+                    with write_xlsx_large(risks, progress) as rendered:
+                        shutil.copyfileobj(rendered, f)
+                else:
+                    render = render_pdf if file_format == "pdf" else render_xlsx
+                    f.write(render(risks, progress).getvalue())
+            os.replace(tmp_path, path)
+            self._prune_cache(keep=path)
+            self._update(job_id, status="done", rows_done=len(risks))
+            print(f"📄 Report {job_id} ({file_format}, {len(risks)} rows) ready")
+        except Exception as e:
+            print(f"❌ Report {job_id} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._update(job_id, status="failed", error=str(e))
+
+    def _prune_cache(self, keep=None):
+        """
+        Drop the least recently used artifacts once the cache exceeds max_bytes,
+        never keep (the artifact just built), and forget old job state files.
+        """
+        cutoff = time.time() - REPORT_JOB_RETENTION
+        for path in glob.glob(os.path.join(self.cache_dir, "jobs", "*.json")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+        files = []
+        for path in glob.glob(os.path.join(self.cache_dir, "*.*")):
+            if path.endswith(".tmp") or path == keep:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        if keep and os.path.exists(keep):
+            total += os.path.getsize(keep)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def status(self, job_id):
+        """Job status, falling back to the shared state and the artifact cache for other workers' jobs."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job:
+                return self._snapshot(job)
+        job, _ = self._load_state(job_id)
+        if job and (job["status"] != "done" or self._find_artifact(job_id)[0]):
+            return self._snapshot(job)
+        path, file_format = self._find_artifact(job_id)
+        if path:
+            return self._snapshot(self._new_job(job_id, file_format, 0, "done", cached=True))
+        return None
+
+    def wait(self, job_id, seen_version=-1, timeout=15):
+        """Block until the job changes past seen_version (or timeout); returns (status, version)."""
+        with self._cond:
+            if job_id in self._jobs:
+                self._cond.wait_for(lambda: job_id not in self._jobs or self._jobs[job_id]["_version"] != seen_version,
+                                    timeout=timeout)
+                job = self._jobs.get(job_id)
+                if job:
+                    return self._snapshot(job), job["_version"]
+
+        # Owned by another worker: poll its shared state
+        deadline = time.monotonic() + timeout
+        job, version = self._load_state(job_id)
+        while (job and version == seen_version and job["status"] not in ("done", "failed")
+               and time.monotonic() < deadline):
+            time.sleep(REPORT_POLL_SECONDS)
+            job, version = self._load_state(job_id)
+        return self.status(job_id), seen_version if version is None else version
+
+    def artifact(self, job_id):
+        """(path, format) of a finished job's artifact, or (None, None)."""
+        return self._find_artifact(job_id)
+
+
+report_jobs = ReportJobs()
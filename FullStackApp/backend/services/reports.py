@@ -0,0 +1,261 @@
+"""
+In-memory report rendering for /download-report-direct.
+
+There are no shared temp paths: the PDF and XLSX are rendered into BytesIO
+buffers and the CSV is a generator of text chunks, so concurrent downloads
+cannot overwrite each other and the response can start streaming at once.
+
+Large exports (more than LARGE_EXPORT_ROWS risks, or on request) use a fixed
+column layout so rows can be written one at a time: the CSV streams row
+chunks and the XLSX uses xlsxwriter's constant_memory mode, which flushes
+each row to an anonymous temp file, plus one sheet per layer and a summary
+pivot. Memory stays flat however many rows are exported. A sheet that
+reaches Excel's row limit continues on a "<name> (2)" sheet.
+"""
+import csv
+import io
+import re
+import tempfile
+
+import numpy as np
+import xlsxwriter
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+REPORT_FORMATS = {
+    "pdf": ("biodiv_report.pdf", "application/pdf"),
+    "csv": ("biodiv_report.csv", "text/csv"),
+    "excel": ("biodiv_report.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+# Rows buffered per CSV chunk before it is yielded to the response
+CSV_CHUNK_ROWS = 500
+
+LARGE_EXPORT_ROWS = 5000
+# Fixed layout of large exports: (header, risk -> value)
+EXPORT_COLUMNS = [
+    ("Risk Type", lambda r: r.get("risk_type", "Unknown")),
+    ("Threat Level", lambda r: str(r.get("threat_code", "")).title()),
+    ("Description", lambda r: r.get("description", "")),
+    ("Latitude", lambda r: r.get("latitude")),
+    ("Longitude", lambda r: r.get("longitude")),
+    ("Mitigation Action", lambda r: (r.get("mitigation") or {}).get("action", "")),
+]
+# Excel's per-sheet row limit (header row included)
+XLSX_MAX_ROWS = 1048576
+# Rows per batch when accumulating the summary pivot
+SUMMARY_BATCH_ROWS = 10000
+STREAM_CHUNK_BYTES = 64 * 1024
+# Renderers report progress to their callback every this many rows
+PROGRESS_EVERY_ROWS = 100
+
+
+def report_columns(risks):
+    """Union of the risk keys in first-seen order (the column layout pandas used)."""
+    columns = {}
+    for risk in risks:
+        for key in risk:
+            columns.setdefault(key, None)
+    return list(columns)
+
+
+def tracked(risks, progress):
+    """Iterate risks, calling progress(rows_done) every PROGRESS_EVERY_ROWS rows and at the end."""
+    done = 0
+    for risk in risks:
+        yield risk
+        done += 1
+        if progress and done % PROGRESS_EVERY_ROWS == 0:
+            progress(done)
+    if progress:
+        progress(done)
+
+
+def cell_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return value
+
+
+def render_pdf(risks, progress=None):
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(50, height - 50, "Biodiversity Risk Mitigation Report")
+    c.setFont("Helvetica", 12)
+
+    y = height - 100
+
+    def next_line(step):
+        nonlocal y
+        y -= step
+        if y < 100:
+            c.showPage()
+            c.setFont("Helvetica", 12)
+            y = height - 50
+
+    for idx, risk in enumerate(tracked(risks, progress)):
+        c.drawString(50, y, f"{idx + 1}. {risk.get('risk_type', 'Unknown')} - {risk.get('description', '')}")
+        next_line(20)
+        action = (risk.get("mitigation") or {}).get("action", "")
+        if isinstance(action, str):
+            for line in action.split("\n"):
+                c.drawString(70, y, line.strip())
+                next_line(15)
+
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def export_row(risk):
+    return [cell_value(value(risk)) for _, value in EXPORT_COLUMNS]
+
+
+def iter_csv(risks, chunk_rows=CSV_CHUNK_ROWS, large=False, progress=None):
+    """
+    Yield the CSV report in chunks of chunk_rows rows. With large=True risks
+    may be any iterable and the fixed EXPORT_COLUMNS layout is used.
+    """
+    if large:
+        header, to_row = [name for name, _ in EXPORT_COLUMNS], export_row
+    else:
+        header = report_columns(risks)
+        to_row = lambda risk: [cell_value(risk.get(column)) for column in header]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for i, risk in enumerate(tracked(risks, progress), start=1):
+        writer.writerow(to_row(risk))
+        if i % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def render_xlsx(risks, progress=None):
+    buffer = io.BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {"in_memory": True})
+    sheet = workbook.add_worksheet("Mitigation")
+    header = workbook.add_format({"bold": True})
+
+    columns = report_columns(risks)
+    sheet.write_row(0, 0, columns, header)
+    for row, risk in enumerate(tracked(risks, progress), start=1):
+        sheet.write_row(row, 0, [cell_value(risk.get(column)) for column in columns])
+
+    workbook.close()
+    buffer.seek(0)
+    return buffer
+
+
+def sheet_name(name, used):
+    """Excel-safe, unique worksheet name (max 31 chars, no []:*?/\\)."""
+    base = re.sub(r"[\[\]:*?/\\]", " ", str(name)).strip()[:31] or "Sheet"
+    candidate, n = base, 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate, n = base[:31 - len(suffix)] + suffix, n + 1
+    used.add(candidate.lower())
+    return candidate
+
+
+class SummaryPivot:
+    """Risk type x threat level counts, accumulated in vectorized batches."""
+
+    def __init__(self):
+        self.counts = {}
+        self._batch = []
+
+    def add(self, risk_type, threat_level):
+        self._batch.append((risk_type, threat_level))
+        if len(self._batch) >= SUMMARY_BATCH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self._batch:
+            return
+        pairs = np.array(self._batch, dtype=object).astype(str)
+        keys, counts = np.unique(pairs, axis=0, return_counts=True)
+        for (risk_type, level), count in zip(keys.tolist(), counts.tolist()):
+            self.counts[(risk_type, level)] = self.counts.get((risk_type, level), 0) + count
+        self._batch = []
+
+    def table(self):
+        """(levels, [(risk_type, [count per level], total)]) sorted by risk type."""
+        self.flush()
+        levels = sorted({level for _, level in self.counts})
+        types = sorted({risk_type for risk_type, _ in self.counts})
+        rows = []
+        for risk_type in types:
+            counts = [self.counts.get((risk_type, level), 0) for level in levels]
+            rows.append((risk_type, counts, sum(counts)))
+        return levels, rows
+
+
+def write_xlsx_large(risks, progress=None):
+    """
+    Write the large-export workbook for any iterable of risks and return an
+    open temp file positioned at the start. Sheets: Summary, All Risks, and
+    one per layer, each continued on further sheets past XLSX_MAX_ROWS rows.
+    """
+    output = tempfile.TemporaryFile()
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    header = workbook.add_format({"bold": True})
+    headers = [name for name, _ in EXPORT_COLUMNS]
+    used = set()
+
+    summary = workbook.add_worksheet(sheet_name("Summary", used))
+
+    # constant_memory writes each sheet's rows in order; every sheet keeps its own cursor
+    sheets = {}  # key -> [current sheet, next row]
+
+    def add_sheet(key, name):
+        sheet = workbook.add_worksheet(sheet_name(name, used))
+        sheet.write_row(0, 0, headers, header)
+        sheets[key] = [sheet, 1]
+
+    def append(key, name, row):
+        if key not in sheets or sheets[key][1] >= XLSX_MAX_ROWS:
+            add_sheet(key, name)
+        state = sheets[key]
+        state[0].write_row(state[1], 0, row)
+        state[1] += 1
+
+    add_sheet(None, "All Risks")
+    pivot = SummaryPivot()
+
+    for risk in tracked(risks, progress):
+        row = export_row(risk)
+        risk_type, level = row[0], row[1]
+        append(None, "All Risks", row)
+        append(risk_type, risk_type, row)
+        pivot.add(risk_type, level)
+
+    levels, table = pivot.table()
+    summary.write_row(0, 0, ["Risk Type"] + levels + ["Total"], header)
+    for i, (risk_type, counts, total) in enumerate(table, start=1):
+        summary.write_row(i, 0, [risk_type] + counts + [total])
+    level_totals = [sum(counts[j] for _, counts, _ in table) for j in range(len(levels))]
+    summary.write_row(len(table) + 1, 0, ["Total"] + level_totals + [sum(level_totals)], header)
+
+    workbook.close()
+    output.seek(0)
+    return output
+
+
+def iter_file(f, chunk_bytes=STREAM_CHUNK_BYTES):
+    """Stream an open file in chunks and close it when done."""
+    try:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
@@ -0,0 +1,135 @@
+"""
+/search result cache keyed by quantized location.
+
+Resolved coordinates are snapped to the centre of a SEARCH_CACHE_CELL degree
+grid cell before the layers are queried, so every search that lands in the
+same cell (same town, small map pans) produces the same result and shares
+one cache entry. Keys also carry a version stamp (dataset version plus
+mitigation catalogue version), so reloads invalidate entries without a
+purge. An entry is the unpaged, cell-wide result; /search cuts each point's
+exact circle from it and pages that (services/risk_search.py).
+
+Tiers: an in-process LRU in every worker and, when REDIS_URL is set and the
+redis package is installed, a Redis tier shared by all workers.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+SEARCH_CACHE_CELL = float(os.environ.get("SEARCH_CACHE_CELL", 0.01))  # ~1 km
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", 6 * 3600))
+SEARCH_CACHE_ENTRIES = int(os.environ.get("SEARCH_CACHE_ENTRIES", 512))
+SEARCH_CACHE_REDIS_URL = os.environ.get("REDIS_URL")
+
+
+def quantize(lat, lon, cell=SEARCH_CACHE_CELL):
+    """Grid cell index and the cell-centre coordinates for (lat, lon)."""
+    row, col = math.floor(lat / cell), math.floor(lon / cell)
+    return (row, col), (round((row + 0.5) * cell, 6), round((col + 0.5) * cell, 6))
+
+
+class ResultCache:
+    def __init__(self, max_entries=SEARCH_CACHE_ENTRIES, ttl=SEARCH_CACHE_TTL,
+                 redis_url=SEARCH_CACHE_REDIS_URL, cell=SEARCH_CACHE_CELL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cell = cell
+        self.redis_url = redis_url
+        self._redis = None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0, "stores": 0}
+
+    def _connect_redis(self):
+        if self._redis is None:
+            self._redis = False
+            if self.redis_url:
+                try:
+                    import redis
+                    self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.5)
+                    self._redis.ping()
+                except Exception as e:
+                    print(f"⚠️ Redis result cache unavailable, using memory only: {e}")
+                    self._redis = False
+        return self._redis
+
+    def key(self, lat, lon, version):
+        (row, col), _ = quantize(lat, lon, self.cell)
+        return f"search:{version}:{self.cell}:{row}:{col}"
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        client = self._connect_redis()
+        if client:
+            try:
+                raw = client.get(key)
+            except Exception as e:
+                print(f"⚠️ Redis result cache read failed: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                with self._lock:
+                    self._remember(key, value, now + self.ttl)
+                    self.stats["redis_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._remember(key, value, time.time() + self.ttl)
+            self.stats["stores"] += 1
+        client = self._connect_redis()
+        if client:
+            try:
+                client.setex(key, self.ttl, json.dumps(value))
+            except Exception as e:
+                print(f"⚠️ Redis result cache write failed: {e}")
+
+    def get_or_compute(self, lat, lon, version, compute):
+        """
+        Cached value for the cell containing (lat, lon); on a miss,
+        compute(cell_lat, cell_lon) runs for the cell centre and is stored.
+        """
+        key = self.key(lat, lon, version)
+        value = self.get(key)
+        if value is None:
+            _, (cell_lat, cell_lon) = quantize(lat, lon, self.cell)
+            value = compute(cell_lat, cell_lon)
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        stats["redis"] = bool(self._redis)
+        lookups = stats["memory_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["redis_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+search_cache = ResultCache()
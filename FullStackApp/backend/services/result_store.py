@@ -0,0 +1,134 @@
+"""
+Server-side store for /search results.
+
+The session only carries a result ID; the risk list lives here as a
+zlib-compressed JSON blob in a SQLite file shared by every worker on the
+host. IDs are content hashes, so repeat searches that return the same risks
+(e.g. result cache hits) reuse one blob. The file is bounded to
+RESULT_STORE_MAX_BYTES of blobs; the least recently read results are evicted
+first, and anything older than RESULT_STORE_TTL is dropped.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Resolved against the backend directory, not the process working directory
+RESULT_STORE_PATH = os.environ.get(
+    "RESULT_STORE_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "result_store.sqlite3"))
+RESULT_STORE_MAX_BYTES = int(os.environ.get("RESULT_STORE_MAX_BYTES", 256 * 1024 * 1024))
+RESULT_STORE_TTL = int(os.environ.get("RESULT_STORE_TTL", 24 * 3600))
+RESULT_STORE_MEMORY_ENTRIES = 64
+
+
+def encode_result(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def decode_result(blob):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class ResultStore:
+    def __init__(self, path=RESULT_STORE_PATH, max_bytes=RESULT_STORE_MAX_BYTES, ttl=RESULT_STORE_TTL,
+                 max_memory_entries=RESULT_STORE_MEMORY_ENTRIES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self._memory = OrderedDict()   # result_id -> decoded value, most recent last
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"puts": 0, "hits": 0, "misses": 0, "evicted": 0}
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=2)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    result_id TEXT PRIMARY KEY,
+                    blob BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed_at)")
+            self._db.commit()
+        return self._db
+
+    def _remember(self, result_id, value):
+        self._memory[result_id] = value
+        self._memory.move_to_end(result_id)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, db):
+        now = time.time()
+        expired = db.execute("DELETE FROM results WHERE accessed_at <= ?", (now - self.ttl,)).rowcount
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        evicted = 0
+        if total > self.max_bytes:
+            for result_id, size in db.execute("SELECT result_id, size FROM results ORDER BY accessed_at").fetchall():
+                db.execute("DELETE FROM results WHERE result_id = ?", (result_id,))
+                self._memory.pop(result_id, None)
+                evicted += 1
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self.stats["evicted"] += expired + evicted
+
+    def put(self, value):
+        """Store a result and return its ID."""
+        blob = encode_result(value)
+        result_id = hashlib.sha256(blob).hexdigest()[:32]
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute("""
+                INSERT INTO results (result_id, blob, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(result_id) DO UPDATE SET accessed_at = excluded.accessed_at
+            """, (result_id, blob, len(blob), now, now))
+            self.stats["puts"] += 1
+            if self.stats["puts"] % 50 == 1:
+                self._evict(db)
+            db.commit()
+            self._remember(result_id, value)
+        return result_id
+
+    def get(self, result_id):
+        """Stored result for result_id, or None if it is unknown or was evicted."""
+        if not result_id:
+            return None
+        with self._lock:
+            if result_id in self._memory:
+                self._memory.move_to_end(result_id)
+                self.stats["hits"] += 1
+                return self._memory[result_id]
+            db = self._connect()
+            row = db.execute("SELECT blob FROM results WHERE result_id = ?", (result_id,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            db.execute("UPDATE results SET accessed_at = ? WHERE result_id = ?", (time.time(), result_id))
+            db.commit()
+            value = decode_result(row[0])
+            self._remember(result_id, value)
+            self.stats["hits"] += 1
+            return value
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            db = self._connect()
+            stats["entries"], stats["bytes"] = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return stats
+
+
+result_store = ResultStore()
@@ -0,0 +1,272 @@
+"""
+Habitat risk scoring engine for the freshwater, terrestrial and marine layers.
+
+Every layer goes through the same pipeline, driven by its SCORING_LAYERS
+config:
+
+1. fill missing target/feature values with the column median
+2. weight each column by its absolute correlation with the layer's HCI
+   column, normalized to sum to 1 (the "AHP" weights)
+3. weighted sum, with rows whose features are all zero set to a baseline of
+   zero_baseline x the median score
+4. square-root transform, scaled between the clip quantiles and clipped to [0, 1]
+5. Low / Moderate / High from the thresholds
+
+Everything is NumPy on the whole column block; there are no per-row Python
+calls. database/score_layers.py runs it on the source tables and writes the
+*_risk_updated files the loaders read, as Parquet when pyarrow is installed
+(see services/table_io.py).
+
+score_layer_chunked() is the out-of-core mode for grids that do not fit in
+memory. Pass 1 over the CSV feeds t-digests (medians) and co-moment sums
+(correlations after the median fill); pass 2 fills, weights and spills the
+scored chunks while a t-digest tracks the weighted scores; a last stream over
+the spill applies the baseline, the quantile scaling and the levels. Peak
+memory is a few chunks, and medians and quantiles are t-digest estimates.
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from . import table_io
+from .streaming_stats import CoMoments, TDigest
+
+RISK_LEVELS = ("Low", "Moderate", "High")
+SCORING_CHUNK_ROWS = int(os.environ.get("SCORING_CHUNK_ROWS", 250000))
+
+SCORING_LAYERS = {
+    "freshwater": {
+        "source": "freshwater_hci.csv",
+        "output": "freshwater_risk_updated.csv",
+        "target": "freshwater_hci",
+        "features": ["popden2010", "maxrdd", "meanuse", "maxdof", "mincsi", "maxsed"],
+        # The freshwater score has always included the HCI column itself
+        "weight_target": True,
+        "drop_missing_target": False,
+        "zero_baseline": 0.3,
+        "clip_quantiles": (0.2, 0.8),
+        "thresholds": (0.05, 0.25),
+    },
+    "terrestrial": {
+        "source": "terrestrial_human_coexistence_nj.csv",
+        "output": "terrestrial_risk_updated.csv",
+        "target": "terrestrial_hci",
+        "features": ["aggdp2010", "ntlharm2020", "popden2010", "hmnlc2020", "roadden",
+                     "tt_cities_over_5k", "tt_ports_large", "mineden"],
+        "weight_target": False,
+        "drop_missing_target": True,
+        "zero_baseline": 0.3,
+        "clip_quantiles": (0.2, 0.8),
+        "thresholds": (0.05, 0.25),
+    },
+    "marine": {
+        "source": "marine_human_coexistence_nj.csv",
+        "output": "marine_risk_updated.csv",
+        "target": "marine_hci",
+        "features": ["fishing_intensity1", "fishing_intensity2", "coastal_population_shadow",
+                     "marine_plastics", "shipping_density"],
+        "weight_target": False,
+        "drop_missing_target": True,
+        "zero_baseline": 0.3,
+        "clip_quantiles": (0.2, 0.8),
+        "thresholds": (0.05, 0.25),
+        # marine_risk stores coordinates as latitude/longitude
+        "rename": {"x": "longitude", "y": "latitude"},
+    },
+}
+
+
+def correlation_weights(values, weight_target):
+    """
+    |corr| of every column of values with column 0 (the target), normalized to
+    sum to 1. Column 0 itself is weighted only if weight_target. Constant
+    columns (undefined correlation) get weight 0.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.atleast_2d(np.corrcoef(values, rowvar=False))
+    return weights_from_correlation(corr, weight_target), corr
+
+
+def weights_from_correlation(corr, weight_target):
+    weights = np.nan_to_num(np.abs(corr[0]))
+    if not weight_target:
+        weights[0] = 0.0
+    total = weights.sum()
+    return weights / total if total > 0 else weights
+
+
+def classify(normalized, thresholds):
+    """RISK_LEVELS label per score: <= low threshold Low, <= high threshold Moderate, above High."""
+    return np.asarray(RISK_LEVELS, dtype=object)[np.digitize(normalized, thresholds, right=True)]
+
+
+def normalize(transformed, clip_quantiles):
+    lo, hi = np.quantile(transformed, clip_quantiles)
+    if hi <= lo:
+        return np.zeros_like(transformed)
+    return np.clip((transformed - lo) / (hi - lo), 0.0, 1.0)
+
+
+def score_layer(df, config):
+    """
+    Score one layer. Returns (scored DataFrame, weights Series, correlation
+    DataFrame); the scored frame is df with the target/feature gaps filled
+    plus weighted_risk, transformed_risk, normalized_risk and risk_level.
+    """
+    target, features = config["target"], list(config["features"])
+    columns = [target] + features
+    missing = [c for c in columns if c not in df.columns]
+    if missing:
+        raise ValueError(f"missing columns {missing}")
+
+    if config.get("drop_missing_target"):
+        df = df.dropna(subset=[target])
+    df = df.reset_index(drop=True)
+    if df.empty:
+        raise ValueError("no rows to score")
+
+    values = df[columns].to_numpy(dtype=np.float64, copy=True)
+    medians = np.nanmedian(values, axis=0)
+    gaps = np.isnan(values)
+    values[gaps] = np.take(medians, np.nonzero(gaps)[1])
+
+    weights, corr = correlation_weights(values, config.get("weight_target", False))
+    weighted = values @ weights
+
+    zero_rows = (values[:, 1:] == 0).all(axis=1)
+    weighted[zero_rows] = np.median(weighted) * config["zero_baseline"]
+
+    transformed = np.sqrt(weighted)
+    normalized = normalize(transformed, config["clip_quantiles"])
+
+    scored = df.copy()
+    scored[columns] = values
+    scored["weighted_risk"] = weighted
+    scored["transformed_risk"] = transformed
+    scored["normalized_risk"] = normalized
+    scored["risk_level"] = classify(normalized, config["thresholds"])
+    if config.get("rename"):
+        scored = scored.rename(columns=config["rename"])
+
+    weight_series = pd.Series(weights, index=columns, name=target)
+    if not config.get("weight_target"):
+        weight_series = weight_series.drop(target)
+    return scored, weight_series, pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def _read_chunks(path, chunk_rows):
+    for chunk in table_io.iter_frames(path, chunk_rows):
+        chunk.columns = [c.strip().lower() for c in chunk.columns]
+        yield chunk
+
+
+def score_layer_chunked(source_path, output_path, config, chunk_rows=SCORING_CHUNK_ROWS):
+    """
+    Out-of-core score_layer() from source_path to output_path, chunk_rows
+    rows at a time. Returns (row count, weights Series, correlation DataFrame).
+    """
+    target, features = config["target"], list(config["features"])
+    columns = [target] + features
+
+    def chunks():
+        for chunk in _read_chunks(source_path, chunk_rows):
+            missing = [c for c in columns if c not in chunk.columns]
+            if missing:
+                raise ValueError(f"missing columns {missing}")
+            if config.get("drop_missing_target"):
+                chunk = chunk.dropna(subset=[target])
+            yield chunk
+
+    # Pass 1: medians and fill-aware correlations
+    digests = [TDigest() for _ in columns]
+    moments = CoMoments(len(columns))
+    for chunk in chunks():
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        for digest, column in zip(digests, values.T):
+            digest.update(column)
+        moments.update(values)
+    if moments.n == 0:
+        raise ValueError("no rows to score")
+    medians = np.array([digest.quantile(0.5) for digest in digests])
+    corr = moments.correlation(medians) if moments.n > 1 else np.ones((len(columns), len(columns)))
+    weights = weights_from_correlation(corr, config.get("weight_target", False))
+
+    # Pass 2: fill, weight and spill; track the score distribution
+    all_scores, nonzero_scores, zero_count, rows = TDigest(), TDigest(), 0, 0
+    fd, spill = tempfile.mkstemp(suffix=f".{table_io.pipeline_format()}",
+                                 dir=os.path.dirname(os.path.abspath(output_path)))
+    os.close(fd)
+    try:
+        with table_io.TableWriter(spill) as writer:
+            for chunk in chunks():
+                values = chunk[columns].to_numpy(dtype=np.float64, copy=True)
+                gaps = np.isnan(values)
+                values[gaps] = np.take(medians, np.nonzero(gaps)[1])
+                weighted = values @ weights
+                zero_rows = (values[:, 1:] == 0).all(axis=1)
+                all_scores.update(weighted)
+                nonzero_scores.update(weighted[~zero_rows])
+                zero_count += int(zero_rows.sum())
+
+                chunk = chunk.copy()
+                chunk[columns] = values
+                chunk["weighted_risk"] = weighted
+                writer.write(chunk)
+                rows += len(chunk)
+
+        baseline = all_scores.quantile(0.5) * config["zero_baseline"]
+        final_scores = nonzero_scores.update([baseline], [zero_count]) if zero_count else nonzero_scores
+        lo, hi = np.sqrt(np.clip(final_scores.quantile(config["clip_quantiles"]), 0, None))
+
+        # Finalize: baseline, scaling and levels, streamed from the spill
+        with table_io.TableWriter(output_path) as out:
+            for chunk in table_io.iter_frames(spill, chunk_rows):
+                weighted = chunk["weighted_risk"].to_numpy(dtype=np.float64, copy=True)
+                weighted[(chunk[features].to_numpy() == 0).all(axis=1)] = baseline
+                transformed = np.sqrt(weighted)
+                normalized = (np.clip((transformed - lo) / (hi - lo), 0.0, 1.0) if hi > lo
+                              else np.zeros_like(transformed))
+                chunk["weighted_risk"] = weighted
+                chunk["transformed_risk"] = transformed
+                chunk["normalized_risk"] = normalized
+                chunk["risk_level"] = classify(normalized, config["thresholds"])
+                if config.get("rename"):
+                    chunk = chunk.rename(columns=config["rename"])
+                out.write(chunk)
+    finally:
+        os.unlink(spill)
+
+    weight_series = pd.Series(weights, index=columns, name=target)
+    if not config.get("weight_target"):
+        weight_series = weight_series.drop(target)
+    return rows, weight_series, pd.DataFrame(corr, index=columns, columns=columns)
+
+
+def score_layers(layers=None, data_dir=".", out_dir=None, chunk_rows=None):
+    """
+    Score the given SCORING_LAYERS (all by default) from their source tables
+    in data_dir (a .parquet sibling of the configured CSV wins), writing the
+    scored table in the pipeline format plus {layer}_ahp_weights.csv and
+    {layer}_correlation_matrix.csv to out_dir. With chunk_rows, layers are
+    scored out of core (score_layer_chunked). Returns {layer: (output path, row count)}.
+    """
+    out_dir = out_dir or data_dir
+    counts = {}
+    for layer in layers or SCORING_LAYERS:
+        config = SCORING_LAYERS[layer]
+        source = table_io.find_input(os.path.join(data_dir, config["source"]))
+        output = table_io.output_path(os.path.join(out_dir, config["output"]))
+        if chunk_rows:
+            rows, weights, corr = score_layer_chunked(source, output, config, chunk_rows)
+        else:
+            df = table_io.read_table(source)
+            df.columns = [c.strip().lower() for c in df.columns]
+            scored, weights, corr = score_layer(df, config)
+            table_io.write_table(scored, output)
+            rows = len(scored)
+        counts[layer] = (output, rows)
+        weights.to_csv(os.path.join(out_dir, f"{layer}_ahp_weights.csv"))
+        corr.to_csv(os.path.join(out_dir, f"{layer}_correlation_matrix.csv"))
+    return counts
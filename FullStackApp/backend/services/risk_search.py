@@ -0,0 +1,421 @@
+"""
+Per-layer risk fetchers for /search.
+
+Each layer is fetched independently on its own pooled connection (or from the
+packed grid store) and the fetchers run concurrently on a shared thread pool,
+so a search takes about as long as its slowest layer instead of the sum of
+all five. Results are merged back in the fixed RISK_LAYERS order.
+
+Neighbourhoods are true circles: the GiST box filter only selects candidates
+inside the box around the SEARCH_RADIUS_MILES circle, and the vectorized
+haversine in api/haversine_api.py keeps the points inside the circle. Each
+risk carries its distance_miles, nearest first within a layer.
+
+/search caches one result per SEARCH_CACHE_CELL cell (services/result_cache.py).
+search_cell() fetches that shared result from the cell centre with the radius
+widened by the cell's half-diagonal, so it holds every point within the radius
+of any point in the cell. It is not paged. risks_for_point() then cuts the
+exact circle around the searched point, orders it and pages IUCN.
+
+layer_page() pages any single layer by keyset on (distance, id) instead of
+OFFSET, so a deep page costs the same as the first (see services/pagination.py
+for the continuation tokens).
+
+assess_locations() summarizes many sites at once for the portfolio view: one
+set-based spatial join per layer over the whole site list.
+"""
+import bisect
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .db import get_connection
+from .spatial import RISK_LAYER_COORDS, bbox_filter, bbox_params, haversine_sql, point_expr
+
+try:
+    from backend.api.haversine_api import haversine_np, radius_box, within_radius
+except ImportError:
+    from api.haversine_api import haversine_np, radius_box, within_radius
+
+SEARCH_RADIUS_MILES = float(os.environ.get("SEARCH_RADIUS_MILES", 5))
+IUCN_PAGE_SIZE = 50
+
+# One thread per layer for a few concurrent searches; keep it at or below
+# DB_POOL_MAX so fetchers do not queue on the connection pool.
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", 8))
+
+_executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="risk-search")
+
+
+IUCN_THREAT_LEVELS = {
+    "critically endangered": "high",
+    "endangered": "high",
+    "vulnerable": "moderate",
+    "near threatened": "moderate",
+    "least concern": "low",
+    "data deficient": "unknown",
+    "extinct": "high",
+    "extinct in the wild": "high",
+    "unknown": "low"
+}
+
+
+def standardize_threat_status(status):
+    return IUCN_THREAT_LEVELS.get(status.lower(), "low")
+
+
+def marine_level(hci):
+    return "high" if hci >= 0.75 else "moderate" if hci >= 0.4 else "low"
+
+
+def _query(sql, params):
+    with get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+def query(sql, params):
+    """Rows of sql, for the other layer services (looked up at call time, so a patched _query applies)."""
+    return _query(sql, params)
+
+
+def submit(fn, *args):
+    """Run fn(*args) on the shared per-layer search pool."""
+    return _executor.submit(fn, *args)
+
+
+def _coords(rows, column):
+    return np.array([np.nan if row[column] is None else row[column] for row in rows], dtype=np.float64)
+
+
+def _in_radius(rows, lat, lon, radius, lat_col, lon_col):
+    """[(row, distance_miles)] for the rows inside the circle, nearest first."""
+    if not rows:
+        return []
+    indices, distances = within_radius(lat, lon, _coords(rows, lat_col), _coords(rows, lon_col), radius)
+    return [(rows[i], round(float(d), 3)) for i, d in zip(indices, distances)]
+
+
+def _candidates(table, lat, lon, radius, select, suffix="", extra_params=()):
+    """Rows of table inside the box around the circle, via the GiST index."""
+    return _query(select + " WHERE " + bbox_filter(table) + suffix,
+                  bbox_params(lat, lon, *radius_box(lat, radius)) + tuple(extra_params))
+
+
+def risk_from_invasive(row, distance, mitigation):
+    threat_code = row[3] or "low"
+    return {
+        "latitude": row[0], "longitude": row[1],
+        "risk_type": "Invasive Species",
+        "description": row[2],
+        "threat_code": threat_code,
+        "distance_miles": distance,
+        "mitigation": mitigation("Invasive Species", threat_code)
+    }
+
+
+def risk_from_iucn(row, distance, mitigation):
+    threat_code = standardize_threat_status(row[3])
+    return {
+        "latitude": row[0], "longitude": row[1],
+        "risk_type": "IUCN",
+        "description": row[2],
+        "threat_code": threat_code,
+        "distance_miles": distance,
+        "mitigation": mitigation("IUCN", threat_code)
+    }
+
+
+def risk_from_freshwater(row, distance, mitigation):
+    threat_code = row[3].lower()
+    return {
+        "latitude": row[1], "longitude": row[0],
+        "risk_type": "Freshwater Risk",
+        "description": f"Freshwater risk level: {row[2]}",
+        "threat_code": threat_code,
+        "distance_miles": distance,
+        "mitigation": mitigation("Freshwater Risk", threat_code)
+    }
+
+
+def risk_from_marine(row, distance, mitigation):
+    hci = row[2] or 0
+    level = marine_level(hci)
+    return {
+        "latitude": row[1], "longitude": row[0],
+        "risk_type": "Marine Risk",
+        "description": f"Marine HCI Score: {hci}",
+        "threat_code": level,
+        "distance_miles": distance,
+        "mitigation": mitigation("Marine Risk", level)
+    }
+
+
+def risk_from_terrestrial(row, distance, mitigation):
+    score = float(row[2])
+    level = row[3].lower() if row[3] else "low"
+    return {
+        "latitude": row[1],  # y = latitude
+        "longitude": row[0],  # x = longitude
+        "risk_type": "Terrestrial Risk",
+        "description": f"Terrestrial Risk Level: {score:.2f}",
+        "threat_code": level,
+        "distance_miles": distance,
+        "mitigation": mitigation("Terrestrial Risk", level)
+    }
+
+
+# table -> (columns of the layer rows, latitude column, longitude column, row -> risk dict)
+LAYER_QUERIES = {
+    "invasive_species": ("latitude, longitude, common_name, threat_code", 0, 1, risk_from_invasive),
+    "iucn_data": ("latitude, longitude, species_name, threat_status", 0, 1, risk_from_iucn),
+    "freshwater_risk": ("x, y, normalized_risk, COALESCE(risk_level, 'Low')", 1, 0, risk_from_freshwater),
+    "marine_hci": ("x, y, marine_hci", 1, 0, risk_from_marine),
+    "terrestrial_risk": ("x, y, normalized_risk, risk_level", 1, 0, risk_from_terrestrial),
+}
+
+
+def layer_select(table):
+    """SELECT of the layer rows, without a WHERE clause."""
+    return f"SELECT {LAYER_QUERIES[table][0]} FROM {table}"
+
+
+def _layer_rows(table, lat, lon, grid_layers, radius):
+    """[(row, distance_miles)] of one layer inside the circle, nearest first."""
+    _, lat_col, lon_col, _ = LAYER_QUERIES[table]
+    if grid_layers and table in grid_layers:
+        rows = grid_layers[table].window_rows(lat, lon, *radius_box(lat, radius))
+    else:
+        rows = _candidates(table, lat, lon, radius, layer_select(table))
+    return _in_radius(rows, lat, lon, radius, lat_col, lon_col)
+
+
+def layer_page(table, lat, lon, after=None, limit=IUCN_PAGE_SIZE, grid_layers=None, radius=SEARCH_RADIUS_MILES):
+    """
+    One keyset page of a layer inside the circle, ordered by (distance, tie-break).
+
+    after is the key of the last row of the previous page (None for the first
+    page). The tie-break is the row id for SQL layers and the cell's (x, y)
+    for packed grids, so rows at equal distance are never skipped or repeated.
+    Returns ([(row, distance_miles)], key of the last row, or None if there
+    are no more rows).
+    """
+    columns, lat_col, lon_col, _ = LAYER_QUERIES[table]
+    if grid_layers and table in grid_layers:
+        rows = grid_layers[table].window_rows(lat, lon, *radius_box(lat, radius))
+        distances = haversine_np(lat, lon, _coords(rows, lat_col), _coords(rows, lon_col)) if rows else []
+        keyed = sorted(((float(d), row[lon_col], row[lat_col]), row)
+                       for row, d in zip(rows, distances) if d <= radius)
+        start = 0 if after is None else bisect.bisect_right([key for key, _ in keyed], tuple(after))
+        page = keyed[start:start + limit + 1]
+    else:
+        lon_name, lat_name = RISK_LAYER_COORDS[table]
+        rows = _query(f"""
+            SELECT * FROM (
+                SELECT {columns}, id, {haversine_sql("c.lat", "c.lon", lat_name, lon_name)} AS distance
+                FROM {table}, (SELECT %s::float8 AS lat, %s::float8 AS lon) AS c
+                WHERE {bbox_filter(table)}
+            ) AS candidates
+            WHERE distance <= %s{" AND (distance, id) > (%s, %s)" if after is not None else ""}
+            ORDER BY distance, id
+            LIMIT %s
+        """, (lat, lon) + bbox_params(lat, lon, *radius_box(lat, radius)) + (radius,)
+             + (tuple(after) if after is not None else ()) + (limit + 1,))
+        page = [((row[-1], row[-2]), row) for row in rows]
+
+    more = len(page) > limit
+    page = page[:limit]
+    return [(row, round(key[0], 3)) for key, row in page], list(page[-1][0]) if more else None
+
+
+def fetch_invasive_species(lat, lon, offset, grid_layers, mitigation, radius=SEARCH_RADIUS_MILES):
+    rows = _layer_rows("invasive_species", lat, lon, None, radius)
+    return [risk_from_invasive(row, d, mitigation) for row, d in rows]
+
+
+def fetch_iucn(lat, lon, offset, grid_layers, mitigation, radius=SEARCH_RADIUS_MILES):
+    # Page after the radius filter so pages are by distance and never include far points;
+    # offset None returns every row (search_cell)
+    rows = _layer_rows("iucn_data", lat, lon, None, radius)
+    if offset is not None:
+        rows = rows[offset:offset + IUCN_PAGE_SIZE]
+    return [risk_from_iucn(row, d, mitigation) for row, d in rows]
+
+
+def fetch_freshwater(lat, lon, offset, grid_layers, mitigation, radius=SEARCH_RADIUS_MILES):
+    rows = _layer_rows("freshwater_risk", lat, lon, grid_layers, radius)
+    return [risk_from_freshwater(row, d, mitigation) for row, d in rows]
+
+
+def fetch_marine(lat, lon, offset, grid_layers, mitigation, radius=SEARCH_RADIUS_MILES):
+    rows = _layer_rows("marine_hci", lat, lon, grid_layers, radius)
+    return [risk_from_marine(row, d, mitigation) for row, d in rows]
+
+
+def fetch_terrestrial(lat, lon, offset, grid_layers, mitigation, radius=SEARCH_RADIUS_MILES):
+    rows = _layer_rows("terrestrial_risk", lat, lon, grid_layers, radius)
+    return [risk_from_terrestrial(row, d, mitigation) for row, d in rows]
+
+
+# Merge order of the /search response
+RISK_LAYERS = [
+    ("invasive_species", fetch_invasive_species),
+    ("iucn_data", fetch_iucn),
+    ("freshwater_risk", fetch_freshwater),
+    ("marine_hci", fetch_marine),
+    ("terrestrial_risk", fetch_terrestrial),
+]
+
+
+def search_risks(lat, lon, mitigation, offset=0, grid_layers=None, layers=None, radius=SEARCH_RADIUS_MILES):
+    """
+    Fetch every layer concurrently and merge the risks in RISK_LAYERS order.
+    mitigation(risk_type, threat_code) supplies each risk's mitigation entry.
+    If any layer fails its exception is re-raised once all layers finish.
+    """
+    fetchers = [(name, fetch) for name, fetch in RISK_LAYERS if layers is None or name in layers]
+    futures = [_executor.submit(fetch, lat, lon, offset, grid_layers, mitigation, radius) for _, fetch in fetchers]
+
+    risk_data, error = [], None
+    for (name, _), future in zip(fetchers, futures):
+        try:
+            risk_data.extend(future.result())
+        except Exception as e:
+            print(f"❌ Risk layer {name} failed: {e}")
+            error = error or e
+    if error:
+        raise error
+    return risk_data
+
+
+def cell_reach(cell_lat, cell_lon, cell):
+    """Miles from a cache cell's centre to its farthest corner."""
+    corners_lat = [cell_lat - cell / 2, cell_lat - cell / 2, cell_lat + cell / 2, cell_lat + cell / 2]
+    corners_lon = [cell_lon - cell / 2, cell_lon + cell / 2, cell_lon - cell / 2, cell_lon + cell / 2]
+    return float(haversine_np(cell_lat, cell_lon, corners_lat, corners_lon).max())
+
+
+def search_cell(cell_lat, cell_lon, mitigation, cell, grid_layers=None, layers=None, radius=SEARCH_RADIUS_MILES):
+    """
+    Unpaged risks within radius of any point of the cache cell centred at
+    (cell_lat, cell_lon); narrow it to one point with risks_for_point().
+    """
+    return search_risks(cell_lat, cell_lon, mitigation, offset=None, grid_layers=grid_layers, layers=layers,
+                        radius=radius + cell_reach(cell_lat, cell_lon, cell))
+
+
+def risks_for_point(risks, lat, lon, offset=0, radius=SEARCH_RADIUS_MILES):
+    """
+    The /search response for (lat, lon) out of a search_cell() result:
+    distance_miles measured from the point, only risks inside its circle,
+    nearest first within each layer, and IUCN paged by offset.
+    """
+    if not risks:
+        return []
+    distances = haversine_np(lat, lon, [r["latitude"] for r in risks], [r["longitude"] for r in risks])
+    by_layer = {}  # risk_type -> [(distance, risk)], in the cached (RISK_LAYERS) order
+    for risk, d in zip(risks, distances):
+        if d <= radius:
+            by_layer.setdefault(risk["risk_type"], []).append((float(d), risk))
+
+    result = []
+    for risk_type, rows in by_layer.items():
+        rows.sort(key=lambda pair: pair[0])
+        if risk_type == "IUCN":
+            rows = rows[offset:offset + IUCN_PAGE_SIZE]
+        result.extend(dict(risk, distance_miles=round(d, 3)) for d, risk in rows)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Portfolio assessment: every site against every layer in one query per layer
+# ---------------------------------------------------------------------------
+
+# Severity order used for a site's overall level
+LEVEL_RANK = ("high", "moderate", "medium", "low", "unknown")
+
+_IUCN_LEVEL_SQL = "CASE LOWER(threat_status) " + " ".join(
+    f"WHEN '{status}' THEN '{level}'" for status, level in IUCN_THREAT_LEVELS.items()) + " ELSE 'low' END"
+
+# table -> (risk_type, SQL level expression matching the /search rows)
+ASSESSMENT_LAYERS = {
+    "invasive_species": ("Invasive Species", "LOWER(COALESCE(threat_code, 'low'))"),
+    "iucn_data": ("IUCN", _IUCN_LEVEL_SQL),
+    "freshwater_risk": ("Freshwater Risk", "LOWER(COALESCE(risk_level, 'Low'))"),
+    "marine_hci": ("Marine Risk", "CASE WHEN COALESCE(marine_hci, 0) >= 0.75 THEN 'high' "
+                                  "WHEN COALESCE(marine_hci, 0) >= 0.4 THEN 'moderate' ELSE 'low' END"),
+    "terrestrial_risk": ("Terrestrial Risk", "LOWER(COALESCE(risk_level, 'low'))"),
+}
+GRID_LEVELS = ("low", "moderate", "high")  # grid_store.LEVELS, lower-case
+
+
+def _layer_level_counts(table, site_ids, lats, lons, grid_layers, radius=SEARCH_RADIUS_MILES):
+    """{site_id: {level: count}} for one layer, from one set-based spatial join."""
+    _, level_sql = ASSESSMENT_LAYERS[table]
+
+    if grid_layers and table in grid_layers:
+        layer = grid_layers[table]
+        counts = {}
+        for site_id, lat, lon in zip(site_ids, lats, lons):
+            xs, ys, codes = layer.window_cells(lat, lon, *radius_box(lat, radius))
+            inside, _ = within_radius(lat, lon, ys, xs, radius, sort=False)
+            tally = np.bincount(codes[inside], minlength=len(GRID_LEVELS))
+            counts[site_id] = {level: int(n) for level, n in zip(GRID_LEVELS, tally) if n}
+        return counts
+
+    # One box wide enough for the site farthest from the equator; the haversine test is exact
+    lat_delta, lon_delta = radius_box(max(abs(lat) for lat in lats), radius)
+    lon_col, lat_col = RISK_LAYER_COORDS[table]
+    rows = _query(f"""
+        SELECT s.site_id, {level_sql} AS level, COUNT(*)
+        FROM unnest(%s::int[], %s::float8[], %s::float8[]) AS s(site_id, lat, lon)
+        JOIN {table} ON {point_expr(table)} <@ box(point(s.lon - %s, s.lat - %s), point(s.lon + %s, s.lat + %s))
+        WHERE {haversine_sql("s.lat", "s.lon", lat_col, lon_col)} <= %s
+        GROUP BY s.site_id, level
+    """, (list(site_ids), list(lats), list(lons), lon_delta, lat_delta, lon_delta, lat_delta, radius))
+    counts = {}
+    for site_id, level, count in rows:
+        counts.setdefault(site_id, {})[level] = count
+    return counts
+
+
+def assess_locations(locations, grid_layers=None, radius=SEARCH_RADIUS_MILES):
+    """
+    Risk summary for many sites at once, counting every risk within radius
+    miles of each site. locations are dicts with id, latitude and longitude
+    (plus any fields to echo back). Each layer is a
+    single join against the whole site list, and the layers run concurrently,
+    so the cost is five queries however many sites there are.
+    """
+    sites = [loc for loc in locations if loc.get("latitude") is not None and loc.get("longitude") is not None]
+    site_ids = [int(loc["id"]) for loc in sites]
+    lats = [float(loc["latitude"]) for loc in sites]
+    lons = [float(loc["longitude"]) for loc in sites]
+
+    per_layer = {}
+    if sites:
+        futures = {table: _executor.submit(_layer_level_counts, table, site_ids, lats, lons, grid_layers, radius)
+                   for table in ASSESSMENT_LAYERS}
+        per_layer = {table: future.result() for table, future in futures.items()}
+
+    summaries = []
+    for loc in locations:
+        summary = dict(loc)
+        if loc.get("latitude") is None or loc.get("longitude") is None:
+            summary.update(layers={}, totals={}, risk_count=0, highest_level=None, error="Location has no coordinates")
+            summaries.append(summary)
+            continue
+
+        layers, totals = {}, {}
+        for table, (risk_type, _) in ASSESSMENT_LAYERS.items():
+            counts = per_layer[table].get(int(loc["id"]), {})
+            layers[risk_type] = counts
+            for level, count in counts.items():
+                totals[level] = totals.get(level, 0) + count
+        present = [level for level in LEVEL_RANK if totals.get(level)]
+        summary.update(layers=layers, totals=totals, risk_count=sum(totals.values()),
+                       highest_level=present[0] if present else None)
+        summaries.append(summary)
+    return summaries
@@ -0,0 +1,52 @@
+"""
+Spatial lookup helpers for the risk layers queried by /search.
+
+Every layer table carries a GiST expression index on point(lon, lat) (see
+database/railway_db_setup.py), so a bounding-box filter written as
+``point(lon, lat) <@ box(...)`` is answered with an index scan instead of the
+full table scan that ``ABS(latitude - %s) <= 0.1`` forces.
+"""
+
+# Coordinate columns for each layer table: (longitude column, latitude column)
+RISK_LAYER_COORDS = {
+    "invasive_species": ("longitude", "latitude"),
+    "iucn_data": ("longitude", "latitude"),
+    "freshwater_risk": ("x", "y"),
+    "marine_hci": ("x", "y"),
+    "terrestrial_risk": ("x", "y"),
+}
+
+
+def point_expr(table):
+    """SQL point expression for a layer; must match the GiST index expression."""
+    lon_col, lat_col = RISK_LAYER_COORDS[table]
+    return f"point({lon_col}, {lat_col})"
+
+
+def spatial_index_name(table):
+    return f"idx_{table}_geo"
+
+
+def spatial_index_statements():
+    """DDL for the GiST point indexes, one per risk layer (in RISK_LAYER_COORDS order)."""
+    return [
+        f"CREATE INDEX IF NOT EXISTS {spatial_index_name(table)} ON {table} USING gist ({point_expr(table)});"
+        for table in RISK_LAYER_COORDS
+    ]
+
+
+def bbox_filter(table):
+    """Index-friendly WHERE clause; takes the four values from bbox_params()."""
+    return f"{point_expr(table)} <@ box(point(%s, %s), point(%s, %s))"
+
+
+def bbox_params(lat, lon, lat_delta, lon_delta):
+    """Corner parameters for bbox_filter() around (lat, lon), edges inclusive."""
+    return (lon - lon_delta, lat - lat_delta, lon + lon_delta, lat + lat_delta)
+
+
+def haversine_sql(lat_a, lon_a, lat_b, lon_b, radius=3960):
+    """SQL great-circle distance (miles by default) between two coordinate expressions."""
+    return (f"2 * {radius} * asin(sqrt(least(1, "
+            f"power(sin(radians({lat_b} - {lat_a}) / 2), 2) + "
+            f"cos(radians({lat_a})) * cos(radians({lat_b})) * power(sin(radians({lon_b} - {lon_a}) / 2), 2))))")
@@ -0,0 +1,166 @@
+"""
+Mergeable streaming statistics for out-of-core scoring (see
+services/risk_scoring.py score_layer_chunked).
+
+TDigest is a merging t-digest: values are buffered and periodically
+collapsed into centroids whose size follows the arcsine scale function, so
+the tails stay precise and memory is O(compression) however many values go
+in. CoMoments accumulates shifted sums of products for a block of
+columns, including the missing-value pattern, so the covariance of the data
+*after* a later median fill can be recovered exactly without a second look
+at the rows. Both merge by adding; CoMoments first re-centres the other
+accumulator's sums on its own shift, so chunks scored independently (each
+with its own first-block shift) combine exactly.
+"""
+import numpy as np
+
+TDIGEST_COMPRESSION = 1000
+
+
+class TDigest:
+    def __init__(self, compression=TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self._buffer = []
+        self._buffered = 0
+        self.count = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = np.ones_like(values) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        keep = ~np.isnan(values)
+        values, weights = values[keep], weights[keep]
+        if not len(values):
+            return self
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.count += float(weights.sum())
+        self._buffer.append((values, weights))
+        self._buffered += len(values)
+        if self._buffered >= 20 * self.compression:
+            self._compress()
+        return self
+
+    def merge(self, other):
+        other._compress()
+        if other.count:
+            self.update(other.means, other.weights)
+            self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def _scale(self, q):
+        return self.compression / (2 * np.pi) * np.arcsin(2 * np.clip(q, 0, 1) - 1)
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means] + [v for v, _ in self._buffer])
+        weights = np.concatenate([self.weights] + [w for _, w in self._buffer])
+        self._buffer, self._buffered = [], 0
+
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        # Points whose left edge falls in the same unit of k share a centroid
+        bucket = np.floor(self._scale(q_left) - self._scale(0)).astype(np.int64)
+        _, group = np.unique(bucket, return_inverse=True)
+        self.weights = np.bincount(group, weights=weights)
+        self.means = np.bincount(group, weights=means * weights) / self.weights
+
+    def quantile(self, q):
+        """Estimated q-quantile(s) (0 <= q <= 1); nan when empty."""
+        self._compress()
+        if not self.count:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        cum_mid = np.cumsum(self.weights) - self.weights / 2
+        x = np.concatenate([[0.0], cum_mid, [self.count]])
+        y = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.asarray(q, dtype=np.float64) * self.count, x, y)
+
+
+class CoMoments:
+    """
+    Shifted sums over rows of a column block with missing values (NaN), from
+    which covariance/correlation after filling each column's NaNs with a
+    constant can be computed. The shift (the first block's column means)
+    keeps the sums well conditioned.
+    """
+
+    def __init__(self, n_columns):
+        p = n_columns
+        self.shift = None
+        self.n = 0
+        self.sums = np.zeros(p)
+        self.missing = np.zeros(p)
+        self.products = np.zeros((p, p))      # sum y_i y_j over rows where both are present
+        self.present_missing = np.zeros((p, p))  # sum y_i over rows where j is missing
+        self.both_missing = np.zeros((p, p))
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return self
+        missing = np.isnan(values)
+        if self.shift is None:
+            present = (~missing).sum(axis=0)
+            self.shift = np.where(missing, 0.0, values).sum(axis=0) / np.maximum(present, 1)
+        y = np.where(missing, 0.0, values - self.shift)
+        m = missing.astype(np.float64)
+        self.n += len(values)
+        self.sums += y.sum(axis=0)
+        self.missing += m.sum(axis=0)
+        self.products += y.T @ y
+        self.present_missing += y.T @ m
+        self.both_missing += m.T @ m
+        return self
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        if self.shift is None:
+            self.shift = other.shift
+        sums, products, present_missing = other._shifted(self.shift)
+        self.n += other.n
+        self.sums += sums
+        self.missing += other.missing
+        self.products += products
+        self.present_missing += present_missing
+        self.both_missing += other.both_missing
+        return self
+
+    def _shifted(self, shift):
+        """(sums, products, present_missing) re-centred on shift; each present y becomes y + d."""
+        d = self.shift - shift
+        present = self.n - self.missing
+        both_present = self.n - self.missing[:, None] - self.missing[None, :] + self.both_missing
+        # sum y_i over rows where j is present
+        sums_where_present = self.sums[:, None] - self.present_missing
+        sums = self.sums + d * present
+        products = (self.products
+                    + sums_where_present * d[None, :]
+                    + sums_where_present.T * d[:, None]
+                    + both_present * np.outer(d, d))
+        present_missing = self.present_missing + d[:, None] * (self.missing[None, :] - self.both_missing)
+        return sums, products, present_missing
+
+    def covariance(self, fill):
+        """Sample covariance of the columns with NaNs replaced by fill (one value per column)."""
+        if self.n < 2:
+            raise ValueError("need at least two rows")
+        mu = np.asarray(fill, dtype=np.float64) - self.shift
+        sums = self.sums + mu * self.missing
+        products = (self.products
+                    + self.present_missing * mu[None, :]
+                    + self.present_missing.T * mu[:, None]
+                    + self.both_missing * np.outer(mu, mu))
+        return (products - np.outer(sums, sums) / self.n) / (self.n - 1)
+
+    def correlation(self, fill):
+        cov = self.covariance(fill)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return cov / np.outer(std, std)
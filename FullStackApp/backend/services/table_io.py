@@ -0,0 +1,202 @@
+"""
+Typed columnar intermediates for the data pipeline.
+
+Pipeline stages (score_layers.py through services/risk_scoring.py,
+bulk_load.py and ingest.py) read and write tables through this module. With pyarrow installed the
+intermediates are zstd-compressed Parquet: floats stay binary, readers load
+only the columns they ask for, and row filters are pushed down to skip whole
+row groups. Without pyarrow, or with PIPELINE_FORMAT=csv, everything falls
+back to CSV with the same API, so CSV stays available for import and export.
+
+Stages keep naming their files *.csv; output_path() swaps in the pipeline
+extension and find_input() picks up the .parquet sibling unless the CSV is
+newer (e.g. a hand-edited or freshly exported source).
+"""
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional, see requirements-full.txt
+    pa = ds = pq = None
+
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP_ROWS = 250000
+
+_FILTER_OPS = {
+    "=": lambda s, v: s == v, "==": lambda s, v: s == v, "!=": lambda s, v: s != v,
+    "<": lambda s, v: s < v, "<=": lambda s, v: s <= v, ">": lambda s, v: s > v, ">=": lambda s, v: s >= v,
+    "in": lambda s, v: s.isin(v), "not in": lambda s, v: ~s.isin(v),
+}
+
+
+def pipeline_format():
+    """"parquet" when pyarrow is available (unless PIPELINE_FORMAT=csv), else "csv"."""
+    wanted = os.environ.get("PIPELINE_FORMAT", "parquet").lower()
+    if wanted == "parquet" and pq is None:
+        return "csv"
+    return wanted if wanted in ("parquet", "csv") else "csv"
+
+
+def is_parquet(path):
+    return str(path).lower().endswith(".parquet")
+
+
+def output_path(path, fmt=None):
+    """path with the extension of the pipeline format."""
+    stem, _ = os.path.splitext(str(path))
+    return f"{stem}.{fmt or pipeline_format()}"
+
+
+def find_input(path):
+    """The .parquet sibling of path if pyarrow can read it and it is not older than path, else path."""
+    parquet = output_path(path, "parquet")
+    if pq is None or not os.path.exists(parquet):
+        return str(path)
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(parquet):
+        return str(path)
+    return parquet
+
+
+def _apply_filters(df, filters):
+    for column, op, value in filters or ():
+        df = df[_FILTER_OPS[op](df[column], value)]
+    return df
+
+
+def read_columns(path):
+    """Column names of a table without reading its rows."""
+    if is_parquet(path):
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_table(path, columns=None, filters=None):
+    """
+    Whole table as a DataFrame. columns projects; filters are
+    (column, op, value) tuples ANDed together, pushed down for Parquet.
+    """
+    if is_parquet(path):
+        return pq.read_table(path, columns=columns, filters=filters or None).to_pandas()
+    df = pd.read_csv(path, usecols=None if filters else columns)
+    df = _apply_filters(df, filters)
+    return df[columns].reset_index(drop=True) if columns else df.reset_index(drop=True)
+
+
+def iter_frames(path, chunk_rows, columns=None, filters=None):
+    """DataFrames of up to chunk_rows rows (filtered chunks may be smaller)."""
+    if is_parquet(path):
+        expression = pq.filters_to_expression(filters) if filters else None
+        for batch in ds.dataset(str(path), format="parquet").to_batches(
+                columns=columns, filter=expression, batch_size=chunk_rows):
+            if batch.num_rows:
+                yield batch.to_pandas()
+        return
+    for chunk in pd.read_csv(path, chunksize=chunk_rows, usecols=None if filters else columns):
+        chunk = _apply_filters(chunk, filters)
+        yield chunk[columns] if columns else chunk
+
+
+def _all_null(column):
+    return column.null_count == len(column)
+
+
+def _resolve_schema(tables):
+    """
+    One schema for chunks whose dtypes drifted: all-null columns take the type
+    of a chunk that has values, and int64 widens to float64 when a chunk is
+    float (pandas turns an integer column float as soon as it holds a NaN).
+    """
+    schemas = [pa.schema([pa.field(name, pa.null()) if _all_null(column) else table.schema.field(name)
+                          for name, column in zip(table.column_names, table.columns)])
+               for table in tables]
+    return pa.unify_schemas(schemas, promote_options="permissive").remove_metadata()
+
+
+def _conform(table, schema):
+    try:
+        return table.select(schema.names).cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Chunk does not fit the Parquet schema fixed by earlier chunks ({e}); "
+                         f"pass TableWriter(path, schema=...)") from e
+
+
+class TableWriter:
+    """
+    Appends DataFrame chunks to one Parquet or CSV file, picked by the path's extension.
+
+    A Parquet file has one schema, so chunks are held back until every column
+    has had a value (or a row group's worth has been buffered) and the schema
+    is resolved from all of them; later chunks are cast to it. Pass schema to
+    fix the types up front instead.
+    """
+
+    def __init__(self, path, schema=None):
+        self.path = str(path)
+        self.schema = schema
+        self.rows = 0
+        self._writer = None
+        self._pending = []
+        self._file = None
+
+    def write(self, df):
+        if is_parquet(self.path):
+            self._write_parquet(pa.Table.from_pandas(df, preserve_index=False))
+        else:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+            df.to_csv(self._file, header=self.rows == 0, index=False)
+        self.rows += len(df)
+
+    def _write_parquet(self, table):
+        if self._writer is not None:
+            self._writer.write_table(_conform(table, self._writer.schema), row_group_size=PARQUET_ROW_GROUP_ROWS)
+            return
+        self._pending.append(table)
+        unresolved = [name for name in table.column_names
+                      if all(_all_null(t.column(name)) for t in self._pending)]
+        if self.schema is not None or not unresolved or \
+                sum(t.num_rows for t in self._pending) >= PARQUET_ROW_GROUP_ROWS:
+            self._open()
+
+    def _open(self):
+        schema = self.schema or _resolve_schema(self._pending)
+        self._writer = pq.ParquetWriter(self.path, schema, compression=PARQUET_COMPRESSION)
+        pending, self._pending = self._pending, []
+        for table in pending:
+            self._writer.write_table(_conform(table, schema), row_group_size=PARQUET_ROW_GROUP_ROWS)
+
+    def close(self):
+        if self._pending:
+            self._open()
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_table(df, path):
+    """Write df to path (Parquet or CSV by extension); returns the path."""
+    if is_parquet(path):
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), str(path),
+                       compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_ROWS)
+    else:
+        df.to_csv(path, index=False)
+    return str(path)
+
+
+def convert(source, destination, chunk_rows=PARQUET_ROW_GROUP_ROWS):
+    """Stream a table between formats (e.g. import a CSV or export a Parquet); returns the row count."""
+    with TableWriter(destination) as writer:
+        for frame in iter_frames(source, chunk_rows):
+            writer.write(frame)
+    return writer.rows
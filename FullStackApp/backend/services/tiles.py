@@ -0,0 +1,172 @@
+"""
+Prebuilt z/x/y risk tile pyramid.
+
+database/build_tiles.py bins every layer into standard Web Mercator tiles
+once, after the data changes. The map then browses static files. Each tile
+is gzipped JSON:
+
+    {"layer": ..., "z": z, "x": x, "y": y,
+     "counts": {"high": n, "moderate": n, "low": n, "other": n},
+     "bins": [[bx, by, count, high, moderate, low, other, rep_lat, rep_lon], ...]}
+
+A tile is split into TILE_BINS x TILE_BINS bins. Each bin keeps its
+per-level counts and one representative point (the most severe point in the
+bin). Empty tiles are not written. manifest.json records the build version,
+which the tile endpoint uses in its ETags and in the versioned tile URLs it
+lets clients cache for good.
+"""
+import gzip
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+# Resolved against the backend directory, not the process working directory
+TILE_DIR = os.environ.get("TILE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tiles"))
+
+TILE_LEVELS = ("high", "moderate", "low", "other")
+TILE_BINS = 16
+TILE_MIN_ZOOM = 6
+TILE_MAX_ZOOM = 14
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def level_codes(levels):
+    """TILE_LEVELS index per level string; anything unrecognised is "other"."""
+    lookup = {level: i for i, level in enumerate(TILE_LEVELS)}
+    other = lookup["other"]
+    return np.fromiter((lookup.get(str(level or "").strip().lower(), other) for level in levels),
+                       dtype=np.int8, count=len(levels))
+
+
+def tile_coords(lats, lons, zoom):
+    """Fractional Web Mercator tile coordinates (x, y) of each point at zoom."""
+    lat = np.radians(np.clip(np.asarray(lats, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    n = 2.0 ** zoom
+    x = (np.asarray(lons, dtype=np.float64) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * n
+    return np.clip(x, 0, n - 1e-9), np.clip(y, 0, n - 1e-9)
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of a tile in degrees."""
+    n = 2.0 ** z
+    west, east = x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tile_path(tile_dir, layer, z, x, y):
+    return os.path.join(tile_dir, layer, str(z), str(x), f"{y}.json.gz")
+
+
+def read_tile(tile_dir, layer, z, x, y):
+    """A tile's dict, or None for an empty (unwritten) tile."""
+    try:
+        with gzip.open(tile_path(tile_dir, layer, z, x, y), "rt") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def bin_tiles(lats, lons, codes, zoom, bins=TILE_BINS):
+    """
+    Bin points into the tiles of one zoom level. Returns {(x, y): tile dict}
+    with per-level counts and per-bin counts and representative points.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    codes = np.asarray(codes, dtype=np.int8)
+    if not len(lats):
+        return {}
+
+    fx, fy = tile_coords(lats, lons, zoom)
+    tx, ty = fx.astype(np.int64), fy.astype(np.int64)
+    bx = ((fx - tx) * bins).astype(np.int64)
+    by = ((fy - ty) * bins).astype(np.int64)
+    n = np.int64(2 ** zoom)
+    key = ((tx * n + ty) * bins + bx) * bins + by
+
+    # Sort by bin, most severe level first, so each bin's first point is its representative
+    order = np.lexsort((codes, key))
+    key, codes_sorted = key[order], codes[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    group = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(key)]))
+
+    per_level = np.zeros((len(starts), len(TILE_LEVELS)), dtype=np.int64)
+    np.add.at(per_level, (group, codes_sorted), 1)
+    rep = order[starts]
+
+    bin_keys = key[starts]
+    bin_by = bin_keys % bins
+    bin_bx = (bin_keys // bins) % bins
+    tile_key = bin_keys // (bins * bins)
+
+    tiles = {}
+    for i, k in enumerate(tile_key.tolist()):
+        x, y = divmod(k, int(n))
+        tile = tiles.get((x, y))
+        if tile is None:
+            tile = tiles[(x, y)] = {"z": zoom, "x": x, "y": y, "counts": [0] * len(TILE_LEVELS), "bins": []}
+        counts = per_level[i].tolist()
+        tile["counts"] = [a + b for a, b in zip(tile["counts"], counts)]
+        tile["bins"].append([int(bin_bx[i]), int(bin_by[i]), int(sum(counts))] + counts
+                            + [round(float(lats[rep[i]]), 6), round(float(lons[rep[i]]), 6)])
+    for tile in tiles.values():
+        tile["counts"] = {level: n for level, n in zip(TILE_LEVELS, tile["counts"]) if n}
+    return tiles
+
+
+def build_tile_pyramid(layer, lats, lons, levels, tile_dir, min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM):
+    """Write every tile of one layer for zooms min_zoom..max_zoom; returns the tile count."""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    keep = np.isfinite(lats) & np.isfinite(lons)
+    lats, lons = lats[keep], lons[keep]
+    codes = level_codes([lv for lv, k in zip(levels, keep) if k])
+
+    written = 0
+    for zoom in range(min_zoom, max_zoom + 1):
+        for (x, y), tile in bin_tiles(lats, lons, codes, zoom).items():
+            path = tile_path(tile_dir, layer, zoom, x, y)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(path, "wt", compresslevel=9) as f:
+                json.dump(dict(tile, layer=layer), f, separators=(",", ":"))
+            written += 1
+    return written
+
+
+def write_manifest(tile_dir, layers, min_zoom=TILE_MIN_ZOOM, max_zoom=TILE_MAX_ZOOM, dataset_version=None):
+    manifest = {
+        "version": f"{dataset_version or 0}-{int(time.time())}",
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "layers": layers,
+        "min_zoom": min_zoom,
+        "max_zoom": max_zoom,
+        "bins": TILE_BINS,
+        "levels": list(TILE_LEVELS),
+    }
+    tmp_path = os.path.join(tile_dir, "manifest.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(tile_dir, "manifest.json"))
+    return manifest
+
+
+_manifest = {"path": None, "mtime": None, "value": None}
+
+
+def load_manifest(tile_dir):
+    """manifest.json of tile_dir (reloaded when the file changes), or None if no pyramid is built."""
+    path = os.path.join(tile_dir, "manifest.json")
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _manifest["path"] != path or _manifest["mtime"] != mtime:
+        with open(path) as f:
+            _manifest.update(path=path, mtime=mtime, value=json.load(f))
+    return _manifest["value"]
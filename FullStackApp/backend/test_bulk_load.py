@@ -0,0 +1,53 @@
+"""
+Tests for the COPY bulk loader helpers (no database needed).
+"""
+import sys
+import os
+import csv
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import bulk_load
+from services.risk_scoring import SCORING_LAYERS
+
+
+def test_csv_chunks_select_and_rename_columns(tmp_path):
+    path = tmp_path / "iucn.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Species Name", "Endangered", "Latitude", "Longitude", "Notes"])
+        for i in range(25):
+            writer.writerow([f"Species {i}", "Vulnerable", 40 + i / 100, "" if i == 3 else -74.5, "x"])
+
+    renames = {"endangered": "threat_status"}
+    columns = bulk_load.csv_columns(path, {"id", "species_name", "threat_status", "latitude", "longitude"}, renames)
+    assert columns == ["species_name", "threat_status", "latitude", "longitude"]
+
+    chunks = list(bulk_load.csv_chunks(path, columns, renames, chunk_rows=10))
+    assert [count for count, _ in chunks] == [10, 10, 5]
+    rows = [row for _, buffer in chunks for row in csv.reader(buffer)]
+    assert rows[0] == ["Species 0", "Vulnerable", "40.0", "-74.5"]
+    assert rows[3][3] == ""  # empty field is NULL for COPY ... (FORMAT csv)
+
+
+def test_staged_indexes_target_the_staging_table():
+    indexes = [
+        ("marine_hci_pkey", "CREATE UNIQUE INDEX marine_hci_pkey ON public.marine_hci USING btree (id)", True),
+        ("idx_marine_hci_geo", "CREATE INDEX idx_marine_hci_geo ON public.marine_hci USING gist (point(x, y))", False),
+    ]
+    staged = bulk_load.staged_index_definitions(indexes, "marine_hci", "marine_hci_staging")
+    assert staged[0] == ("marine_hci_pkey_staging", "marine_hci_pkey", [
+        "CREATE UNIQUE INDEX marine_hci_pkey_staging ON public.marine_hci_staging USING btree (id)",
+        "ALTER TABLE marine_hci_staging ADD CONSTRAINT marine_hci_pkey_staging PRIMARY KEY USING INDEX marine_hci_pkey_staging",
+    ])
+    assert staged[1][2] == ["CREATE INDEX idx_marine_hci_geo_staging ON public.marine_hci_staging USING gist (point(x, y))"]
+
+
+def test_parse_sources():
+    assert bulk_load.parse_sources(["marine_hci=/tmp/m.csv", "freshwater_risk"]) == {
+        "marine_hci": "/tmp/m.csv", "freshwater_risk": "freshwater_risk_updated.csv"}
+
+
+def test_scored_outputs_are_the_files_the_loader_reads():
+    for layer, config in SCORING_LAYERS.items():
+        assert bulk_load.LOAD_SPECS[f"{layer}_risk"][0] == config["output"]
@@ -0,0 +1,81 @@
+"""
+Tests for the /viewport clustering helpers.
+"""
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import clustering, risk_search
+from services.grid_store import GridLayer, pack_layer
+from services.tiles import build_tile_pyramid, write_manifest
+
+
+@pytest.fixture
+def grid_layers(tmp_path):
+    xs, ys = np.meshgrid(np.arange(-75.0, -74.0, 0.01), np.arange(39.5, 40.5, 0.01))
+    levels = np.where(np.arange(xs.size) % 100 >= 50, "High", "Low")  # east half High
+    base = pack_layer("terrestrial_risk", xs.ravel(), ys.ravel(), np.ones(xs.size), levels, str(tmp_path))
+    return {"terrestrial_risk": GridLayer(base)}
+
+
+def test_low_zoom_clusters_are_bounded_by_screen_cells(grid_layers):
+    result = clustering.viewport(39.5, -75.0, 40.5, -74.0, 9, grid_layers=grid_layers, layers=["terrestrial_risk"])
+    layer = result["layers"]["Terrestrial Risk"]
+    lat_cell, lon_cell = clustering.cell_degrees(9, 40.0)
+
+    assert result["clustered"]
+    assert layer["total"] == 100 * 100
+    assert len(layer["clusters"]) <= (1 / lat_cell + 2) * (1 / lon_cell + 2)
+    assert sum(c["levels"].get("high", 0) for c in layer["clusters"]) == 50 * 100
+
+
+def test_high_zoom_returns_points_and_rejects_huge_viewports(grid_layers):
+    result = clustering.viewport(39.9, -74.6, 39.95, -74.55, 15, grid_layers=grid_layers,
+                                 layers=["terrestrial_risk"])
+    points = result["layers"]["Terrestrial Risk"]["points"]
+    assert not result["clustered"] and points and "mitigation" not in points[0]
+
+    with pytest.raises(ValueError):
+        clustering.parse_viewport({"south": 30, "west": -80, "north": 45, "east": -70, "zoom": 5})
+
+
+def test_low_zoom_clusters_come_from_the_tile_pyramid(tmp_path, monkeypatch):
+    lats, lons = np.meshgrid(np.arange(39.5, 40.5, 0.01), np.arange(-75.0, -74.0, 0.01))
+    levels = np.where(lons.ravel() >= -74.5, "High", "Low")
+    build_tile_pyramid("terrestrial_risk", lats.ravel(), lons.ravel(), levels, str(tmp_path), max_zoom=8)
+    write_manifest(str(tmp_path), {"terrestrial_risk": lats.size}, max_zoom=8)
+    monkeypatch.setattr(clustering, "_sql_clusters", lambda *a: pytest.fail("queried Postgres"))
+
+    result = clustering.viewport(38.0, -76.0, 42.0, -73.0, 9, layers=["terrestrial_risk"], tile_dir=str(tmp_path))
+    layer = result["layers"]["Terrestrial Risk"]
+    assert layer["total"] == 100 * 100
+    assert sum(c["levels"].get("high", 0) for c in layer["clusters"]) == 50 * 100
+
+
+def test_truncated_only_past_the_cap(grid_layers, monkeypatch):
+    def points(n):
+        monkeypatch.setattr(clustering, "_points", lambda *a: [{"lat": 40.0, "lon": -74.5}] * n)
+        layer = clustering.viewport(39.9, -74.6, 39.95, -74.55, 15, grid_layers=grid_layers,
+                                    layers=["terrestrial_risk"])["layers"]["Terrestrial Risk"]
+        return len(layer["points"]), layer["truncated"]
+
+    cap = clustering.VIEWPORT_MAX_POINTS
+    assert points(cap) == (cap, False)
+    assert points(cap + 1) == (cap, True)
+
+
+def test_sql_layers_go_through_risk_search_query(tmp_path, monkeypatch):
+    queries = []
+
+    def fake_query(sql, params):
+        queries.append(sql)
+        return []
+
+    monkeypatch.setattr(risk_search, "_query", fake_query)
+    result = clustering.viewport(39.9, -74.6, 39.95, -74.55, 10, layers=["iucn_data"], tile_dir=str(tmp_path))
+    assert result["layers"]["IUCN"] == {"clusters": [], "total": 0, "truncated": False}
+    assert len(queries) == 1 and "GROUP BY" in queries[0]
@@ -0,0 +1,60 @@
+"""
+Tests for the compact columnar risk encoding and compressed JSON responses.
+"""
+import sys
+import os
+import gzip
+import json
+from decimal import Decimal
+
+from flask import Flask, request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import compact
+
+
+def make_risks(n):
+    mitigation = {"high": {"score": 3, "action": "Remove and monitor.\n1. ..."},
+                  "low": {"score": 1, "action": "Monitor periodically.\n1. ..."}}
+    risks = []
+    for i in range(n):
+        level = "high" if i % 3 else "low"
+        risks.append({"latitude": 40 + i * 1e-4, "longitude": -74.5, "risk_type": ["IUCN", "Marine Risk"][i % 2],
+                      "description": f"Species {i}", "threat_code": level, "distance_miles": round(i * 0.01, 3),
+                      "mitigation": dict(mitigation[level])})
+    return risks
+
+
+def test_compact_round_trips_and_dedupes_mitigations():
+    risks = make_risks(200) + [dict(make_risks(1)[0], threat_code="severe")]
+    encoded = compact.compact_risks(risks)
+    assert len(encoded["mitigations"]) == 2
+    assert "severe" in encoded["threat_codes"]
+    assert list(encoded["layers"]) == ["IUCN", "Marine Risk"]
+
+    by_layer = sorted(risks, key=lambda r: r["risk_type"] != "IUCN")
+    assert compact.expand_risks(encoded) == by_layer
+    assert len(json.dumps(encoded)) < len(json.dumps(risks)) / 3
+
+
+def test_response_negotiation_and_compression():
+    app = Flask(__name__)
+    payload = {"risks": make_risks(300), "score": Decimal("0.5")}
+
+    with app.test_request_context("/search?format=compact", headers={"Accept-Encoding": "gzip"}):
+        response = compact.risks_response(payload, request)
+        assert response.mimetype == compact.COMPACT_MIMETYPE
+        assert response.headers["Content-Encoding"] in ("gzip", "br")
+
+    with app.test_request_context("/search", headers={"Accept": compact.COMPACT_MIMETYPE}):
+        response = compact.risks_response(payload, request)
+        assert json.loads(response.get_data())["risks"]["format"] == compact.COMPACT_FORMAT
+        assert "Content-Encoding" not in response.headers
+
+    with app.test_request_context("/search", headers={"Accept": "application/json", "Accept-Encoding": "gzip"}):
+        response = compact.risks_response(payload, request)
+        assert response.mimetype == "application/json"
+        assert response.headers["Content-Encoding"] == "gzip"
+        body = json.loads(gzip.decompress(response.get_data()))
+        assert body["risks"][0]["description"] == "Species 0" and body["score"] == 0.5
@@ -0,0 +1,93 @@
+"""
+Tests for the shared PostgreSQL connection pool (no database needed).
+"""
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import db
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.rollbacks = 0
+        self.in_transaction = False
+
+    def get_transaction_status(self):
+        return 2 if self.in_transaction else 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(db.psycopg2, "connect", lambda *args, **kwargs: FakeConnection())
+    # Put the module's pool back afterwards so no later test sees the fake one
+    monkeypatch.setattr(db, "_pool", db._pool)
+    fake = db.init_pool({"host": "test"}, maxconn=2, timeout=0.05, leak_seconds=3600)
+    yield fake
+    fake.closeall()
+
+
+def test_connections_are_reused_and_bounded(pool):
+    with db.get_connection() as first:
+        with db.get_connection() as second:
+            assert first is not second
+            with pytest.raises(db.PoolTimeout):
+                with db.get_connection():
+                    pass
+    with db.get_connection() as again:
+        assert again in (first, second)
+    assert pool.status()["created"] == 2
+    assert pool.status()["in_use"] == 0
+
+
+def test_waiter_gets_connection_when_released(pool):
+    pool.timeout = 2
+    results = []
+    with db.get_connection():
+        with db.get_connection():
+            waiter = threading.Thread(target=lambda: results.append(pool.getconn()))
+            waiter.start()
+    waiter.join(1)
+    assert results and results[0] is not None
+    pool.putconn(results[0])
+    assert pool.status()["in_use"] == 0
+
+
+def test_error_rolls_back_and_returns_connection(pool):
+    with pytest.raises(ValueError):
+        with db.get_connection() as conn:
+            conn.in_transaction = True
+            raise ValueError("boom")
+    assert conn.rollbacks == 1
+    assert pool.status()["in_use"] == 0
+
+    # Open transactions left by a handler are rolled back on return
+    with db.get_connection() as conn:
+        conn.in_transaction = True
+    assert not conn.in_transaction
+
+
+def test_closed_connections_are_not_reused(pool):
+    with db.get_connection() as conn:
+        conn.close()
+    with db.get_connection() as fresh:
+        assert fresh is not conn
+
+
+def test_leaked_connection_is_reported(pool):
+    pool.leak_seconds = 0
+    conn = pool.getconn()
+    assert pool.status()["leaks"] == 1
+    pool.putconn(conn)
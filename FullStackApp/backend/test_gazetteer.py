@@ -0,0 +1,55 @@
+"""
+Tests for the offline NJ ZIP gazetteer and the autocomplete index built on it.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.gazetteer import get_gazetteer, is_nj_zip, lat_lon_to_zip, parse_zip, zip_to_lat_lon
+
+
+def test_forward_lookup():
+    lat, lon = zip_to_lat_lon("08540")
+    assert round(lat, 2) == 40.38 and round(lon, 2) == -74.66
+    assert zip_to_lat_lon("10001") == (None, None)
+    assert zip_to_lat_lon("abc") == (None, None)
+
+
+def test_zip_plus_four_resolves_to_its_zip():
+    assert parse_zip("08540") == parse_zip(" 08540-1234 ") == "08540"
+    for text in ("40.35,-74.65", "0854", "08540-12", "085401234", "-74.65", "08540 main st"):
+        assert parse_zip(text) is None, text
+    assert zip_to_lat_lon(parse_zip("08540-1234")) == zip_to_lat_lon("08540")
+
+
+def test_reverse_lookup_picks_nearest_delivery_zip():
+    gazetteer = get_gazetteer()
+    for zip_code in ("07001", "07102", "08401"):
+        record = gazetteer.lookup_zip(zip_code)
+        assert lat_lon_to_zip(record["latitude"] + 0.001, record["longitude"]) == zip_code
+    # Far outside New Jersey
+    assert lat_lon_to_zip(35.0, -80.0) is None
+
+
+def test_zip_validation_accepts_south_jersey():
+    assert is_nj_zip("07001") and is_nj_zip("08540")
+    assert not is_nj_zip("10001") and not is_nj_zip(None)
+
+
+def test_autocomplete_ranks_towns_and_resolves_suggestions():
+    from utils.autocomplete import resolve, suggest
+
+    names = [s["display_name"] for s in suggest("princ")]
+    assert names[0] == "Princeton, Mercer County, New Jersey"
+    assert all("Princeton" in name for name in names)
+    assert suggest("08540")[0]["display_name"].endswith("08540")
+
+    place = resolve(names[0].upper())
+    assert place and round(place["latitude"], 1) == 40.4
+
+    # House numbers only match street entries, so town names fall through to Nominatim
+    assert suggest("12 princeton") == []
+
+    # A leading ZIP is not a house number
+    assert suggest("07001 aven")[0]["display_name"] == "Avenel, Middlesex County, New Jersey, 07001"
@@ -0,0 +1,65 @@
+"""
+Tests for the two-tier geocoding cache.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import geocode
+from utils.geocode import GeocodeCache, normalize_query
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+def test_normalize_query_collapses_spacing_and_case():
+    assert normalize_query({"q": "12 Main St ,  Trenton"}) == normalize_query({"q": "12 main st, trenton"})
+    assert normalize_query({"q": "a", "limit": 5}) == "limit=5&q=a"
+
+
+def test_disk_tier_survives_restart_and_expires(tmp_path):
+    path = str(tmp_path / "geocode.sqlite3")
+    cache = GeocodeCache(path, ttl=60, negative_ttl=60)
+    cache.set("q=trenton", [{"lat": "40.2", "lon": "-74.7"}])
+
+    fresh = GeocodeCache(path)
+    assert fresh.get("q=trenton") == [{"lat": "40.2", "lon": "-74.7"}]
+    assert fresh.stats["disk_hits"] == 1
+    assert fresh.get("q=trenton") is not None
+    assert fresh.stats["memory_hits"] == 1
+
+    expired = GeocodeCache(str(tmp_path / "other.sqlite3"), ttl=-1)
+    expired.set("q=x", [{"lat": "1", "lon": "2"}])
+    assert expired.get("q=x") is None
+
+
+def test_memory_tier_is_lru_bounded(tmp_path):
+    cache = GeocodeCache(str(tmp_path / "geocode.sqlite3"), max_memory_entries=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, [key])
+    assert list(cache._memory) == ["b", "c"]
+
+
+def test_nominatim_search_caches_hits_and_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(geocode, "geocode_cache", GeocodeCache(str(tmp_path / "geocode.sqlite3")))
+    calls = []
+
+    def fake_get(url, params=None, headers=None, timeout=None):
+        calls.append(params["q"])
+        return FakeResponse([] if params["q"] == "nowhere" else [{"lat": "40.2", "lon": "-74.7"}])
+
+    monkeypatch.setattr(geocode.requests, "get", fake_get)
+
+    for _ in range(3):
+        assert geocode.nominatim_search({"q": "Trenton"})[0]["lat"] == "40.2"
+        assert geocode.nominatim_search({"q": "nowhere"}) == []
+    assert calls == ["Trenton", "nowhere"]
+    assert geocode.geocode_cache.snapshot()["negative_hits"] == 2
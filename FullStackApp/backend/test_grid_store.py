@@ -0,0 +1,76 @@
+"""
+Tests for the memory-mapped HCI grid store.
+"""
+import sys
+import os
+import subprocess
+import textwrap
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.grid_store import current_grid_layers, load_grid_layers, pack_layer
+
+
+def _pack_sample(directory):
+    # 3 x 3 grid with 0.05 degree cells and one missing cell
+    xs, ys, values, levels = [], [], [], []
+    for i in range(3):
+        for j in range(3):
+            if (i, j) == (1, 1):
+                continue
+            xs.append(-74.1 + j * 0.05)
+            ys.append(40.0 + i * 0.05)
+            values.append(i * 3 + j)
+            levels.append(["low", "Moderate", None][j])
+    pack_layer("freshwater_risk", xs, ys, values, levels, directory)
+
+
+def test_point_lookup(tmp_path):
+    _pack_sample(str(tmp_path))
+    grid = load_grid_layers(str(tmp_path))["freshwater_risk"]
+
+    assert grid.point(40.05, -74.1) == (3.0, "Low")
+    assert grid.point(40.1, -74.05) == (7.0, "Moderate")
+    assert grid.point(40.05, -74.05) is None
+    assert grid.point(45.0, -74.05) is None
+
+
+def test_window_matches_inclusive_box(tmp_path):
+    _pack_sample(str(tmp_path))
+    grid = load_grid_layers(str(tmp_path))["freshwater_risk"]
+
+    rows = grid.window_rows(40.0, -74.1, 0.05, 0.05)
+    assert sorted((round(x, 2), round(y, 2)) for x, y, _, _ in rows) == [
+        (-74.1, 40.0), (-74.1, 40.05), (-74.05, 40.0)
+    ]
+    assert grid.window_rows(30.0, -74.1, 0.05, 0.05) == []
+
+
+def test_repack_does_not_break_mapped_layers(tmp_path):
+    # A rebuild used to np.save over the mapped files; the next read died with SIGBUS
+    script = textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})
+        import numpy as np
+        from services.grid_store import current_grid_layers, load_grid_layers, pack_layer
+
+        xs, ys = np.meshgrid(np.arange(-75.0, -74.0, 0.01), np.arange(39.5, 40.5, 0.01))
+        pack_layer("marine_hci", xs.ravel(), ys.ravel(), np.ones(xs.size), ["High"] * xs.size, {str(tmp_path)!r})
+        old = load_grid_layers({str(tmp_path)!r})["marine_hci"]
+        pack_layer("marine_hci", [-74.0, -73.9], [40.0, 40.0], [2.0, 3.0], ["Low", "Low"], {str(tmp_path)!r})
+        assert float(np.nansum(old.values)) == xs.size
+        assert load_grid_layers({str(tmp_path)!r})["marine_hci"].point(40.0, -73.9) == (3.0, "Low")
+    """)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert sorted(os.listdir(tmp_path)) == ["marine_hci"]
+
+
+def test_current_layers_follow_the_dataset_version(tmp_path):
+    directory = str(tmp_path)
+    pack_layer("marine_hci", [-74.0, -73.9], [40.0, 40.0], [1.0, 2.0], ["Low", "High"], directory, "3")
+    assert current_grid_layers(directory, "3")["marine_hci"].point(40.0, -73.9) == (2.0, "High")
+    assert current_grid_layers(directory, "4") == {}  # reloaded data, stale store: SQL fallback
+
+    pack_layer("marine_hci", [-74.0, -73.9], [40.0, 40.0], [1.0, 5.0], ["Low", "Low"], directory, "4")
+    assert current_grid_layers(directory, "4")["marine_hci"].point(40.0, -73.9) == (5.0, "Low")
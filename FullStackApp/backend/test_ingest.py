@@ -0,0 +1,42 @@
+"""
+Tests for the incremental ingest helpers (no database needed).
+"""
+import sys
+import os
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import ingest
+
+
+def test_upsert_only_rewrites_changed_rows():
+    sql = ingest.upsert_sql("freshwater_risk", ["x", "y", "normalized_risk", "risk_level"], ("x", "y"), "ingest_rows")
+    assert "SELECT DISTINCT ON (x, y) x, y, normalized_risk, risk_level FROM ingest_rows" in sql
+    assert "WHERE x IS NOT NULL AND y IS NOT NULL" in sql
+    assert "ON CONFLICT (x, y) DO UPDATE SET normalized_risk = EXCLUDED.normalized_risk" in sql
+    assert ("WHERE (freshwater_risk.normalized_risk, freshwater_risk.risk_level) "
+            "IS DISTINCT FROM (EXCLUDED.normalized_risk, EXCLUDED.risk_level)") in sql
+
+    assert ingest.upsert_sql("marine_hci", ["x", "y"], ("x", "y"), "ingest_rows").endswith("ON CONFLICT (x, y) DO NOTHING")
+    assert ingest.prune_sql("marine_hci", ("x", "y"), "ingest_seen") == (
+        "DELETE FROM marine_hci WHERE NOT EXISTS "
+        "(SELECT 1 FROM ingest_seen s WHERE s.x = marine_hci.x AND s.y = marine_hci.y)")
+
+
+def test_chunk_checksums_track_content(tmp_path):
+    path = tmp_path / "freshwater.csv"
+    df = pd.DataFrame({"X": [-74.0 + i / 100 for i in range(30)], "Y": [40.0] * 30, "Risk Level": ["High"] * 30})
+    df.to_csv(path, index=False)
+    columns = ["x", "y", "risk_level"]
+
+    before = [ingest.chunk_text(frame, columns)[0] for frame in ingest.csv_frames(path, chunk_rows=10)]
+    checksum = ingest.file_checksum(path)
+
+    df.loc[25, "Risk Level"] = "Low"
+    df.to_csv(path, index=False)
+    after = [ingest.chunk_text(frame, columns)[0] for frame in ingest.csv_frames(path, chunk_rows=10)]
+
+    assert ingest.file_checksum(path) != checksum
+    assert before[:2] == after[:2] and before[2] != after[2]
@@ -0,0 +1,71 @@
+"""
+Tests for the per-layer k-nearest-neighbour lookup.
+"""
+import sys
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from api.haversine_api import haversine_np
+from services import knn
+
+
+def test_knn_matches_brute_force_and_respects_max_distance(monkeypatch):
+    rng = np.random.default_rng(3)
+    lats, lons = rng.uniform(38.9, 41.4, 50000), rng.uniform(-75.6, -73.9, 50000)
+    lats[10] = np.nan
+    index = knn.LayerKNN(lats, lons, lambda i: i)
+
+    result = index.query(40.22, -74.76, k=8, max_miles=50)
+    d = haversine_np(40.22, -74.76, lats, lons)
+    expected = np.argsort(np.where(np.isnan(d), np.inf, d))[:8]
+    assert [i for i, _ in result] == expected.tolist()
+    assert [dist for _, dist in result] == sorted(dist for _, dist in result)
+
+    assert index.query(40.22, -74.76, k=8, max_miles=0.01) == []
+
+    # Same answer from the brute-force path used without scipy
+    monkeypatch.setattr(knn, "cKDTree", None)
+    assert knn.LayerKNN(lats, lons, lambda i: i).query(40.22, -74.76, k=8, max_miles=50) == result
+
+
+def test_knn_params_are_clamped():
+    assert knn.parse_knn_params() == (knn.KNN_DEFAULT_K, knn.KNN_DEFAULT_MAX_MILES)
+    assert knn.parse_knn_params("5000", "-3") == (knn.KNN_MAX_K, 0.0)
+
+
+def test_knn_params_reject_non_numbers():
+    for k, max_distance in (("ten", None), (None, "far"), (None, "nan"), ([3], None)):
+        with pytest.raises(ValueError):
+            knn.parse_knn_params(k, max_distance)
+
+
+def test_version_change_rebuilds_in_the_background(monkeypatch):
+    release = threading.Event()
+    builds = []
+
+    def build(table, grid_layers=None):
+        builds.append(table)
+        if len(builds) > len(knn.LAYER_QUERIES):
+            release.wait(5)
+        return knn.LayerKNN([40.0], [-74.0], lambda i: (table, len(builds)))
+
+    monkeypatch.setattr(knn, "build_layer_knn", build)
+    indexes = knn.KNNIndexes()
+    first = indexes.get("1")
+
+    # The rebuild for "2" is stuck; callers keep getting the "1" indexes without waiting
+    assert indexes.get("2") is first
+    assert indexes.get("2") is first
+    release.set()
+    for _ in range(100):
+        if indexes._version == "2":
+            break
+        time.sleep(0.05)
+    assert indexes.get("2") is not first
+    assert len(builds) == 2 * len(knn.LAYER_QUERIES)
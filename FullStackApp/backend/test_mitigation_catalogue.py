@@ -0,0 +1,61 @@
+"""
+Tests for the precomputed mitigation catalogue lookups.
+"""
+import sys
+import os
+import json
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mitigation_action
+
+
+@pytest.fixture(autouse=True)
+def restore_catalogue(monkeypatch):
+    """Loads in these tests must not leak into the module globals other tests see."""
+    for name in ("_catalogue", "_catalogue_path", "_catalogue_mtime", "_catalogue_checked_at", "_chroma_available"):
+        monkeypatch.setattr(mitigation_action, name, getattr(mitigation_action, name))
+    monkeypatch.setattr(mitigation_action, "_chroma_misses", set())
+
+
+def write_catalogue(path, action="Restore riparian buffers."):
+    path.write_text(json.dumps({
+        "version": "test",
+        "entries": {"freshwater risk|high": {"score": "-", "action": action}}
+    }))
+    return str(path)
+
+
+def test_catalogue_lookup_ignores_case(tmp_path):
+    mitigation_action.load_mitigation_catalogue(write_catalogue(tmp_path / "mitigation_catalogue.json"))
+
+    result = mitigation_action.query_mitigation_action("Freshwater Risk", "High ")
+    assert result == {"score": "-", "action": "Restore riparian buffers."}
+
+    # Callers may mutate the returned dict without corrupting the catalogue
+    result["action"] = "changed"
+    assert mitigation_action.query_mitigation_action("freshwater risk", "high")["action"] == "Restore riparian buffers."
+
+
+def test_reload_follows_custom_path(tmp_path, monkeypatch):
+    path = tmp_path / "custom.json"
+    mitigation_action.load_mitigation_catalogue(write_catalogue(path))
+
+    write_catalogue(path, action="Plant native species.")
+    os.utime(path, (1, 1))
+    monkeypatch.setattr(mitigation_action, "_catalogue_checked_at", -1e9)
+    assert mitigation_action.get_mitigation_catalogue()["entries"]["freshwater risk|high"]["action"] == "Plant native species."
+
+
+def test_chroma_misses_are_cached(tmp_path, monkeypatch):
+    mitigation_action.load_mitigation_catalogue(write_catalogue(tmp_path / "mitigation_catalogue.json"))
+    monkeypatch.setattr(mitigation_action, "_chroma_available", True)
+    calls = []
+    monkeypatch.setattr(mitigation_action, "_lookup_chroma", lambda *pair: calls.append(pair))
+
+    for _ in range(3):
+        result = mitigation_action.query_mitigation_action("Marine Risk", "low", "marine cell")
+        assert result["score"] == 1
+    assert calls == [("Marine Risk", "low")]
@@ -0,0 +1,85 @@
+"""
+Tests for keyset layer pages and their continuation tokens.
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import pagination, risk_search
+
+
+class FakeGrid:
+    """Grid layer stand-in: a regular lattice, so many cells tie on distance."""
+
+    def __init__(self, lat, lon, n=21, step=0.01):
+        self.rows = [(lon + (i - n // 2) * step, lat + (j - n // 2) * step, 0.5, "Moderate")
+                     for i in range(n) for j in range(n)]
+
+    def window_rows(self, lat, lon, lat_delta, lon_delta):
+        return [row for row in self.rows
+                if abs(row[1] - lat) <= lat_delta and abs(row[0] - lon) <= lon_delta]
+
+
+def test_grid_pages_cover_the_circle_once_in_distance_order():
+    grid = {"terrestrial_risk": FakeGrid(40.0, -74.5)}
+    after, seen, distances = None, [], []
+    while True:
+        rows, after = risk_search.layer_page("terrestrial_risk", 40.0, -74.5, after=after, limit=7,
+                                             grid_layers=grid, radius=5)
+        seen.extend((row[0], row[1]) for row, _ in rows)
+        distances.extend(d for _, d in rows)
+        if after is None:
+            break
+
+    everything = risk_search._layer_rows("terrestrial_risk", 40.0, -74.5, grid, 5)
+    assert len(everything) > 7 * 10
+    assert len(seen) == len(set(seen)) == len(everything)
+    assert distances == sorted(distances)
+
+
+def test_sql_page_continues_after_the_last_key(monkeypatch):
+    calls = []
+
+    def fake_query(sql, params):
+        calls.append((sql, params))
+        return [(40.0, -74.5, "Species", "Endangered", 7, 0.25), (40.0, -74.5, "Other", "Vulnerable", 9, 0.25)]
+
+    monkeypatch.setattr(risk_search, "_query", fake_query)
+    rows, after = risk_search.layer_page("iucn_data", 40.0, -74.5, limit=1)
+    assert after == [0.25, 7] and len(rows) == 1
+    assert "(distance, id) >" not in calls[0][0]
+
+    risk_search.layer_page("iucn_data", 40.0, -74.5, after=after, limit=1)
+    sql, params = calls[1]
+    assert "(distance, id) > (%s, %s)" in sql and "ORDER BY distance, id" in sql
+    assert params[-3:] == (0.25, 7, 2)
+
+
+def test_tokens_round_trip_and_reject_tampering_or_stale_data():
+    grid = {"terrestrial_risk": FakeGrid(40.0, -74.5)}
+    no_mitigation = lambda *_: None
+    first, token = pagination.page_risks("terrestrial_risk", 40.0, -74.5, no_mitigation, "v1", "secret",
+                                         limit=5, grid_layers=grid, radius=5)
+    second, _ = pagination.resume_page(token, no_mitigation, "v1", "secret", grid_layers=grid)
+    assert len(first) == len(second) == 5
+    assert not {(r["latitude"], r["longitude"]) for r in first} & {(r["latitude"], r["longitude"]) for r in second}
+
+    body, signature = token.split(".")
+    with pytest.raises(ValueError, match="Invalid"):
+        pagination.resume_page(body[:-2] + "xx." + signature, no_mitigation, "v1", "secret", grid_layers=grid)
+    with pytest.raises(ValueError, match="Invalid"):
+        pagination.resume_page(token, no_mitigation, "v1", "other secret", grid_layers=grid)
+    with pytest.raises(ValueError, match="expired"):
+        pagination.resume_page(token, no_mitigation, "v2", "secret", grid_layers=grid)
+
+
+def test_layer_names_and_page_size():
+    assert pagination.resolve_layer("IUCN") == "iucn_data"
+    assert pagination.resolve_layer("marine_hci") == "marine_hci"
+    with pytest.raises(ValueError):
+        pagination.resolve_layer("volcanoes")
+    assert pagination.parse_page_size(None) == risk_search.IUCN_PAGE_SIZE
+    assert pagination.parse_page_size("100000") == pagination.PAGE_MAX_SIZE
@@ -0,0 +1,67 @@
+"""
+Tests for background report jobs and the content-hash artifact cache.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.report_jobs import ReportJobs, report_key
+
+RISKS = [{"risk_type": "IUCN", "description": f"Species {i}", "threat_code": "high",
+          "mitigation": {"action": "Protect habitat."}} for i in range(250)]
+
+
+def wait_until_finished(jobs, job_id):
+    version = -1
+    while True:
+        job, version = jobs.wait(job_id, version, timeout=5)
+        if job["status"] in ("done", "failed"):
+            return job
+
+
+def test_job_renders_once_and_is_served_from_cache(tmp_path):
+    jobs = ReportJobs(cache_dir=str(tmp_path), workers=1)
+
+    job = jobs.submit(RISKS, "pdf")
+    assert job["status"] in ("queued", "running", "done")
+    done = wait_until_finished(jobs, job["job_id"])
+    assert done["status"] == "done" and done["progress"] == 1.0
+
+    path, file_format = jobs.artifact(job["job_id"])
+    assert file_format == "pdf"
+    with open(path, "rb") as f:
+        assert f.read(4) == b"%PDF"
+
+    # Identical risk list: same ID, no second render; a fresh instance finds it on disk
+    again = ReportJobs(cache_dir=str(tmp_path), workers=1).submit(RISKS, "pdf")
+    assert again["job_id"] == job["job_id"] and again["cached"]
+    assert report_key(RISKS, "csv") != job["job_id"]
+
+
+def test_new_artifact_survives_a_small_cache(tmp_path):
+    jobs = ReportJobs(cache_dir=str(tmp_path), workers=1, max_bytes=1)
+    old = tmp_path / ("0" * 32 + ".csv")
+    old.write_text("stale report")
+
+    job = jobs.submit(RISKS, "pdf")
+    assert wait_until_finished(jobs, job["job_id"])["status"] == "done"
+    assert jobs.artifact(job["job_id"])[0] is not None
+    assert not old.exists()
+
+
+def test_running_job_is_visible_to_other_workers(tmp_path):
+    owner = ReportJobs(cache_dir=str(tmp_path), workers=1)
+    job_id = report_key(RISKS, "pdf")
+    owner._save_state(dict(owner._new_job(job_id, "pdf", len(RISKS), "running"), rows_done=100))
+
+    other = ReportJobs(cache_dir=str(tmp_path), workers=1)
+    status = other.status(job_id)
+    assert status["status"] == "running" and status["progress"] == 0.4
+    # Submitting the same report elsewhere joins the running job instead of rendering it again
+    assert other.submit(RISKS, "pdf")["status"] == "running"
+    assert other.artifact(job_id) == (None, None)
+
+    # A worker that died mid-render leaves a stale state: reported as failed, resubmittable
+    os.utime(other.state_path(job_id), (0, 0))
+    assert other.status(job_id)["status"] == "failed"
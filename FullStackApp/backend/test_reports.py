@@ -0,0 +1,60 @@
+"""
+Tests for in-memory report rendering.
+"""
+import sys
+import os
+import csv
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import reports
+from services.reports import iter_csv, render_pdf, render_xlsx, write_xlsx_large
+
+RISKS = [
+    {"risk_type": "IUCN", "description": "Bog turtle", "threat_code": "high",
+     "mitigation": {"score": "-", "action": "Protect wetlands.\nLimit access."}},
+    {"risk_type": "Marine Risk", "description": "Marine HCI Score: 0.5", "threat_code": "moderate",
+     "latitude": 39.5, "longitude": -74.2},
+]
+
+
+def test_csv_has_union_of_columns():
+    rows = list(csv.reader(io.StringIO("".join(iter_csv(RISKS, chunk_rows=1)))))
+    assert rows[0] == ["risk_type", "description", "threat_code", "mitigation", "latitude", "longitude"]
+    assert rows[2][4:] == ["39.5", "-74.2"]
+    assert len(rows) == 3
+
+
+def test_pdf_and_xlsx_render_in_memory():
+    assert render_pdf(RISKS * 40).getvalue().startswith(b"%PDF")
+    assert render_xlsx(RISKS).getvalue().startswith(b"PK")
+
+
+def test_large_xlsx_has_layer_sheets_and_summary():
+    import zipfile
+
+    rows = (dict(RISKS[i % 2], threat_code=["high", "low", "moderate"][i % 3]) for i in range(12000))
+    f = write_xlsx_large(rows)
+    with zipfile.ZipFile(f) as book:
+        workbook_xml = book.read("xl/workbook.xml").decode()
+        summary_xml = book.read("xl/worksheets/sheet1.xml").decode()
+    for name in ("Summary", "All Risks", "IUCN", "Marine Risk"):
+        assert f'name="{name}"' in workbook_xml
+    assert "<v>12000</v>" in summary_xml
+    f.close()
+
+
+def test_large_xlsx_continues_past_the_sheet_row_limit(monkeypatch):
+    import zipfile
+
+    monkeypatch.setattr(reports, "XLSX_MAX_ROWS", 101)
+    f = write_xlsx_large(dict(RISKS[0]) for _ in range(250))
+    with zipfile.ZipFile(f) as book:
+        workbook_xml = book.read("xl/workbook.xml").decode()
+        sheets = [book.read(f"xl/worksheets/sheet{i}.xml").decode() for i in range(2, 8)]
+    for name in ("All Risks", "All Risks (2)", "All Risks (3)", "IUCN", "IUCN (2)", "IUCN (3)"):
+        assert f'name="{name}"' in workbook_xml
+    # 100 data rows per full sheet, the rest on the last one
+    assert [sheet.count("<row ") for sheet in sheets] == [101, 101, 101, 101, 51, 51]
+    f.close()
@@ -0,0 +1,28 @@
+"""
+Tests for the quantized /search result cache (memory tier only).
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.result_cache import ResultCache, quantize
+
+
+def test_nearby_searches_share_a_cell_and_version_invalidates():
+    cache = ResultCache(max_entries=2, redis_url=None, cell=0.01)
+    calls = []
+
+    def compute(cell_lat, cell_lon):
+        calls.append((cell_lat, cell_lon))
+        return [{"latitude": cell_lat, "longitude": cell_lon}]
+
+    first = cache.get_or_compute(40.2171, -74.7429, "1.a", compute)
+    second = cache.get_or_compute(40.2179, -74.7421, "1.a", compute)
+    assert first == second
+    assert calls == [quantize(40.2171, -74.7429)[1]]
+
+    cache.get_or_compute(40.2251, -74.7429, "1.a", compute)   # another cell
+    cache.get_or_compute(40.2171, -74.7429, "2.a", compute)   # dataset reloaded
+    assert len(calls) == 3
+    assert cache.snapshot()["memory_hits"] == 1
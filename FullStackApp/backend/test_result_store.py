@@ -0,0 +1,26 @@
+"""
+Tests for the server-side /search result store.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.result_store import ResultStore
+
+
+def test_round_trip_dedupe_and_eviction(tmp_path):
+    store = ResultStore(path=str(tmp_path / "results.sqlite3"), max_bytes=2000, max_memory_entries=0)
+    risks = [{"risk_type": "IUCN", "description": f"Species {i}", "threat_code": "high"} for i in range(20)]
+
+    result_id = store.put(risks)
+    assert store.put(risks) == result_id       # same content, same blob
+    assert store.get(result_id) == risks
+    assert store.get("missing") is None
+
+    # Filling past max_bytes evicts the least recently read results
+    for n in range(100):
+        store.put([{"n": n, "pad": os.urandom(64).hex()}])
+    store._evict(store._connect())
+    assert store.snapshot()["bytes"] <= 2000
+    assert store.get(result_id) is None
@@ -0,0 +1,100 @@
+"""
+Tests for the vectorized habitat risk scoring engine.
+"""
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import risk_scoring, table_io
+
+
+def sample_frame(columns, n=500, seed=5):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.gamma(2.0, 1.0, size=(n, len(columns))), columns=columns)
+    df.insert(0, "x", rng.uniform(-75.5, -74, n))
+    df.insert(1, "y", rng.uniform(39, 41.3, n))
+    df.iloc[::37, 3] = np.nan
+    df.iloc[5, 2:] = 0.0  # all-zero inputs get the baseline
+    df.iloc[5, 2] = 1.0
+    return df
+
+
+def reference_score(df, target, features, weight_target):
+    """The original script pipeline (pandas, per-row classify), meanuse counted once."""
+    df = df.copy()
+    cols = [target] + features
+    df[cols] = df[cols].fillna(df[cols].median())
+    abs_corr = df[cols].corr()[target].abs()
+    if not weight_target:
+        abs_corr = abs_corr.drop(target)
+    weights = abs_corr / abs_corr.sum()
+    weighted = sum(df[c] * weights[c] for c in weights.index)
+    zero_rows = (df[features] == 0).all(axis=1)
+    weighted[zero_rows] = weighted.median() * 0.3
+    transformed = np.sqrt(weighted)
+    q20, q80 = transformed.quantile([0.2, 0.8])
+    normalized = ((transformed - q20) / (q80 - q20)).clip(0, 1)
+    levels = normalized.apply(lambda s: "High" if s > 0.25 else "Moderate" if s > 0.05 else "Low")
+    return normalized, levels
+
+
+def test_matches_the_original_pipeline_for_every_layer():
+    for layer, config in risk_scoring.SCORING_LAYERS.items():
+        df = sample_frame([config["target"]] + config["features"])
+        scored, weights, _ = risk_scoring.score_layer(df, config)
+        normalized, levels = reference_score(df, config["target"], config["features"], config["weight_target"])
+
+        np.testing.assert_allclose(scored["normalized_risk"], normalized, atol=1e-12, err_msg=layer)
+        assert scored["risk_level"].tolist() == levels.tolist(), layer
+        assert abs(weights.sum() - 1) < 1e-12
+        assert (config["target"] in weights.index) == config["weight_target"]
+
+
+def test_freshwater_weights_each_feature_once():
+    config = risk_scoring.SCORING_LAYERS["freshwater"]
+    df = sample_frame([config["target"]] + config["features"])
+    scored, weights, _ = risk_scoring.score_layer(df, config)
+    filled = scored[weights.index]
+    zero_rows = (filled[config["features"]] == 0).all(axis=1)
+    np.testing.assert_allclose(scored.loc[~zero_rows, "weighted_risk"], (filled[~zero_rows] * weights).sum(axis=1))
+
+
+def test_classification_thresholds_and_marine_coordinates():
+    levels = risk_scoring.classify(np.array([0.0, 0.05, 0.050001, 0.25, 0.2500001, 1.0]), (0.05, 0.25))
+    assert levels.tolist() == ["Low", "Low", "Moderate", "Moderate", "High", "High"]
+
+    config = risk_scoring.SCORING_LAYERS["marine"]
+    scored, _, _ = risk_scoring.score_layer(sample_frame([config["target"]] + config["features"]), config)
+    assert {"latitude", "longitude"} <= set(scored.columns) and "x" not in scored.columns
+
+
+def test_score_layers_writes_outputs(tmp_path):
+    config = risk_scoring.SCORING_LAYERS["terrestrial"]
+    sample_frame([config["target"]] + config["features"]).to_csv(tmp_path / config["source"], index=False)
+    output = table_io.output_path(str(tmp_path / config["output"]))  # .parquet when pyarrow is installed
+    assert risk_scoring.score_layers(["terrestrial"], data_dir=str(tmp_path)) == {"terrestrial": (output, 500)}
+    out = table_io.read_table(output)
+    assert set(out["risk_level"]) <= set(risk_scoring.RISK_LEVELS)
+    assert (tmp_path / "terrestrial_ahp_weights.csv").exists()
+
+
+def test_chunked_scoring_matches_in_memory(tmp_path):
+    config = risk_scoring.SCORING_LAYERS["marine"]
+    df = sample_frame([config["target"]] + config["features"], n=20000)
+    source, output = tmp_path / "marine.csv", tmp_path / "marine_out.csv"
+    df.to_csv(source, index=False)
+
+    rows, weights, _ = risk_scoring.score_layer_chunked(source, output, config, chunk_rows=3000)
+    expected, expected_weights, _ = risk_scoring.score_layer(df, config)
+    out = pd.read_csv(output)
+
+    assert rows == len(out) == len(expected)
+    assert list(out.columns) == list(expected.columns)
+    # Medians and quantiles are sketch estimates, so allow a small drift
+    np.testing.assert_allclose(weights, expected_weights, atol=1e-3)
+    np.testing.assert_allclose(out["normalized_risk"], expected["normalized_risk"], atol=0.02)
+    assert (out["risk_level"] == expected["risk_level"]).mean() > 0.98
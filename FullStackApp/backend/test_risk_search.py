@@ -0,0 +1,105 @@
+"""
+Tests for the concurrent per-layer /search fetchers (no database needed).
+"""
+import sys
+import os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import risk_search
+
+ROWS = {
+    "invasive_species": [(40.1, -74.6, "Japanese knotweed", "high")],
+    "iucn_data": [(40.2, -74.5, "Bog turtle", "Endangered")],
+    "freshwater_risk": [(-74.55, 40.15, 0.8, "High")],
+    "marine_hci": [(-74.5, 40.1, 0.5)],
+    "terrestrial_risk": [(-74.6, 40.2, 0.2, None)],
+}
+
+
+def fake_query(sql, params):
+    time.sleep(0.2)
+    table = next(name for name in ROWS if f"FROM {name}" in sql)
+    return ROWS[table]
+
+
+def test_layers_run_concurrently_and_merge_in_order(monkeypatch):
+    monkeypatch.setattr(risk_search, "_query", fake_query)
+    mitigation = lambda risk_type, level: {"action": f"{risk_type}:{level}"}
+
+    started = time.monotonic()
+    risks = risk_search.search_risks(40.15, -74.55, mitigation)
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 0.6  # five 0.2s layers, not 1.0s in sequence
+    assert [r["risk_type"] for r in risks] == [
+        "Invasive Species", "IUCN", "Freshwater Risk", "Marine Risk", "Terrestrial Risk"]
+    assert [r["threat_code"] for r in risks] == ["high", "high", "high", "moderate", "low"]
+    assert risks[1]["mitigation"] == {"action": "IUCN:high"}
+
+
+def test_portfolio_assessment_is_one_query_per_layer(monkeypatch):
+    calls = []
+
+    def fake_join(sql, params):
+        calls.append(sql)
+        site_ids = params[0]
+        return [(site_id, "high" if site_id == 1 else "low", 3) for site_id in site_ids]
+
+    monkeypatch.setattr(risk_search, "_query", fake_join)
+    locations = [{"id": i, "hotel_name": f"Hotel {i}", "latitude": 40.0 + i / 100, "longitude": -74.5}
+                 for i in range(1, 201)]
+    locations.append({"id": 999, "hotel_name": "No coordinates", "latitude": None, "longitude": None})
+
+    summaries = risk_search.assess_locations(locations)
+
+    assert len(calls) == 5
+    assert summaries[0]["highest_level"] == "high" and summaries[0]["risk_count"] == 15
+    assert summaries[1]["totals"] == {"low": 15}
+    assert summaries[1]["layers"]["IUCN"] == {"low": 3}
+    assert summaries[-1]["error"] and summaries[-1]["risk_count"] == 0
+
+
+def test_haversine_radius_filter_matches_brute_force():
+    import numpy as np
+    from api.haversine_api import haversine, haversine_matrix, within_radius
+
+    rng = np.random.default_rng(7)
+    lats, lons = rng.uniform(39.0, 41.3, 200000), rng.uniform(-75.5, -74.0, 200000)
+    indices, distances = within_radius(40.22, -74.76, lats, lons, 5)
+
+    brute = [i for i in range(0, 200000, 97) if haversine(40.22, -74.76, lats[i], lons[i]) <= 5]
+    assert set(brute) <= set(indices.tolist())
+    assert np.all(np.diff(distances) >= 0) and distances.max() <= 5
+    assert haversine_matrix([40.22, 39.36], [-74.76, -74.42], lats[:3], lons[:3]).shape == (2, 3)
+
+
+def test_cached_cell_gives_the_exact_circle_off_centre(monkeypatch):
+    from services.result_cache import quantize
+
+    rng = np.random.default_rng(3)
+    lats, lons = rng.uniform(40.0, 40.3, 3000), rng.uniform(-74.7, -74.4, 3000)
+    rows = {
+        "invasive_species": [],
+        "iucn_data": [(a, o, f"Species {i}", "Vulnerable") for i, (a, o) in enumerate(zip(lats, lons))],
+        "freshwater_risk": [(o, a, 0.5, "Moderate") for a, o in zip(lats[:500], lons[:500])],
+        "marine_hci": [],
+        "terrestrial_risk": [],
+    }
+    monkeypatch.setattr(risk_search, "_query",
+                        lambda sql, params: rows[next(name for name in rows if f"FROM {name}" in sql)])
+    mitigation = lambda risk_type, level: {}
+
+    # Near a corner of its cache cell, so the centre's circle differs from the point's
+    lat, lon, cell = 40.1509, -74.5591, 0.01
+    _, (cell_lat, cell_lon) = quantize(lat, lon, cell)
+    cached = risk_search.search_cell(cell_lat, cell_lon, mitigation, cell)
+    for offset in (0, 50):
+        got = risk_search.risks_for_point(cached, lat, lon, offset, radius=risk_search.SEARCH_RADIUS_MILES)
+        expected = risk_search.search_risks(lat, lon, mitigation, offset=offset)
+        assert [(r["risk_type"], r["latitude"], r["longitude"], r["distance_miles"]) for r in got] == \
+            [(r["risk_type"], r["latitude"], r["longitude"], r["distance_miles"]) for r in expected]
+        assert max(r["distance_miles"] for r in got) <= risk_search.SEARCH_RADIUS_MILES
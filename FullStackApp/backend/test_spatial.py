@@ -0,0 +1,22 @@
+"""
+Tests for the spatial lookup helpers used by /search.
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.spatial import RISK_LAYER_COORDS, bbox_filter, bbox_params, spatial_index_statements
+
+
+def test_bbox_params_are_box_corners():
+    """bbox_params returns (lon_min, lat_min, lon_max, lat_max)."""
+    assert bbox_params(40.0, -74.0, 0.5, 0.1) == (-74.1, 39.5, -73.9, 40.5)
+
+
+def test_filter_matches_index_expression():
+    """The query expression must be the indexed expression or the planner skips the index."""
+    for table, statement in zip(RISK_LAYER_COORDS, spatial_index_statements()):
+        expr = bbox_filter(table).split(" <@ ")[0]
+        assert f"USING gist ({expr})" in statement
+        assert bbox_filter(table).count("%s") == 4
@@ -0,0 +1,46 @@
+"""
+Tests for the streaming t-digest and co-moment accumulators.
+"""
+import sys
+import os
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.streaming_stats import CoMoments, TDigest
+
+
+def test_tdigest_quantiles_and_merge():
+    rng = np.random.default_rng(11)
+    values = rng.lognormal(0, 1, 300000)
+    left, right = TDigest(), TDigest()
+    for part in np.array_split(values[:150000], 15):
+        left.update(part)
+    right.update(values[150000:])
+    digest = left.merge(right)
+
+    qs = [0.01, 0.2, 0.5, 0.8, 0.99]
+    # Compare by rank: each estimate should sit within 0.5% of its target rank
+    ranks = np.searchsorted(np.sort(values), digest.quantile(qs)) / len(values)
+    assert np.all(np.abs(ranks - qs) < 0.005)
+    assert digest.quantile(0) == values.min() and digest.quantile(1) == values.max()
+    assert len(digest.means) < 1000
+
+
+def test_comoments_match_filled_covariance():
+    rng = np.random.default_rng(2)
+    values = rng.normal(1000, 3, size=(20000, 4))
+    values[:, 1] += values[:, 0]
+    values[rng.random(values.shape) < 0.1] = np.nan
+    fill = np.nanmedian(values, axis=0)
+
+    parts = [CoMoments(4) for _ in range(3)]
+    for part, block in zip(parts, np.array_split(values, 3)):
+        part.update(block)  # each part takes its own block's means as its shift
+    assert not np.array_equal(parts[0].shift, parts[1].shift)
+    moments = parts[0].merge(parts[1]).merge(parts[2])
+
+    filled = np.where(np.isnan(values), fill, values)
+    np.testing.assert_allclose(moments.covariance(fill), np.cov(filled, rowvar=False), rtol=1e-9)
+    np.testing.assert_allclose(moments.correlation(fill), np.corrcoef(filled, rowvar=False), atol=1e-12)
@@ -0,0 +1,90 @@
+"""
+Tests for the pipeline table I/O (CSV always; Parquet when pyarrow is installed).
+"""
+import sys
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import table_io
+
+
+def sample_frame(n=1000):
+    return pd.DataFrame({
+        "x": np.linspace(-75.5, -74.0, n),
+        "y": np.linspace(39.0, 41.3, n),
+        "normalized_risk": np.linspace(0, 1, n),
+        "risk_level": np.where(np.linspace(0, 1, n) > 0.25, "High", "Low"),
+    })
+
+
+def check_round_trip(path):
+    df = sample_frame()
+    with table_io.TableWriter(path) as writer:
+        for start in range(0, len(df), 300):
+            writer.write(df.iloc[start:start + 300])
+    assert writer.rows == len(df)
+    assert table_io.read_columns(path) == list(df.columns)
+
+    pd.testing.assert_frame_equal(table_io.read_table(path), df)
+    high = table_io.read_table(path, columns=["x", "normalized_risk"], filters=[("risk_level", "=", "High")])
+    expected = df.loc[df["risk_level"] == "High", ["x", "normalized_risk"]].reset_index(drop=True)
+    pd.testing.assert_frame_equal(high, expected)
+
+    frames = list(table_io.iter_frames(path, 250, columns=["y"], filters=[("normalized_risk", "<=", 0.5)]))
+    assert all(list(frame.columns) == ["y"] for frame in frames)
+    assert sum(len(frame) for frame in frames) == (df["normalized_risk"] <= 0.5).sum()
+
+
+def test_csv_round_trip_with_projection_and_filters(tmp_path):
+    check_round_trip(str(tmp_path / "risk.csv"))
+
+
+def test_paths_follow_the_pipeline_format(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_FORMAT", "csv")
+    assert table_io.output_path("out/terrestrial_risk_updated.csv") == "out/terrestrial_risk_updated.csv"
+    source = str(tmp_path / "marine.csv")
+    assert table_io.find_input(source) == source
+
+    monkeypatch.setenv("PIPELINE_FORMAT", "parquet")
+    expected = "parquet" if table_io.pq is not None else "csv"
+    assert table_io.pipeline_format() == expected
+    assert table_io.output_path("risk.csv") == f"risk.{expected}"
+
+
+def test_parquet_round_trip_and_csv_export(tmp_path):
+    pytest.importorskip("pyarrow")
+    parquet = str(tmp_path / "risk.parquet")
+    check_round_trip(parquet)
+
+    csv = str(tmp_path / "risk.csv")
+    assert table_io.convert(parquet, csv, chunk_rows=400) == 1000
+    pd.testing.assert_frame_equal(pd.read_csv(csv), sample_frame())
+    assert table_io.find_input(csv) == csv  # the export is newer
+    os.utime(parquet, (os.path.getmtime(csv) + 1,) * 2)
+    assert table_io.find_input(csv) == parquet
+
+
+def test_parquet_writer_survives_dtype_drift(tmp_path):
+    pytest.importorskip("pyarrow")
+    source = str(tmp_path / "drift.csv")
+    with open(source, "w") as f:
+        f.write("id,count,score,note\n")
+        f.writelines(f"{i},{i},,\n" for i in range(5))  # score and note empty, count int
+        f.write("5,,0.5,checked\n")  # count gains a NaN (float), score and note get values
+
+    parquet = str(tmp_path / "drift.parquet")
+    assert table_io.convert(source, parquet, chunk_rows=2) == 6
+    df = table_io.read_table(parquet)
+    assert str(df["id"].dtype) == "int64" and str(df["count"].dtype) == "float64"
+    assert df["note"].tolist()[-1] == "checked" and df["score"].tolist()[-1] == 0.5
+
+    # Once the schema is fixed, whole-valued floats still fit an integer column
+    with table_io.TableWriter(str(tmp_path / "late.parquet")) as writer:
+        writer.write(pd.DataFrame({"id": [1, 2]}))
+        writer.write(pd.DataFrame({"id": [3.0, np.nan]}))
+    assert table_io.read_table(str(tmp_path / "late.parquet"))["id"].tolist()[:3] == [1, 2, 3]
@@ -0,0 +1,71 @@
+"""
+Tests for the risk tile pyramid and the /tiles endpoint.
+"""
+import sys
+import os
+import gzip
+import json
+
+import numpy as np
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.tiles import bin_tiles, build_tile_pyramid, level_codes, tile_bounds, write_manifest
+
+
+def test_bins_cover_every_point_with_most_severe_representative():
+    rng = np.random.default_rng(1)
+    lats, lons = rng.uniform(39.0, 41.0, 5000), rng.uniform(-75.5, -74.0, 5000)
+    levels = rng.choice(["high", "moderate", "low", None], 5000)
+    tiles = bin_tiles(lats, lons, level_codes(levels), 10)
+
+    assert sum(sum(t["counts"].values()) for t in tiles.values()) == 5000
+    for (x, y), tile in tiles.items():
+        south, west, north, east = tile_bounds(10, x, y)
+        for b in tile["bins"]:
+            assert south <= b[-2] <= north and west <= b[-1] <= east
+            assert b[3] == 0 or levels[np.argmin(np.abs(lats - b[-2]) + np.abs(lons - b[-1]))] == "high"
+
+
+def test_tile_endpoint_serves_with_etag(tmp_path, monkeypatch):
+    from backend.routes import tile_routes
+
+    build_tile_pyramid("iucn_data", [40.22, 40.23], [-74.76, -74.75], ["high", "low"], str(tmp_path), 8, 8)
+    write_manifest(str(tmp_path), {"iucn_data": {}}, 8, 8)
+    monkeypatch.setattr(tile_routes, "TILE_DIR", str(tmp_path))
+
+    app = Flask(__name__)
+    app.register_blueprint(tile_routes.tile_bp, url_prefix="/tiles")
+    client = app.test_client()
+
+    (x_dir,) = os.listdir(tmp_path / "iucn_data" / "8")
+    (y_file,) = os.listdir(tmp_path / "iucn_data" / "8" / x_dir)
+    url = f"/tiles/iucn_data/8/{x_dir}/{y_file.split('.')[0]}"
+
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200 and response.headers["Cache-Control"] == "no-cache"
+    assert json.loads(gzip.decompress(response.data))["counts"] == {"high": 1, "low": 1}
+
+    cached = client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert client.get("/tiles/iucn_data/8/0/0").data == b"{}"
+    assert client.get("/tiles/iucn_data/3/0/0").status_code == 404
+
+
+def test_only_versioned_tile_urls_are_cached_long(tmp_path, monkeypatch):
+    from backend.routes import tile_routes
+
+    build_tile_pyramid("iucn_data", [40.22], [-74.76], ["high"], str(tmp_path), 8, 8)
+    write_manifest(str(tmp_path), {"iucn_data": {}}, 8, 8)
+    monkeypatch.setattr(tile_routes, "TILE_DIR", str(tmp_path))
+
+    app = Flask(__name__)
+    app.register_blueprint(tile_routes.tile_bp, url_prefix="/tiles")
+    client = app.test_client()
+
+    manifest = client.get("/tiles/manifest").get_json()
+    url = manifest["tile_url"].format(layer="iucn_data", z=8, x=0, y=0)
+    assert url == f"/tiles/iucn_data/8/0/0?v={manifest['version']}"
+    assert "immutable" in client.get(url).headers["Cache-Control"]
+    assert client.get("/tiles/iucn_data/8/0/0?v=stale").headers["Cache-Control"] == "no-cache"
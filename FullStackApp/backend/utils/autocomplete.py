@@ -0,0 +1,174 @@
+"""
+Server-side address autocomplete for New Jersey.
+
+Suggestions come from a sorted-array prefix index built once per worker from
+the NJ gazetteer (towns and ZIPs) plus an optional street list at
+data/nj_streets.csv (columns: street, city, zip_code, latitude, longitude).
+/address-autocomplete only falls back to Nominatim when the index has nothing.
+No street list is bundled, so until one is dropped in, queries with a house
+number always go to Nominatim.
+
+Every entry is stored under one or more normalized keys; a prefix query is a
+binary search for the range of keys starting with the prefix. Top-k lists for
+prefixes of up to PRECOMPUTED_PREFIX_LENGTH characters are built ahead of
+time, so the short, wide-range prefixes of the first keystrokes are O(1).
+"""
+import bisect
+import csv
+import heapq
+import os
+import re
+
+from .gazetteer import get_gazetteer
+
+STREETS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "data", "nj_streets.csv")
+
+DEFAULT_LIMIT = 5
+PRECOMPUTED_PREFIX_LENGTH = 3
+PRECOMPUTED_TOP_K = 10
+
+# Town entries outrank the ZIP-level and street entries for the same prefix
+TOWN_WEIGHT = 100
+ZIP_WEIGHT = 10
+STREET_WEIGHT = 1
+
+# A leading 5-digit token is a ZIP ("07001 avenel"), not a house number
+_HOUSE_NUMBER = re.compile(r"^(?!\d{5}\s)(\d+[a-z]?)\s+(?=\D)")
+
+
+def normalize(text):
+    text = re.sub(r"[^\w\s]", " ", str(text).lower())
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.entries = []       # dicts: display_name, latitude, longitude
+        self._weights = []
+        self._streets = set()   # entry ids that are street addresses
+        self._pairs = []        # (key, entry id) before build()
+        self._keys = []
+        self._ids = []
+        self._top = {}
+        self._exact = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, display_name, latitude, longitude, keys, weight=1, street=False):
+        entry_id = len(self.entries)
+        self.entries.append({"display_name": display_name, "latitude": latitude, "longitude": longitude})
+        self._weights.append(weight)
+        if street:
+            self._streets.add(entry_id)
+        self._exact.setdefault(normalize(display_name), entry_id)
+        for key in {normalize(k) for k in keys if k}:
+            self._pairs.append((key, entry_id))
+
+    def _rank(self, entry_ids, k):
+        return heapq.nsmallest(k, set(entry_ids),
+                               key=lambda i: (-self._weights[i], self.entries[i]["display_name"]))
+
+    def build(self):
+        self._pairs.sort()
+        self._keys = [key for key, _ in self._pairs]
+        self._ids = [entry_id for _, entry_id in self._pairs]
+        self._pairs = []
+
+        by_prefix = {}
+        for key, entry_id in zip(self._keys, self._ids):
+            for n in range(1, min(len(key), PRECOMPUTED_PREFIX_LENGTH) + 1):
+                by_prefix.setdefault(key[:n], []).append(entry_id)
+        self._top = {prefix: self._rank(ids, PRECOMPUTED_TOP_K) for prefix, ids in by_prefix.items()}
+        return self
+
+    def search(self, prefix, k=DEFAULT_LIMIT):
+        """Top-k entry ids whose keys start with the normalized prefix."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH and k <= PRECOMPUTED_TOP_K:
+            return self._top.get(prefix, [])[:k]
+        lo = bisect.bisect_left(self._keys, prefix)
+        hi = bisect.bisect_left(self._keys, prefix + "\uffff", lo)
+        return self._rank(self._ids[lo:hi], k)
+
+    def suggest(self, query, k=DEFAULT_LIMIT):
+        """
+        Ranked suggestions for a partial query. A query with a leading house
+        number only matches street entries, and the number is kept in the
+        suggestion text.
+        """
+        query = str(query).strip()
+        match = _HOUSE_NUMBER.match(query.lower())
+        if match:
+            number = match.group(1)
+            rest = normalize(query[match.end():])
+            lo = bisect.bisect_left(self._keys, rest)
+            hi = bisect.bisect_left(self._keys, rest + "\uffff", lo)
+            ids = self._rank([i for i in self._ids[lo:hi] if i in self._streets], k)
+            return [dict(self.entries[i], display_name=f"{number} {self.entries[i]['display_name']}")
+                    for i in ids]
+        return [dict(self.entries[i]) for i in self.search(query, k)]
+
+    def resolve(self, text):
+        """Entry whose display name equals text (after normalization), or None."""
+        entry_id = self._exact.get(normalize(text))
+        return dict(self.entries[entry_id]) if entry_id is not None else None
+
+
+def build_autocomplete_index(streets_path=STREETS_PATH):
+    index = PrefixIndex()
+    gazetteer = get_gazetteer()
+
+    if gazetteer:
+        towns = {}
+        for i in range(len(gazetteer)):
+            zip_code = f"{gazetteer.zip_codes[i]:05d}"
+            city, county = gazetteer.cities[i], gazetteer.counties[i]
+            lat, lon = float(gazetteer.latitudes[i]), float(gazetteer.longitudes[i])
+            index.add(f"{city}, {county}, New Jersey, {zip_code}", lat, lon,
+                      keys=[f"{city} {zip_code}", f"{zip_code} {city}", zip_code], weight=ZIP_WEIGHT)
+            towns.setdefault((city, county), []).append((lat, lon))
+
+        for (city, county), points in towns.items():
+            lat = sum(p[0] for p in points) / len(points)
+            lon = sum(p[1] for p in points) / len(points)
+            index.add(f"{city}, {county}, New Jersey", lat, lon,
+                      keys=[city, f"{city} nj", county], weight=TOWN_WEIGHT + len(points))
+
+    if os.path.exists(streets_path):
+        with open(streets_path, newline="") as f:
+            for row in csv.DictReader(f):
+                index.add(f"{row['street']}, {row['city']}, New Jersey, {row['zip_code']}",
+                          float(row["latitude"]), float(row["longitude"]),
+                          keys=[row["street"], f"{row['street']} {row['city']}"], weight=STREET_WEIGHT, street=True)
+
+    return index.build()
+
+
+_index = None
+
+
+def get_autocomplete_index():
+    """Build the index once per worker; None if it cannot be built."""
+    global _index
+    if _index is None:
+        try:
+            _index = build_autocomplete_index()
+            print(f"🔤 Autocomplete index ready ({len(_index)} entries)")
+        except Exception as e:
+            print(f"⚠️ Autocomplete index unavailable: {e}")
+            _index = False
+    return _index or None
+
+
+def suggest(query, limit=DEFAULT_LIMIT):
+    index = get_autocomplete_index()
+    return index.suggest(query, limit) if index else []
+
+
+def resolve(text):
+    index = get_autocomplete_index()
+    return index.resolve(text) if index else None
@@ -0,0 +1,144 @@
+"""
+Offline New Jersey ZIP gazetteer.
+
+Forward (ZIP -> centroid) and reverse (lat/lon -> nearest ZIP) lookups over
+the bundled data/nj_zip_gazetteer.csv, so the common /search paths need no
+Nominatim call. The CSV holds the active NJ ZIP codes with their city, county
+and centroid (extracted from the MIT-licensed `zipcodes` dataset, Oct 2021).
+
+The table is held as parallel NumPy arrays sorted by ZIP; forward lookup is a
+binary search and reverse lookup uses a KD-tree over the delivery (STANDARD)
+ZIP centroids.
+"""
+import csv
+import math
+import os
+import re
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy is only in requirements-full.txt
+    cKDTree = None
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "data", "nj_zip_gazetteer.csv")
+
+EARTH_RADIUS_MILES = 3960
+# Reverse lookups farther than this from every NJ ZIP centroid return None
+MAX_REVERSE_DISTANCE_MILES = 15.0
+
+_ZIP_INPUT = re.compile(r"^(\d{5})(?:-\d{4})?$")
+
+
+class Gazetteer:
+    def __init__(self, path=GAZETTEER_PATH):
+        with open(path, newline="") as f:
+            rows = sorted(csv.DictReader(f), key=lambda r: r["zip_code"])
+
+        self.zip_codes = np.array([int(r["zip_code"]) for r in rows], dtype=np.int32)
+        self.latitudes = np.array([float(r["latitude"]) for r in rows], dtype=np.float64)
+        self.longitudes = np.array([float(r["longitude"]) for r in rows], dtype=np.float64)
+        self.cities = [r["city"] for r in rows]
+        self.counties = [r["county"] for r in rows]
+
+        # Reverse lookups only consider delivery ZIPs; PO box and unique ZIPs
+        # reuse the post office location and would shadow the real area.
+        self._reverse_rows = np.array([i for i, r in enumerate(rows) if r["zip_type"] == "STANDARD"],
+                                      dtype=np.int32)
+        # Equirectangular projection scaled to miles is accurate enough at NJ's size
+        self._lon_scale = math.cos(math.radians(float(np.mean(self.latitudes))))
+        points = self._project(self.latitudes[self._reverse_rows], self.longitudes[self._reverse_rows])
+        self._points = points
+        self._tree = cKDTree(points) if cKDTree is not None else None
+
+    def __len__(self):
+        return len(self.zip_codes)
+
+    def _project(self, lat, lon):
+        lat = np.radians(np.asarray(lat, dtype=np.float64))
+        lon = np.radians(np.asarray(lon, dtype=np.float64)) * self._lon_scale
+        return np.column_stack([lat, lon]) * EARTH_RADIUS_MILES
+
+    def _record(self, i, distance=None):
+        record = {
+            "zip_code": f"{self.zip_codes[i]:05d}",
+            "city": self.cities[i],
+            "county": self.counties[i],
+            "latitude": float(self.latitudes[i]),
+            "longitude": float(self.longitudes[i]),
+        }
+        if distance is not None:
+            record["distance_miles"] = round(float(distance), 3)
+        return record
+
+    def lookup_zip(self, zip_code):
+        """Centroid record for a 5-digit ZIP, or None if it is not an NJ ZIP."""
+        zip_code = str(zip_code).strip()
+        if len(zip_code) != 5 or not zip_code.isdigit():
+            return None
+        value = int(zip_code)
+        i = int(np.searchsorted(self.zip_codes, value))
+        if i < len(self.zip_codes) and self.zip_codes[i] == value:
+            return self._record(i)
+        return None
+
+    def nearest_zip(self, lat, lon, max_distance=MAX_REVERSE_DISTANCE_MILES):
+        """Record of the ZIP whose centroid is nearest (lat, lon), or None if none is close."""
+        point = self._project([lat], [lon])[0]
+        if self._tree is not None:
+            distance, j = self._tree.query(point)
+        else:
+            d2 = ((self._points - point) ** 2).sum(axis=1)
+            j = int(np.argmin(d2))
+            distance = math.sqrt(d2[j])
+        if distance > max_distance:
+            return None
+        return self._record(int(self._reverse_rows[j]), distance)
+
+
+_gazetteer = None
+
+
+def get_gazetteer():
+    """Load the gazetteer once per worker; None if the data file is unavailable."""
+    global _gazetteer
+    if _gazetteer is None:
+        try:
+            _gazetteer = Gazetteer()
+        except Exception as e:
+            print(f"⚠️ NJ gazetteer unavailable: {e}")
+            _gazetteer = False
+    return _gazetteer or None
+
+
+def parse_zip(text):
+    """The 5-digit ZIP of a ZIP or ZIP+4 string ("08540", "08540-1234"), else None."""
+    match = _ZIP_INPUT.match(str(text or "").strip())
+    return match.group(1) if match else None
+
+
+def zip_to_lat_lon(zip_code):
+    """(lat, lon) centroid for an NJ ZIP, or (None, None)."""
+    gazetteer = get_gazetteer()
+    record = gazetteer.lookup_zip(zip_code) if gazetteer else None
+    if record:
+        return record["latitude"], record["longitude"]
+    return None, None
+
+
+def is_nj_zip(zip_code):
+    """True for a known NJ ZIP; without the data file, any 07xxx/08xxx ZIP passes."""
+    zip_code = str(zip_code or "").strip()
+    gazetteer = get_gazetteer()
+    if gazetteer:
+        return gazetteer.lookup_zip(zip_code) is not None
+    return len(zip_code) == 5 and zip_code.isdigit() and zip_code[:2] in ("07", "08")
+
+
+def lat_lon_to_zip(lat, lon):
+    """Nearest NJ ZIP code for a coordinate, or None."""
+    gazetteer = get_gazetteer()
+    record = gazetteer.nearest_zip(lat, lon) if gazetteer else None
+    return record["zip_code"] if record else None
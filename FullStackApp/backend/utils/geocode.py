@@ -1,23 +1,189 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
 import requests
 
 GEOCODING_API_URL = "https://nominatim.openstreetmap.org/search"
+GEOCODING_HEADERS = {"User-Agent": "BiodivProScopeApp/1.0"}
+GEOCODING_TIMEOUT = 5  # seconds
+
+# Resolved against the backend directory so every worker on the host shares one file
+GEOCODE_CACHE_PATH = os.environ.get(
+    "GEOCODE_CACHE_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geocode_cache.sqlite3"))
+GEOCODE_CACHE_TTL = 30 * 24 * 3600        # successful lookups: 30 days
+GEOCODE_NEGATIVE_TTL = 24 * 3600          # "no results" answers: 1 day
+GEOCODE_MEMORY_ENTRIES = 4096
+GEOCODE_DISK_ENTRIES = 200000
+
+
+def normalize_query(params):
+    """
+    Cache key for a Nominatim query: parameter names sorted, values lowercased
+    with whitespace collapsed and stray spaces around commas removed, so
+    "12 Main St ,  Trenton" and "12 main st, trenton" share one entry.
+    """
+    parts = []
+    for name in sorted(params):
+        value = re.sub(r"\s+", " ", str(params[name]).strip().lower())
+        value = re.sub(r"\s*,\s*", ", ", value)
+        parts.append(f"{name}={value}")
+    return "&".join(parts)
+
+
+class GeocodeCache:
+    """
+    Two-tier geocoding cache: an LRU dict in front of a SQLite file shared by
+    every worker on the host. Entries expire after ttl; empty answers are
+    cached for the shorter negative_ttl.
+    """
+
+    def __init__(self, path, ttl=GEOCODE_CACHE_TTL, negative_ttl=GEOCODE_NEGATIVE_TTL,
+                 max_memory_entries=GEOCODE_MEMORY_ENTRIES, max_disk_entries=GEOCODE_DISK_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "negative_hits": 0, "stores": 0}
+
+    def _connect(self):
+        if self._db is None:
+            try:
+                self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=2)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS geocode_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_geocode_cache_expires ON geocode_cache(expires_at)")
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Geocode disk cache unavailable, using memory only: {e}")
+                self._db = False
+        return self._db
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                if not entry[0]:
+                    self.stats["negative_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+            db = self._connect()
+            if db:
+                try:
+                    row = db.execute(
+                        "SELECT value, expires_at FROM geocode_cache WHERE key = ? AND expires_at > ?",
+                        (key, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"⚠️ Geocode cache read failed: {e}")
+                    row = None
+                if row:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.stats["disk_hits"] += 1
+                    if not value:
+                        self.stats["negative_hits"] += 1
+                    return value
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        expires_at = time.time() + (self.ttl if value else self.negative_ttl)
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self.stats["stores"] += 1
+            db = self._connect()
+            if not db:
+                return
+            try:
+                db.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at)
+                )
+                # Occasionally drop expired rows and keep the file bounded
+                if self.stats["stores"] % 500 == 0:
+                    db.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (time.time(),))
+                    db.execute("""
+                        DELETE FROM geocode_cache WHERE key IN (
+                            SELECT key FROM geocode_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+                        )
+                    """, (self.max_disk_entries,))
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"⚠️ Geocode cache write failed: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+geocode_cache = GeocodeCache(GEOCODE_CACHE_PATH)
+
+
+def nominatim_search(params):
+    """
+    Cached Nominatim search. Returns the list of result dicts (empty when
+    Nominatim found nothing) or None when the request itself failed; failures
+    are not cached.
+    """
+    params = {"countrycodes": "us", "format": "json", **params}
+    key = normalize_query(params)
+
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        return cached
 
-def get_lat_lon_from_address(address):
     try:
-        response = requests.get(
-            GEOCODING_API_URL,
-            params={"q": address, "countrycodes": "us", "format": "json"},
-            headers={"User-Agent": "BiodivProScopeApp/1.0"}
-        )
-
-        if response.status_code == 200:
-            results = response.json()
-            if results:
-                lat = float(results[0]["lat"])
-                lon = float(results[0]["lon"])
-                zip_code = results[0].get("display_name", "").split(",")[-2].strip()
-                return lat, lon, zip_code
-        return None, None, None
+        response = requests.get(GEOCODING_API_URL, params=params, headers=GEOCODING_HEADERS,
+                                timeout=GEOCODING_TIMEOUT)
+        if response.status_code != 200:
+            print(f"Nominatim API Error: {response.status_code}")
+            return None
+        results = response.json()
     except Exception as e:
         print(f"Geocoding error: {e}")
-        return None, None, None
+        return None
+
+    geocode_cache.set(key, results)
+    return results
+
+
+def get_lat_lon_from_address(address):
+    results = nominatim_search({"q": address})
+    if results:
+        lat = float(results[0]["lat"])
+        lon = float(results[0]["lon"])
+        address_parts = results[0].get("display_name", "").split(",")
+        zip_code = address_parts[-2].strip() if len(address_parts) > 1 else None
+        return lat, lon, zip_code
+    return None, None, None